@@ -0,0 +1,61 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.serializers.json import DjangoJSONEncoder
+
+from productos.cache import ALIAS, VersionCatalogo, VersionCategorias
+from servicio_productos.routers import usar_primaria
+
+
+class CategoriaCache:
+    """
+    Respuestas de la API de categorías ya serializadas: {'datos', 'etag'}.
+
+    Las categorías casi no cambian, así que las entradas viven
+    CACHE_CATEGORIAS_TTL segundos. La clave incluye la versión del catálogo
+    (listado) o de la categoría (detalle): una entrada calculada con datos
+    viejos nunca vuelve a leerse. Sin ?include=productos la salida sólo
+    muestra nombres y recuentos, así que usa VersionCategorias, que no se
+    renueva con cambios de precio o de stock; con ?include=productos usa la
+    versión del catálogo, que cambia con cualquier mutación de sus productos.
+    Se arman siempre con datos de la primaria, nunca de una réplica que aún
+    no ve esa versión.
+    """
+
+    @staticmethod
+    def _cache():
+        return caches[ALIAS]
+
+    @staticmethod
+    def etag(datos):
+        # ETag fuerte: huella del cuerpo exacto que se envía
+        cuerpo = json.dumps(datos, sort_keys=True, cls=DjangoJSONEncoder)
+        return '"%s"' % hashlib.sha1(cuerpo.encode()).hexdigest()[:32]
+
+    @staticmethod
+    def clave(categoria_id=None, incluir_productos=False):
+        versiones = VersionCatalogo if incluir_productos else VersionCategorias
+        version = versiones.obtener(categoria_id)
+        recurso = 'lista' if categoria_id is None else f'detalle:{categoria_id}'
+        return f"categorias:{recurso}:{int(incluir_productos)}:{version}"
+
+    @classmethod
+    def obtener_o_cargar(cls, categoria_id, incluir_productos, cargar):
+        # Devuelve la entrada cacheada o la arma con cargar(); None si no existe
+        clave = cls.clave(categoria_id, incluir_productos)
+        entrada = cls._cache().get(clave)
+        if entrada is not None:
+            return entrada
+
+        with usar_primaria():
+            datos = cargar()
+        if datos is None:
+            return None
+        entrada = {'datos': datos, 'etag': cls.etag(datos)}
+        # Sin versiones compartidas otro proceso no renovaría la clave: TTL normal
+        ttl = settings.CACHE_CATEGORIAS_TTL if settings.CACHE_VERSIONES_COMPARTIDAS else DEFAULT_TIMEOUT
+        cls._cache().set(clave, entrada, ttl)
+        return entrada
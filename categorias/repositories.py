@@ -0,0 +1,65 @@
+from django.db.models import Count, ObjectDoesNotExist, Prefetch
+from categorias.models import Categoria
+from productos.models import Producto
+
+# Columnas de cada producto anidado con ?include=productos
+COLUMNAS_PRODUCTO = ('id', 'nombre', 'precio', 'stock', 'imagen_url', 'categoria_id')
+
+
+class CategoriaRepository:
+    # --- Consultas ---
+    @staticmethod
+    def _base(incluir_productos=False):
+        # El número de productos se calcula en la misma consulta (LEFT JOIN + GROUP BY)
+        categorias = Categoria.objects.annotate(total_productos=Count('producto')).order_by('id')
+        if incluir_productos:
+            # Una segunda consulta IN trae los productos de todas las categorías a la vez
+            categorias = categorias.prefetch_related(
+                Prefetch('producto_set', queryset=Producto.objects.only(*COLUMNAS_PRODUCTO).order_by('id'))
+            )
+        return categorias
+
+    @staticmethod
+    def listar(incluir_productos=False):
+        return CategoriaRepository._base(incluir_productos)
+
+    @staticmethod
+    def obtener_por_id(id, incluir_productos=False):
+        try:
+            return CategoriaRepository._base(incluir_productos).get(pk=id)
+        except ObjectDoesNotExist:
+            return None
+
+    @staticmethod
+    def producto_ids(id):
+        return list(Producto.objects.filter(categoria_id=id).values_list('id', flat=True))
+
+    @staticmethod
+    def ids_por_nombre():
+        return dict(Categoria.objects.values_list('nombre', 'id'))
+
+    # --- Mutaciones ---
+    @staticmethod
+    def crear(datos):
+        return Categoria.objects.create(**datos)
+
+    @staticmethod
+    def actualizar(id, datos):
+        try:
+            categoria = Categoria.objects.get(pk=id)
+        except ObjectDoesNotExist:
+            return None, []
+
+        cambiados = []
+        for campo, valor in datos.items():
+            if getattr(categoria, campo) != valor:
+                setattr(categoria, campo, valor)
+                cambiados.append(campo)
+        if cambiados:
+            categoria.save(update_fields=cambiados)
+        return categoria, cambiados
+
+    @staticmethod
+    def eliminar(id):
+        # Borra también sus productos (on_delete=CASCADE)
+        return Categoria.objects.filter(pk=id).delete()[0] > 0
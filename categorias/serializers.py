@@ -0,0 +1,27 @@
+from rest_framework import serializers
+from categorias.models import Categoria
+from productos.models import Producto
+
+
+class ProductoResumenSerializer(serializers.ModelSerializer):
+    # Producto anidado en una categoría (?include=productos)
+    class Meta:
+        model = Producto
+        fields = ('id', 'nombre', 'precio', 'stock', 'imagen_url')
+
+
+class CategoriaSerializer(serializers.ModelSerializer):
+    # Anotado por CategoriaRepository en la misma consulta
+    total_productos = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Categoria
+        fields = ('id', 'nombre', 'descripcion', 'total_productos')
+        read_only_fields = ('id',)
+
+
+class CategoriaConProductosSerializer(CategoriaSerializer):
+    productos = ProductoResumenSerializer(source='producto_set', many=True, read_only=True)
+
+    class Meta(CategoriaSerializer.Meta):
+        fields = CategoriaSerializer.Meta.fields + ('productos',)
@@ -0,0 +1,65 @@
+from categorias.cache import CategoriaCache
+from categorias.repositories import CategoriaRepository
+from categorias.serializers import CategoriaSerializer, CategoriaConProductosSerializer
+from productos.services import ProductoService
+
+
+class CategoriaService:
+    @staticmethod
+    def _serializar(datos, incluir_productos, many=False):
+        serializer = CategoriaConProductosSerializer if incluir_productos else CategoriaSerializer
+        return serializer(datos, many=many).data
+
+    @staticmethod
+    def listar(incluir_productos=False):
+        # Entrada {'datos', 'etag'} servida desde cache
+        return CategoriaCache.obtener_o_cargar(
+            None,
+            incluir_productos,
+            lambda: CategoriaService._serializar(
+                CategoriaRepository.listar(incluir_productos), incluir_productos, many=True
+            ),
+        )
+
+    @staticmethod
+    def obtener(categoria_id, incluir_productos=False):
+        def cargar():
+            categoria = CategoriaRepository.obtener_por_id(categoria_id, incluir_productos)
+            if categoria is None:
+                return None
+            return CategoriaService._serializar(categoria, incluir_productos)
+
+        entrada = CategoriaCache.obtener_o_cargar(categoria_id, incluir_productos, cargar)
+        if entrada is None:
+            raise ValueError("Categoría no encontrada")
+        return entrada
+
+    @staticmethod
+    def crear(datos):
+        categoria = CategoriaRepository.crear(datos)
+        categoria.total_productos = 0
+        ProductoService.invalidar_categoria(categoria.id)
+        return categoria
+
+    @staticmethod
+    def actualizar(categoria_id, datos):
+        categoria, cambiados = CategoriaRepository.actualizar(categoria_id, datos)
+        if categoria is None:
+            return None
+        if cambiados:
+            # El nombre viaja dentro de cada producto: si cambia, sus detalles
+            # cacheados y los listados dejan de ser válidos
+            producto_ids = CategoriaRepository.producto_ids(categoria_id) if 'nombre' in cambiados else []
+            ProductoService.invalidar_categoria(categoria_id, producto_ids)
+        return CategoriaRepository.obtener_por_id(categoria_id)
+
+    @staticmethod
+    def eliminar(categoria_id):
+        # Los productos se borran en cascada: se recogen antes para invalidarlos
+        producto_ids = CategoriaRepository.producto_ids(categoria_id)
+        eliminado = CategoriaRepository.eliminar(categoria_id)
+        if eliminado:
+            ProductoService.invalidar_categoria(
+                categoria_id, producto_ids, [(producto_id, None, None) for producto_id in producto_ids]
+            )
+        return eliminado
@@ -1,3 +1,175 @@
-from django.test import TestCase
+from django.test import Client
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.urls import reverse
+from django.core.cache import caches
+from categorias.models import Categoria
+from productos.models import Producto
+from productos.services import ProductoService
 
-# Create your tests here.
+
+class CategoriaAPITests(APITestCase):
+    """Tests para los endpoints de categorías"""
+
+    def setUp(self):
+        caches['productos'].clear()
+        self.client = Client()
+        self.electronica = Categoria.objects.create(nombre="Electrónica", descripcion="Gadgets")
+        self.hogar = Categoria.objects.create(nombre="Hogar")
+        self.vacia = Categoria.objects.create(nombre="Jardín")
+        self.laptop = Producto.objects.create(nombre="Laptop", precio=1500, stock=3, categoria=self.electronica)
+        self.mouse = Producto.objects.create(nombre="Mouse", precio=25, stock=10, categoria=self.electronica)
+        Producto.objects.create(nombre="Mesa", precio=200, categoria=self.hogar)
+
+    def test_listar_con_conteo(self):
+        """Verifica el listado con total_productos (incluidas categorías vacías)"""
+        response = self.client.get(reverse('categorias'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(c['nombre'], c['total_productos']) for c in response.json()],
+            [("Electrónica", 2), ("Hogar", 1), ("Jardín", 0)]
+        )
+
+    def test_listar_una_consulta(self):
+        """Verifica que el conteo se anota en la misma consulta"""
+        with self.assertNumQueries(1):
+            self.client.get(reverse('categorias'))
+
+    def test_include_productos(self):
+        """Verifica ?include=productos con prefetch (dos consultas en total)"""
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('categorias'), {'include': 'productos'})
+        electronica = response.json()[0]
+        self.assertEqual([p['nombre'] for p in electronica['productos']], ["Laptop", "Mouse"])
+        self.assertEqual(response.json()[2]['productos'], [])
+
+    def test_include_invalido(self):
+        """Verifica que un include desconocido retorna 400"""
+        response = self.client.get(reverse('categorias'), {'include': 'precios'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_detalle(self):
+        """Verifica el detalle de una categoría"""
+        response = self.client.get(reverse('categoria', args=[self.electronica.id]), {'include': 'productos'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['total_productos'], 2)
+        self.assertEqual(len(response.json()['productos']), 2)
+
+    def test_detalle_inexistente(self):
+        """Verifica que una categoría inexistente retorna 404"""
+        response = self.client.get(reverse('categoria', args=[9999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cacheado(self):
+        """Verifica que la segunda lectura no consulta la base"""
+        self.client.get(reverse('categorias'))
+        self.client.get(reverse('categoria', args=[self.hogar.id]))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('categorias'))
+            self.client.get(reverse('categoria', args=[self.hogar.id]))
+
+    def test_etag_fuerte(self):
+        """Verifica el ETag fuerte y la respuesta 304"""
+        response = self.client.get(reverse('categorias'))
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        response = self.client.get(reverse('categorias'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_crear(self):
+        """Verifica POST y que el listado cacheado se renueva"""
+        self.client.get(reverse('categorias'))
+        response = self.client.post(
+            reverse('categorias'), {'nombre': "Deportes"}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['total_productos'], 0)
+        self.assertEqual(len(self.client.get(reverse('categorias')).json()), 4)
+
+    def test_crear_invalido(self):
+        """Verifica que POST sin nombre retorna 400"""
+        response = self.client.post(reverse('categorias'), {}, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_renombrar_invalida_productos(self):
+        """Verifica que renombrar una categoría renueva el detalle cacheado de sus productos"""
+        url_producto = reverse('producto', args=[self.laptop.id])
+        etag_producto = self.client.get(url_producto)['ETag']
+        etag = self.client.get(reverse('categoria', args=[self.electronica.id]))['ETag']
+
+        response = self.client.patch(
+            reverse('categoria', args=[self.electronica.id]),
+            {'nombre': "Tecnología"}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['total_productos'], 2)
+
+        # El ETag del producto cambia aunque su fila (actualizado_en) no se haya tocado
+        response = self.client.get(url_producto, HTTP_IF_NONE_MATCH=etag_producto)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['categoria']['nombre'], "Tecnología")
+        self.assertNotEqual(response['ETag'], etag_producto)
+        response = self.client.get(reverse('categoria', args=[self.electronica.id]), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['nombre'], "Tecnología")
+
+    def test_put_inexistente(self):
+        """Verifica que PUT de una categoría inexistente retorna 404"""
+        response = self.client.put(
+            reverse('categoria', args=[9999]), {'nombre': "X"}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_mutacion_de_producto_renueva_conteo(self):
+        """Verifica que crear o borrar productos renueva los conteos cacheados"""
+        self.client.get(reverse('categorias'))
+        self.client.get(reverse('categoria', args=[self.hogar.id]))
+        ProductoService.crear_producto({'nombre': "Silla", 'precio': 80, 'categoria': self.hogar})
+        ProductoService.eliminar_producto(self.mouse.id)
+
+        conteos = {c['nombre']: c['total_productos'] for c in self.client.get(reverse('categorias')).json()}
+        self.assertEqual(conteos, {"Electrónica": 1, "Hogar": 2, "Jardín": 0})
+        detalle = self.client.get(reverse('categoria', args=[self.hogar.id])).json()
+        self.assertEqual(detalle['total_productos'], 2)
+
+    def test_reserva_no_renueva_categorias(self):
+        """Verifica que una reserva de stock sólo renueva la salida que muestra el stock"""
+        url = reverse('categoria', args=[self.electronica.id])
+        self.client.get(reverse('categorias'))
+        self.client.get(url)
+        self.client.get(url, {'include': 'productos'})
+        ProductoService.reservar_stock(self.mouse.id, 4)
+        ProductoService.actualizar_producto(self.laptop.id, {'precio': 1400})
+        with self.assertNumQueries(0):
+            self.client.get(reverse('categorias'))
+            self.client.get(url)
+        productos = self.client.get(url, {'include': 'productos'}).json()['productos']
+        self.assertEqual([(p['precio'], p['stock']) for p in productos], [(1400, 3), (25, 6)])
+
+    def test_traslado_renueva_conteos(self):
+        """Verifica que mover un producto de categoría renueva los conteos de origen y destino"""
+        self.client.get(reverse('categorias'))
+        ProductoService.actualizar_producto(self.mouse.id, {'categoria': self.vacia})
+        conteos = {c['nombre']: c['total_productos'] for c in self.client.get(reverse('categorias')).json()}
+        self.assertEqual(conteos, {"Electrónica": 1, "Hogar": 1, "Jardín": 1})
+
+    def test_eliminar(self):
+        """Verifica que DELETE borra la categoría y descarta sus productos cacheados"""
+        url_producto = reverse('producto', args=[self.laptop.id])
+        self.client.get(url_producto)
+        response = self.client.delete(reverse('categoria', args=[self.electronica.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(url_producto).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(len(self.client.get(reverse('categorias')).json()), 2)
+        response = self.client.delete(reverse('categoria', args=[self.electronica.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_eliminar_quita_productos_del_autocompletado(self):
+        """Verifica que los productos borrados en cascada dejan de sugerirse"""
+        from productos.services import autocompletado
+        self.addCleanup(autocompletado.descartar)
+        url = reverse('productos-autocomplete')
+        self.assertEqual([p['nombre'] for p in self.client.get(url, {'prefix': 'la'}).json()], ["Laptop"])
+        self.client.delete(reverse('categoria', args=[self.electronica.id]))
+        self.assertEqual(self.client.get(url, {'prefix': 'la'}).json(), [])
+        self.assertEqual(self.client.get(url, {'prefix': 'me'}).json()[0]['nombre'], "Mesa")
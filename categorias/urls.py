@@ -0,0 +1,8 @@
+from django.urls import path
+from categorias.views import categorias_view, categoria_view
+
+
+urlpatterns = [
+    path('categorias/', categorias_view, name='categorias'),
+    path('categorias/<int:id>/', categoria_view, name='categoria'),
+]
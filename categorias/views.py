@@ -1,3 +1,67 @@
-from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from categorias.serializers import CategoriaSerializer
+from .services import CategoriaService
 
-# Create your views here.
+
+def _incluir_productos(request):
+    # ?include=productos anida los productos de cada categoría
+    incluir = request.GET.get('include', '')
+    if incluir not in ('', 'productos'):
+        raise ValueError(f"include no soportado: {incluir}")
+    return incluir == 'productos'
+
+
+def _respuesta_cacheada(request, entrada):
+    # GET condicional con el ETag fuerte guardado junto al payload
+    response = get_conditional_response(request, etag=entrada['etag'])
+    if response is None:
+        response = Response(entrada['datos'])
+    response['ETag'] = entrada['etag']
+    return response
+
+
+@api_view(['GET', 'POST'])
+def categorias_view(request):
+    if request.method == 'GET':
+        try:
+            entrada = CategoriaService.listar(_incluir_productos(request))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return _respuesta_cacheada(request, entrada)
+
+    serializer = CategoriaSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    categoria = CategoriaService.crear(serializer.validated_data)
+    return Response(CategoriaSerializer(categoria).data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
+def categoria_view(request, id):
+    if request.method == 'GET':
+        try:
+            incluir = _incluir_productos(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            entrada = CategoriaService.obtener(id, incluir)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        return _respuesta_cacheada(request, entrada)
+
+    if request.method == 'DELETE':
+        if CategoriaService.eliminar(id):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response({'error': "Categoría no encontrada"}, status=status.HTTP_404_NOT_FOUND)
+
+    # PUT reemplaza la categoría completa; PATCH sólo los campos enviados
+    serializer = CategoriaSerializer(data=request.data, partial=request.method == 'PATCH')
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    categoria = CategoriaService.actualizar(id, serializer.validated_data)
+    if categoria is None:
+        return Response({'error': "Categoría no encontrada"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(CategoriaSerializer(categoria).data)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ProductosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'productos'
+
+    def ready(self):
+        # SQL por petición de MetricasMiddleware: el wrapper debe estar en cada
+        # conexión desde que se abre, también en los hilos del ORM en modo ASGI
+        from servicio_productos.middleware import instrumentar_conexiones
+        instrumentar_conexiones()
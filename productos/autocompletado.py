@@ -0,0 +1,320 @@
+import bisect
+import heapq
+import itertools
+import threading
+import time
+import unicodedata
+
+# Los prefijos cortos abarcan rangos enormes del índice; su top-k se memoriza
+# hasta el siguiente cambio
+LARGO_MAXIMO_MEMORIZADO = 2
+
+# Máximo k admitido por búsqueda: cada bloque guarda sus K_MAXIMO mejores
+K_MAXIMO = 50
+
+# Tamaño objetivo de los bloques del array ordenado (se parten al doble)
+TAMANO_BLOQUE = 512
+
+# Vocales acentuadas y eñes del español; el resto de acentos va por NFKD
+_SIN_ACENTOS = str.maketrans('áéíóúüñÁÉÍÓÚÜÑ', 'aeiouunAEIOUUN')
+
+
+def normalizar(texto):
+    """Pliega mayúsculas y acentos: 'Árbol  Ñandú' -> 'arbol nandu'."""
+    texto = texto.translate(_SIN_ACENTOS)
+    if not texto.isascii():
+        descompuesto = unicodedata.normalize('NFKD', texto)
+        texto = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return ' '.join(texto.casefold().split())
+
+
+class _Bloque:
+    __slots__ = ('claves', 'ids', 'top')
+
+    def __init__(self, claves, ids):
+        self.claves = claves
+        self.ids = ids
+        self.top = []
+
+
+class IndicePrefijos:
+    """
+    Índice en memoria de nombres de producto para autocompletar.
+
+    Las claves normalizadas forman un array ordenado partido en bloques (como
+    un SortedList): el prefijo se localiza con bisect y cada bloque guarda sus
+    K_MAXIMO productos de mayor stock. Así el top-k de un rango enorme se
+    obtiene mezclando los 'top' de los bloques completos y recorriendo sólo
+    los dos bloques de los extremos. Altas, bajas y cambios de stock tocan un
+    único bloque.
+    """
+
+    def __init__(self):
+        self._bloques = []
+        self._primeras = []  # primera clave de cada bloque, para bisect
+        self._productos = {}  # id -> (clave, nombre, stock)
+        self._memorizados = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._productos)
+
+    def _stock(self, producto_id):
+        return self._productos[producto_id][2]
+
+    def _recalcular_top(self, bloque):
+        bloque.top = heapq.nlargest(K_MAXIMO, bloque.ids, key=self._stock)
+
+    def construir(self, filas):
+        # filas: iterable de (id, nombre, stock)
+        productos = {producto_id: (normalizar(nombre), nombre, stock) for producto_id, nombre, stock in filas}
+        ordenados = sorted((clave, producto_id) for producto_id, (clave, _, _) in productos.items())
+        bloques = []
+        for inicio in range(0, len(ordenados), TAMANO_BLOQUE):
+            trozo = ordenados[inicio:inicio + TAMANO_BLOQUE]
+            bloques.append(_Bloque([clave for clave, _ in trozo], [producto_id for _, producto_id in trozo]))
+        with self._lock:
+            self._productos = productos
+            self._bloques = bloques
+            self._primeras = [bloque.claves[0] for bloque in bloques]
+            self._memorizados = {}
+            for bloque in bloques:
+                self._recalcular_top(bloque)
+
+    def _bloque_de(self, clave):
+        return max(bisect.bisect_right(self._primeras, clave) - 1, 0)
+
+    def _posicion(self, clave):
+        # Primera posición (bloque, desplazamiento) con clave >= la dada
+        numero = max(bisect.bisect_left(self._primeras, clave) - 1, 0)
+        while numero < len(self._bloques):
+            desplazamiento = bisect.bisect_left(self._bloques[numero].claves, clave)
+            if desplazamiento < len(self._bloques[numero].claves):
+                return numero, desplazamiento
+            numero += 1
+        return numero, 0
+
+    def _insertar(self, producto_id, clave):
+        if not self._bloques:
+            self._bloques.append(_Bloque([], []))
+            self._primeras.append(clave)
+        numero = self._bloque_de(clave)
+        bloque = self._bloques[numero]
+        desplazamiento = bisect.bisect_right(bloque.claves, clave)
+        bloque.claves.insert(desplazamiento, clave)
+        bloque.ids.insert(desplazamiento, producto_id)
+        self._primeras[numero] = bloque.claves[0]
+
+        if len(bloque.ids) >= 2 * TAMANO_BLOQUE:
+            mitad = len(bloque.ids) // 2
+            nuevo = _Bloque(bloque.claves[mitad:], bloque.ids[mitad:])
+            del bloque.claves[mitad:], bloque.ids[mitad:]
+            self._bloques.insert(numero + 1, nuevo)
+            self._primeras.insert(numero + 1, nuevo.claves[0])
+            self._recalcular_top(nuevo)
+        self._recalcular_top(bloque)
+
+    def _quitar(self, producto_id):
+        clave = self._productos.pop(producto_id)[0]
+        numero, desplazamiento = self._posicion(clave)
+        while self._bloques[numero].ids[desplazamiento] != producto_id:
+            desplazamiento += 1
+            if desplazamiento == len(self._bloques[numero].ids):
+                numero, desplazamiento = numero + 1, 0
+        bloque = self._bloques[numero]
+        del bloque.claves[desplazamiento], bloque.ids[desplazamiento]
+        if bloque.ids:
+            self._primeras[numero] = bloque.claves[0]
+            if producto_id in bloque.top:
+                self._recalcular_top(bloque)
+        else:
+            del self._bloques[numero], self._primeras[numero]
+
+    def guardar(self, producto_id, nombre, stock):
+        with self._lock:
+            self._memorizados = {}
+            anterior = self._productos.get(producto_id)
+            if anterior is not None and anterior[1] == nombre:
+                # Sólo cambió el stock: la posición no se mueve, sólo el top del bloque
+                self._productos[producto_id] = (anterior[0], nombre, stock)
+                numero, desplazamiento = self._posicion(anterior[0])
+                while producto_id not in self._bloques[numero].ids:
+                    numero += 1
+                self._recalcular_top(self._bloques[numero])
+                return
+            if anterior is not None:
+                self._quitar(producto_id)
+            clave = normalizar(nombre)
+            self._productos[producto_id] = (clave, nombre, stock)
+            self._insertar(producto_id, clave)
+
+    def eliminar(self, producto_id):
+        with self._lock:
+            if producto_id in self._productos:
+                self._memorizados = {}
+                self._quitar(producto_id)
+
+    def aplicar(self, cambios):
+        """
+        Aplica cambios por fila (id, nombre, stock): None en nombre o stock
+        conserva el valor actual y (id, None, None) es una baja. Un cambio
+        parcial de un producto que el índice no conoce se ignora (lo recoge la
+        siguiente reconstrucción).
+        """
+        with self._lock:
+            for producto_id, nombre, stock in cambios:
+                if nombre is None and stock is None:
+                    self.eliminar(producto_id)
+                    continue
+                anterior = self._productos.get(producto_id)
+                if anterior is None and (nombre is None or stock is None):
+                    continue
+                self.guardar(
+                    producto_id,
+                    anterior[1] if nombre is None else nombre,
+                    anterior[2] if stock is None else stock,
+                )
+
+    def buscar(self, prefijo, k=10):
+        """Los k productos de mayor stock cuyo nombre empieza por el prefijo."""
+        prefijo = normalizar(prefijo)
+        k = min(k, K_MAXIMO)
+        if not prefijo:
+            return []
+
+        with self._lock:
+            memorizado = self._memorizados.get((prefijo, k))
+            if memorizado is not None:
+                return memorizado
+
+            bloque_ini, desde = self._posicion(prefijo)
+            bloque_fin, hasta = self._posicion(prefijo + '\U0010ffff')
+            bloques = self._bloques
+
+            if bloque_ini == bloque_fin:
+                candidatos = bloques[bloque_ini].ids[desde:hasta] if bloque_ini < len(bloques) else []
+            else:
+                # Extremos parciales recorridos; bloques completos vía su top precalculado
+                candidatos = bloques[bloque_ini].ids[desde:]
+                if bloque_fin < len(bloques):
+                    candidatos.extend(bloques[bloque_fin].ids[:hasta])
+                completos = [bloques[n].top for n in range(bloque_ini + 1, bloque_fin)]
+                if completos:
+                    mezcla = heapq.merge(*completos, key=self._stock, reverse=True)
+                    candidatos.extend(itertools.islice(mezcla, k))
+
+            productos = self._productos
+            mejores = heapq.nlargest(k, candidatos, key=self._stock)
+            resultado = [{'id': producto_id, 'nombre': productos[producto_id][1]} for producto_id in mejores]
+
+            if len(prefijo) <= LARGO_MAXIMO_MEMORIZADO:
+                self._memorizados[(prefijo, k)] = resultado
+            return resultado
+
+
+class AutocompletadoCatalogo:
+    """
+    Mantiene un IndicePrefijos sincronizado con la base de datos.
+
+    - Se construye en la primera búsqueda del proceso (la única vez que una
+      petición espera a la carga completa).
+    - Cada mutación publica sus cambios por fila en un diario compartido
+      (`cambios`, ver productos/cache.CambiosAutocompletado) y los aplica al
+      índice local con refrescar(); no hace falta volver a leer la fila.
+    - Como mucho cada `verificar_cada` segundos se aplican los cambios que
+      otros procesos publicaron en el diario.
+    - La carga completa sólo se repite, en un hilo de fondo y sin bloquear
+      las búsquedas, si faltan entradas del diario o tras `max_antiguedad`.
+    """
+
+    def __init__(self, cargar_todo, cambios, verificar_cada=5, max_antiguedad=600, al_terminar_hilo=None):
+        self._cargar_todo = cargar_todo
+        self._cambios = cambios
+        self.verificar_cada = verificar_cada
+        self.max_antiguedad = max_antiguedad
+        self._al_terminar_hilo = al_terminar_hilo
+        self.indice = None
+        self._secuencia = 0
+        self._construido_en = 0.0
+        self._verificado_en = 0.0
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    def _construir(self):
+        # La secuencia se lee antes de cargar: lo publicado durante la carga se reaplica
+        secuencia = self._cambios.secuencia()
+        indice = IndicePrefijos()
+        indice.construir(self._cargar_todo())
+        return indice, secuencia
+
+    def _ponerse_al_dia(self, indice, desde):
+        # Aplica el diario desde `desde`; devuelve la nueva secuencia o None si hay huecos
+        hasta = self._cambios.secuencia()
+        if hasta == desde:
+            return hasta
+        cambios = self._cambios.leer(desde, hasta)
+        if cambios is None:
+            return None
+        indice.aplicar(cambios)
+        return hasta
+
+    def _reconstruir_en_fondo(self):
+        try:
+            indice, secuencia = self._construir()
+            with self._lock:
+                al_dia = self._ponerse_al_dia(indice, secuencia)
+                # Con huecos el índice recién cargado es igual de reciente: se sigue desde ahora
+                self._secuencia = self._cambios.secuencia() if al_dia is None else al_dia
+                self.indice = indice
+                self._construido_en = self._verificado_en = time.monotonic()
+        finally:
+            self._hilo = None
+            if self._al_terminar_hilo is not None:
+                self._al_terminar_hilo()
+
+    def _programar_reconstruccion(self):
+        # Llamado con self._lock tomado; mientras tanto se sigue usando el índice actual
+        if self._hilo is None:
+            self._hilo = threading.Thread(
+                target=self._reconstruir_en_fondo, name='autocompletado-reconstruccion', daemon=True
+            )
+            self._hilo.start()
+
+    def _asegurar_actualizado(self):
+        ahora = time.monotonic()
+        if self.indice is not None and ahora - self._verificado_en < self.verificar_cada:
+            return
+        with self._lock:
+            if self.indice is None:
+                self.indice, self._secuencia = self._construir()
+                self._construido_en = self._verificado_en = ahora
+            elif ahora - self._verificado_en >= self.verificar_cada:
+                self._verificado_en = ahora
+                secuencia = self._ponerse_al_dia(self.indice, self._secuencia)
+                if secuencia is None or ahora - self._construido_en > self.max_antiguedad:
+                    self._programar_reconstruccion()
+                else:
+                    self._secuencia = secuencia
+
+    def buscar(self, prefijo, k=10):
+        self._asegurar_actualizado()
+        return self.indice.buscar(prefijo, k)
+
+    def refrescar(self, cambios):
+        # Cambios de este proceso: se publican para el resto y se aplican ya aquí
+        if not cambios:
+            return
+        secuencia = self._cambios.publicar(cambios)
+        indice = self.indice
+        if indice is None:
+            return
+        indice.aplicar(cambios)
+        with self._lock:
+            if self._secuencia == secuencia - 1:
+                # Nadie publicó entre medias: no hay nada que reaplicar
+                self._secuencia = secuencia
+
+    def descartar(self):
+        with self._lock:
+            self.indice = None
+            self._secuencia = 0
@@ -0,0 +1,151 @@
+import random
+import time
+from contextlib import contextmanager
+
+from django.test.utils import setup_databases, teardown_databases
+
+from categorias.models import Categoria
+from productos.models import Producto
+
+
+@contextmanager
+def base_de_datos_temporal(verbosity=0):
+    # Los benchmarks nunca escriben en la base real: crean (y luego destruyen)
+    # una base de test con el mismo motor configurado en settings.DATABASES.
+    configuracion = setup_databases(verbosity, interactive=False, aliases={'default'})
+    try:
+        yield
+    finally:
+        teardown_databases(configuracion, verbosity)
+
+
+def sembrar_productos(n, num_categorias=8, lote=5000, semilla=0):
+    aleatorio = random.Random(semilla)
+    categorias = Categoria.objects.bulk_create(
+        [Categoria(nombre=f"Categoría {i}") for i in range(num_categorias)]
+    )
+    for inicio in range(0, n, lote):
+        Producto.objects.bulk_create([
+            Producto(
+                nombre=f"Producto {i}",
+                descripcion=f"Descripción del producto {i}",
+                precio=aleatorio.randint(1, 2000),
+                stock=aleatorio.randint(0, 500),
+                imagen_url=f"https://picsum.photos/400/300?random={i}",
+                categoria=aleatorio.choice(categorias),
+            )
+            for i in range(inicio, min(inicio + lote, n))
+        ])
+
+
+def cronometrar(funcion, repeticiones=3):
+    # Devuelve el mejor tiempo (segundos) y el resultado de la última ejecución
+    mejor, resultado = None, None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor, resultado
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def _es_deadlock(error):
+    causa = getattr(error, '__cause__', None)
+    return getattr(causa, 'sqlstate', None) == '40P01' or 'deadlock' in str(error).lower()
+
+
+def estresar_reservas(producto_ids, hilos=8, carritos_por_hilo=50, tamano_carrito=3, semilla=0,
+                      max_reintentos=20):
+    """
+    Lanza carritos concurrentes contra ProductoService.reservar_carrito.
+
+    Cada hilo alterna carritos en orden ascendente y descendente de IDs, que es
+    justo el patrón que provoca deadlocks si los bloqueos no se toman en orden.
+    Un carrito que sigue fallando por bloqueo tras `max_reintentos` intentos se
+    abandona y cuenta en 'abandonados'. Devuelve métricas: reservas, rechazos
+    por stock, deadlocks, reintentos, abandonados y carritos por segundo.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from django.db import OperationalError, connection
+
+    from productos.services import ProductoService, StockInsuficiente
+
+    def trabajador(numero):
+        aleatorio = random.Random(semilla + numero)
+        metricas = {'reservas': 0, 'sin_stock': 0, 'deadlocks': 0, 'reintentos': 0, 'abandonados': 0}
+        try:
+            for i in range(carritos_por_hilo):
+                ids = aleatorio.sample(producto_ids, min(tamano_carrito, len(producto_ids)))
+                ids.sort(reverse=bool(i % 2))
+                items = [{'id': producto_id, 'cantidad': 1} for producto_id in ids]
+                for intento in range(max_reintentos + 1):
+                    try:
+                        ProductoService.reservar_carrito(items)
+                        metricas['reservas'] += 1
+                        break
+                    except StockInsuficiente:
+                        metricas['sin_stock'] += 1
+                        break
+                    except OperationalError as error:
+                        # Deadlock en PostgreSQL o tabla bloqueada en SQLite: reintento
+                        # con una espera aleatoria que crece con cada intento
+                        metricas['deadlocks' if _es_deadlock(error) else 'reintentos'] += 1
+                        time.sleep(aleatorio.uniform(0, 0.005 * (intento + 1)))
+                else:
+                    metricas['abandonados'] += 1
+        finally:
+            connection.close()
+        return metricas
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+        resultados = list(ejecutor.map(trabajador, range(hilos)))
+    duracion = time.perf_counter() - inicio
+
+    totales = {clave: sum(r[clave] for r in resultados) for clave in resultados[0]}
+    totales['segundos'] = duracion
+    totales['carritos_por_segundo'] = (totales['reservas'] + totales['sin_stock']) / duracion
+    return totales
+
+
+def resumir_latencias(segundos):
+    milisegundos = [s * 1000 for s in segundos]
+    return {
+        'p50_ms': round(percentil(milisegundos, 0.50), 3),
+        'p95_ms': round(percentil(milisegundos, 0.95), 3),
+        'p99_ms': round(percentil(milisegundos, 0.99), 3),
+    }
+
+
+def comparar_con_base(actual, base, tolerancia_latencia=0.5, margen_ms=1.0,
+                      tolerancia_memoria=0.5, margen_memoria_kb=64):
+    """
+    Regresiones de `actual` frente a `base` ({escenario: métricas}).
+
+    - Latencias (p50/p95/p99): más de un `tolerancia_latencia` relativo y más
+      de `margen_ms` absolutos (por debajo del milisegundo domina el ruido).
+    - Consultas por petición: cualquier aumento (es una métrica exacta).
+    - Memoria pico: igual que la latencia, con `margen_memoria_kb`.
+    Los escenarios que no están en la base no se comparan.
+    """
+    regresiones = []
+    for escenario, metricas in actual.items():
+        anterior = base.get(escenario)
+        if anterior is None:
+            continue
+        for clave in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if (metricas[clave] > anterior[clave] * (1 + tolerancia_latencia)
+                    and metricas[clave] - anterior[clave] > margen_ms):
+                regresiones.append(f"{escenario}: {clave} {anterior[clave]} -> {metricas[clave]}")
+        if metricas['consultas'] > anterior['consultas']:
+            regresiones.append(f"{escenario}: consultas {anterior['consultas']} -> {metricas['consultas']}")
+        if (metricas['memoria_kb'] > anterior['memoria_kb'] * (1 + tolerancia_memoria)
+                and metricas['memoria_kb'] - anterior['memoria_kb'] > margen_memoria_kb):
+            regresiones.append(f"{escenario}: memoria_kb {anterior['memoria_kb']} -> {metricas['memoria_kb']}")
+    return regresiones
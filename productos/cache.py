@@ -0,0 +1,326 @@
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.serializers.json import DjangoJSONEncoder
+
+from servicio_productos.routers import usar_primaria
+
+ALIAS = 'productos'
+
+# Marcador que se guarda en lugar del payload cuando el producto no existe
+_NO_ENCONTRADO = '__no_encontrado__'
+
+
+class ProductoCache:
+    """
+    Cache read-through del detalle de producto.
+
+    Cada entrada es {'datos': payload serializado, 'etag': huella del payload}.
+    El ETag sale del cuerpo y no de actualizado_en: renombrar la categoría
+    cambia el detalle sin tocar la fila del producto.
+
+    Usa el framework de cache de Django (alias 'productos'): locmem en tests y
+    desarrollo, un backend compartido en producción. El TTL y el límite de
+    entradas (LRU) se configuran en settings.CACHES.
+
+    Los fallos se cargan siempre de la primaria: una entrada leída de una
+    réplica con retraso se serviría también a quien acaba de escribir.
+    """
+    _contadores = Counter()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _cache():
+        return caches[ALIAS]
+
+    @staticmethod
+    def clave(producto_id):
+        # v2: entradas con 'etag' (las anteriores guardaban 'modificado')
+        return f"detalle:v2:{producto_id}"
+
+    @staticmethod
+    def etag(producto_id, datos):
+        cuerpo = json.dumps(datos, sort_keys=True, cls=DjangoJSONEncoder)
+        return f'"{producto_id}-{hashlib.sha1(cuerpo.encode()).hexdigest()[:24]}"'
+
+    @classmethod
+    def _contar(cls, evento):
+        with cls._lock:
+            cls._contadores[evento] += 1
+
+    @classmethod
+    def _registrar_lectura(cls, valor):
+        # Traduce el valor cacheado y cuenta el hit/miss; devuelve (encontrado, payload)
+        if valor == _NO_ENCONTRADO:
+            cls._contar('hits_no_encontrado')
+            return True, None
+        if valor is not None:
+            cls._contar('hits')
+            return True, valor
+        cls._contar('misses')
+        return False, None
+
+    @staticmethod
+    def _timeout(valor):
+        # Los 404 se recuerdan menos tiempo que los payloads
+        return settings.CACHE_PRODUCTOS_TTL_NO_ENCONTRADO if valor is None else DEFAULT_TIMEOUT
+
+    @classmethod
+    def obtener_o_cargar(cls, producto_id, cargar):
+        # Devuelve el payload cacheado o lo obtiene con cargar(); None si no existe
+        clave = cls.clave(producto_id)
+        encontrado, valor = cls._registrar_lectura(cls._cache().get(clave))
+        if encontrado:
+            return valor
+
+        with usar_primaria():
+            valor = cargar()
+        cls._cache().set(clave, _NO_ENCONTRADO if valor is None else valor, cls._timeout(valor))
+        return valor
+
+    @classmethod
+    async def aobtener_o_cargar(cls, producto_id, cargar):
+        # Versión asíncrona: cargar es una corrutina
+        clave = cls.clave(producto_id)
+        encontrado, valor = cls._registrar_lectura(await cls._cache().aget(clave))
+        if encontrado:
+            return valor
+
+        with usar_primaria():
+            valor = await cargar()
+        await cls._cache().aset(clave, _NO_ENCONTRADO if valor is None else valor, cls._timeout(valor))
+        return valor
+
+    @classmethod
+    def _separar_varios(cls, producto_ids, cacheados):
+        # {clave: valor} de get_many -> ({id: payload o None}, ids pendientes de cargar)
+        resultado = {}
+        for producto_id in producto_ids:
+            valor = cacheados.get(cls.clave(producto_id))
+            if valor is not None:
+                resultado[producto_id] = None if valor == _NO_ENCONTRADO else valor
+        hits_no_encontrado = sum(1 for valor in cacheados.values() if valor == _NO_ENCONTRADO)
+        pendientes = [producto_id for producto_id in producto_ids if producto_id not in resultado]
+        with cls._lock:
+            cls._contadores['hits'] += len(cacheados) - hits_no_encontrado
+            cls._contadores['hits_no_encontrado'] += hits_no_encontrado
+            cls._contadores['misses'] += len(pendientes)
+        return resultado, pendientes
+
+    @classmethod
+    def _entradas_cargadas(cls, pendientes, cargados):
+        # (payloads a guardar, marcadores 404 a guardar) para set_many
+        no_encontrados = [producto_id for producto_id in pendientes if producto_id not in cargados]
+        return (
+            {cls.clave(producto_id): valor for producto_id, valor in cargados.items()},
+            {cls.clave(producto_id): _NO_ENCONTRADO for producto_id in no_encontrados},
+        )
+
+    @classmethod
+    def obtener_o_cargar_varios(cls, producto_ids, cargar_varios):
+        """
+        Versión por lotes de obtener_o_cargar: un get_many a la cache y, para
+        los que falten, una sola llamada a cargar_varios(ids) -> {id: payload}.
+        Devuelve {id: payload o None si no existe}.
+        """
+        cacheados = cls._cache().get_many([cls.clave(producto_id) for producto_id in producto_ids])
+        resultado, pendientes = cls._separar_varios(producto_ids, cacheados)
+        if pendientes:
+            with usar_primaria():
+                cargados = cargar_varios(pendientes)
+            payloads, marcadores = cls._entradas_cargadas(pendientes, cargados)
+            cls._cache().set_many(payloads)
+            cls._cache().set_many(marcadores, settings.CACHE_PRODUCTOS_TTL_NO_ENCONTRADO)
+            resultado.update({producto_id: cargados.get(producto_id) for producto_id in pendientes})
+        return resultado
+
+    @classmethod
+    async def aobtener_o_cargar_varios(cls, producto_ids, cargar_varios):
+        # Versión asíncrona: cargar_varios es una corrutina
+        cacheados = await cls._cache().aget_many([cls.clave(producto_id) for producto_id in producto_ids])
+        resultado, pendientes = cls._separar_varios(producto_ids, cacheados)
+        if pendientes:
+            with usar_primaria():
+                cargados = await cargar_varios(pendientes)
+            payloads, marcadores = cls._entradas_cargadas(pendientes, cargados)
+            await cls._cache().aset_many(payloads)
+            await cls._cache().aset_many(marcadores, settings.CACHE_PRODUCTOS_TTL_NO_ENCONTRADO)
+            resultado.update({producto_id: cargados.get(producto_id) for producto_id in pendientes})
+        return resultado
+
+    @classmethod
+    def invalidar(cls, *producto_ids):
+        cls._cache().delete_many([cls.clave(producto_id) for producto_id in producto_ids])
+        with cls._lock:
+            cls._contadores['invalidaciones'] += len(producto_ids)
+
+    @classmethod
+    def estadisticas(cls):
+        with cls._lock:
+            contadores = dict(cls._contadores)
+        hits = contadores.get('hits', 0) + contadores.get('hits_no_encontrado', 0)
+        misses = contadores.get('misses', 0)
+        return {
+            'hits': contadores.get('hits', 0),
+            'hits_no_encontrado': contadores.get('hits_no_encontrado', 0),
+            'misses': misses,
+            'invalidaciones': contadores.get('invalidaciones', 0),
+            'ratio_hits': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        }
+
+    @classmethod
+    def reiniciar_estadisticas(cls):
+        with cls._lock:
+            cls._contadores.clear()
+
+
+class VersionCatalogo:
+    """
+    Marcadores de versión del catálogo completo y de cada categoría.
+
+    Son timestamps que el servicio renueva en cada mutación; las vistas los
+    usan como ETag de los listados sin consultar la base (sólo con una cache
+    compartida, ver settings.CACHE_VERSIONES_COMPARTIDAS).
+    Si un marcador no existe (arranque o expulsión de la cache) se crea con
+    la hora actual, lo que como mucho provoca una respuesta 200 de más.
+    """
+
+    @staticmethod
+    def _cache():
+        return caches[ALIAS]
+
+    @staticmethod
+    def clave(categoria_id=None):
+        if categoria_id is None:
+            return "version:catalogo"
+        return f"version:categoria:{categoria_id}"
+
+    @classmethod
+    def obtener(cls, categoria_id=None):
+        clave = cls.clave(categoria_id)
+        version = cls._cache().get(clave)
+        if version is None:
+            cls._cache().add(clave, time.time(), None)
+            version = cls._cache().get(clave)
+        return version
+
+    @classmethod
+    async def aobtener(cls, categoria_id=None):
+        clave = cls.clave(categoria_id)
+        version = await cls._cache().aget(clave)
+        if version is None:
+            await cls._cache().aadd(clave, time.time(), None)
+            version = await cls._cache().aget(clave)
+        return version
+
+    @classmethod
+    def incrementar(cls, categoria_ids=()):
+        # Toda mutación cambia el catálogo y, además, las categorías afectadas
+        ahora = time.time()
+        claves = [cls.clave()] + [cls.clave(categoria_id) for categoria_id in set(categoria_ids)]
+        cls._cache().set_many({clave: ahora for clave in claves}, None)
+        return ahora
+
+
+class VersionCategorias(VersionCatalogo):
+    """
+    Versiones de la API de categorías (sin ?include=productos): sólo cambian
+    con lo que esa salida muestra, es decir, el nombre de la categoría y su
+    recuento de productos. Una reserva de stock no las renueva.
+    """
+
+    @staticmethod
+    def clave(categoria_id=None):
+        if categoria_id is None:
+            return "version:categorias"
+        return f"version:categorias:{categoria_id}"
+
+
+class CambiosAutocompletado:
+    """
+    Diario de cambios por fila del índice de autocompletado.
+
+    Cada mutación publica una entrada con sus cambios (id, nombre, stock) bajo
+    un número de secuencia creciente; cada proceso aplica las entradas que le
+    faltan sin consultar la base. Si una entrada ya no está (expiró, se expulsó
+    o el proceso va demasiado atrasado) leer() devuelve None y el índice se
+    reconstruye. Con locmem el diario es por proceso: el resto de procesos sólo
+    se pone al día en la reconstrucción periódica.
+    """
+    TTL = 60 * 60
+    MAX_ENTRADAS = 5000
+
+    @staticmethod
+    def _cache():
+        return caches[ALIAS]
+
+    @staticmethod
+    def clave(secuencia=None):
+        if secuencia is None:
+            return "autocompletado:secuencia"
+        return f"autocompletado:cambio:{secuencia}"
+
+    @classmethod
+    def secuencia(cls):
+        return cls._cache().get(cls.clave(), 0)
+
+    @classmethod
+    def publicar(cls, cambios):
+        cache = cls._cache()
+        cache.add(cls.clave(), 0, None)
+        try:
+            secuencia = cache.incr(cls.clave())
+        except ValueError:
+            # El contador se expulsó entre add() e incr(): se reinicia (los
+            # procesos que vayan por delante lo detectan y reconstruyen)
+            cache.add(cls.clave(), 0, None)
+            secuencia = cache.incr(cls.clave())
+        cache.set(cls.clave(secuencia), list(cambios), cls.TTL)
+        return secuencia
+
+    @classmethod
+    def leer(cls, desde, hasta):
+        # Cambios de las entradas desde+1 .. hasta, en orden; None si falta alguna
+        if hasta < desde or hasta - desde > cls.MAX_ENTRADAS:
+            return None
+        claves = [cls.clave(secuencia) for secuencia in range(desde + 1, hasta + 1)]
+        entradas = cls._cache().get_many(claves)
+        if len(entradas) != len(claves):
+            return None
+        return [cambio for clave in claves for cambio in entradas[clave]]
+
+
+class FacetasCache:
+    """
+    Facetas del listado cacheadas por combinación de filtros.
+
+    La clave incluye la versión del catálogo (o de la categoría filtrada):
+    cualquier mutación de productos la renueva, así las entradas viejas dejan
+    de leerse sin borrarlas una a una y expiran solas por TTL.
+    """
+
+    @staticmethod
+    def _cache():
+        return caches[ALIAS]
+
+    @staticmethod
+    def clave(version, parametros):
+        huella = hashlib.sha1(repr(sorted(parametros.items())).encode()).hexdigest()[:24]
+        return f"facetas:{version}:{huella}"
+
+    @classmethod
+    def obtener_o_calcular(cls, version, parametros, calcular):
+        clave = cls.clave(version, parametros)
+        valor = cls._cache().get(clave)
+        if valor is None:
+            # Se guarda bajo la versión actual: se calcula con datos de la primaria
+            with usar_primaria():
+                valor = calcular()
+            cls._cache().set(clave, valor)
+        return valor
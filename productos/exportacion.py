@@ -0,0 +1,50 @@
+import json
+
+from productos.serializers import ProductoListaSerializer
+
+FORMATOS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+# Cuántas filas se agrupan en cada trozo que se entrega al servidor WSGI
+FILAS_POR_TROZO = 500
+
+
+def _codificar(fila):
+    representacion = ProductoListaSerializer.to_representation(fila)
+    return json.dumps(representacion, ensure_ascii=False, separators=(',', ':'))
+
+
+def _agrupar(lineas):
+    trozo = []
+    for linea in lineas:
+        trozo.append(linea)
+        if len(trozo) >= FILAS_POR_TROZO:
+            yield ''.join(trozo).encode('utf-8')
+            trozo = []
+    if trozo:
+        yield ''.join(trozo).encode('utf-8')
+
+
+def generar_ndjson(filas):
+    """Un producto por línea; el cliente puede procesarlo a medida que llega."""
+    return _agrupar(f"{_codificar(fila)}\n" for fila in filas)
+
+
+def generar_json(filas):
+    """Un único array JSON, emitido elemento a elemento."""
+    def lineas():
+        yield '['
+        separador = ''
+        for fila in filas:
+            yield f"{separador}{_codificar(fila)}"
+            separador = ','
+        yield ']'
+    return _agrupar(lineas())
+
+
+def generar(formato, filas):
+    if formato == 'json':
+        return generar_json(filas)
+    return generar_ndjson(filas)
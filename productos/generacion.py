@@ -0,0 +1,95 @@
+"""
+Generación determinista de productos de prueba, sin Django.
+
+Cada lote depende sólo de (semilla, número de lote, tamaño de lote), así que
+los lotes se pueden generar en cualquier orden y en cualquier proceso y el
+resultado es el mismo. Los procesos hijos importan este módulo sin cargar
+Django (ver el comando generar_datos).
+"""
+import random
+from datetime import datetime, timezone
+
+from faker import Faker
+
+CATEGORIAS = ['Tecnología', 'Ropa', 'Hogar', 'Deportes', 'Salud', 'Libros', 'Mascotas', 'Juguetes']
+
+# Faker es lento (decenas de µs por texto): se genera una vez un repertorio de
+# frases y textos por semilla y cada fila elige de él
+TAMANO_REPERTORIO = 2000
+
+COLUMNAS = (
+    'nombre', 'descripcion', 'precio', 'stock', 'reservado', 'categoria_id', 'imagen_url', 'actualizado_en'
+)
+
+_repertorios = {}
+
+
+def repertorio(semilla):
+    if semilla not in _repertorios:
+        fake = Faker('es_ES')
+        fake.seed_instance(semilla)
+        _repertorios[semilla] = (
+            [fake.catch_phrase() for _ in range(TAMANO_REPERTORIO)],
+            [fake.text(max_nb_chars=100) for _ in range(TAMANO_REPERTORIO)],
+        )
+    return _repertorios[semilla]
+
+
+def rango_lote(numero, tamano, total):
+    inicio = numero * tamano
+    return inicio, min(inicio + tamano, total)
+
+
+def generar_lote(numero, tamano, total, semilla, categoria_ids):
+    """Filas (en el orden de COLUMNAS) del lote `numero`."""
+    frases, textos = repertorio(semilla)
+    aleatorio = random.Random(f'{semilla}:{numero}')
+    ahora = datetime.now(timezone.utc)
+    inicio, fin = rango_lote(numero, tamano, total)
+    filas = []
+    for i in range(inicio, fin):
+        # El índice global hace único el nombre sin fake.unique (que se agota)
+        filas.append((
+            f'{aleatorio.choice(frases)} {i}',
+            aleatorio.choice(textos),
+            aleatorio.randint(5, 2000),
+            aleatorio.randint(1, 500),
+            0,
+            aleatorio.choice(categoria_ids),
+            f'https://picsum.photos/400/300?random={aleatorio.randint(1, 1000)}',
+            ahora,
+        ))
+    return filas
+
+
+# Conexión de este proceso para copiar_lote: una por worker, no una por lote
+_conexion = None
+
+
+def conectar(conn_params):
+    """initializer del Pool: abre la conexión que reutilizan todos los lotes del proceso."""
+    global _conexion
+    import psycopg
+    from multiprocessing import util
+
+    _conexion = psycopg.connect(**conn_params)
+    # Los workers del Pool no cierran nada al terminar: se cierra con los finalizadores
+    util.Finalize(None, desconectar, exitpriority=10)
+
+
+def desconectar():
+    global _conexion
+    if _conexion is not None:
+        _conexion.close()
+        _conexion = None
+
+
+def copiar_lote(tabla, numero, tamano, total, semilla, categoria_ids):
+    """Genera el lote y lo inserta con COPY en la conexión del proceso (PostgreSQL)."""
+    filas = generar_lote(numero, tamano, total, semilla, categoria_ids)
+    with _conexion.cursor() as cursor:
+        with cursor.copy(f'COPY {tabla} ({", ".join(COLUMNAS)}) FROM STDIN') as copia:
+            for fila in filas:
+                copia.write_row(fila)
+    _conexion.commit()
+    return len(filas)
@@ -0,0 +1,165 @@
+"""
+Pipeline de importación de catálogos de proveedor (ver importar_catalogo).
+
+Todo son generadores encadenados: leer (CSV / NDJSON) -> validar -> lotes.
+Sólo hay en memoria el lote en curso y el mapa de categorías, así que el
+tamaño del fichero no importa.
+"""
+import csv
+import itertools
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+
+from categorias.services import CategoriaService
+from categorias.repositories import CategoriaRepository
+from productos.models import MAX_ENTERO
+from servicio_productos.routers import usar_primaria
+
+# Columnas del feed. El feed es la fuente de verdad: una opcional ausente
+# deja el valor por defecto también al actualizar.
+OBLIGATORIAS = ('sku', 'nombre', 'precio', 'categoria')
+OPCIONALES = {'descripcion': '', 'stock': 0, 'imagen_url': ''}
+
+MAX_SKU = 64
+MAX_NOMBRE = 200
+MAX_URL = 200
+
+_validar_url = URLValidator()
+
+
+class DemasiadosErrores(ValueError):
+    pass
+
+
+class ErroresImportacion:
+    """Cuenta las filas rechazadas y guarda las primeras para el informe."""
+
+    def __init__(self, maximo=1000, guardar=20):
+        self.maximo = maximo
+        self.guardar = guardar
+        self.total = 0
+        self.primeros = []
+
+    def registrar(self, linea, motivo):
+        self.total += 1
+        if len(self.primeros) < self.guardar:
+            self.primeros.append((linea, motivo))
+        if self.maximo is not None and self.total > self.maximo:
+            raise DemasiadosErrores(f"Más de {self.maximo} filas con errores (última: línea {linea}: {motivo})")
+
+
+class MapaCategorias:
+    """
+    Nombre de categoría -> id, sin distinguir mayúsculas ni espacios extra.
+    Se carga una vez; las categorías que faltan se crean la primera vez que aparecen.
+    """
+
+    def __init__(self):
+        # De la primaria: con una réplica atrasada se volverían a crear categorías existentes
+        with usar_primaria():
+            nombres = CategoriaRepository.ids_por_nombre()
+        self._ids = {self._clave(nombre): id for nombre, id in nombres.items()}
+        self.creadas = []
+
+    @staticmethod
+    def _clave(nombre):
+        return ' '.join(nombre.casefold().split())
+
+    def resolver(self, nombre):
+        clave = self._clave(nombre)
+        if clave not in self._ids:
+            nombre = ' '.join(nombre.split())
+            self._ids[clave] = CategoriaService.crear({'nombre': nombre}).id
+            self.creadas.append(nombre)
+        return self._ids[clave]
+
+
+def leer_csv(archivo, delimitador=','):
+    lector = csv.DictReader(archivo, delimiter=delimitador)
+    for fila in lector:
+        # line_num: línea física donde termina el registro (admite saltos entre comillas)
+        yield lector.line_num, fila
+
+
+def leer_ndjson(archivo):
+    for numero, linea in enumerate(archivo, 1):
+        if not linea.strip():
+            continue
+        try:
+            fila = json.loads(linea)
+        except ValueError:
+            fila = None
+        yield numero, fila
+
+
+def _entero(valor, campo):
+    if isinstance(valor, bool):
+        raise ValueError(f"'{campo}' debe ser un entero")
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    try:
+        numero = int(str(valor).strip())
+    except ValueError:
+        raise ValueError(f"'{campo}' debe ser un entero") from None
+    if numero < 0:
+        raise ValueError(f"'{campo}' no puede ser negativo")
+    if numero > MAX_ENTERO:
+        raise ValueError(f"'{campo}' supera {MAX_ENTERO}")
+    return numero
+
+
+def _texto(fila, campo, maximo=None):
+    valor = fila.get(campo)
+    valor = '' if valor is None else str(valor).strip()
+    if maximo is not None and len(valor) > maximo:
+        raise ValueError(f"'{campo}' supera {maximo} caracteres")
+    return valor
+
+
+def _url(fila, campo):
+    # Mismas reglas que el URLField del modelo; vacía está permitida
+    valor = _texto(fila, campo, MAX_URL)
+    if valor:
+        try:
+            _validar_url(valor)
+        except ValidationError:
+            raise ValueError(f"'{campo}' no es una URL válida") from None
+    return valor
+
+
+def validar_fila(fila):
+    """Datos de Producto (con 'categoria' aún como nombre) o ValueError."""
+    if not isinstance(fila, dict):
+        raise ValueError("Fila ilegible")
+    faltantes = [campo for campo in OBLIGATORIAS if fila.get(campo) in (None, '')]
+    if faltantes:
+        raise ValueError(f"Faltan: {', '.join(faltantes)}")
+    stock = fila.get('stock')
+    return {
+        'sku': _texto(fila, 'sku', MAX_SKU),
+        'nombre': _texto(fila, 'nombre', MAX_NOMBRE),
+        'precio': _entero(fila['precio'], 'precio'),
+        'stock': OPCIONALES['stock'] if stock in (None, '') else _entero(stock, 'stock'),
+        'descripcion': _texto(fila, 'descripcion'),
+        'imagen_url': _url(fila, 'imagen_url'),
+        'categoria': _texto(fila, 'categoria'),
+    }
+
+
+def validar(filas, mapa, errores):
+    for linea, fila in filas:
+        try:
+            datos = validar_fila(fila)
+        except ValueError as e:
+            errores.registrar(linea, str(e))
+            continue
+        datos['categoria_id'] = mapa.resolver(datos.pop('categoria'))
+        yield datos
+
+
+def en_lotes(iterable, tamano):
+    iterador = iter(iterable)
+    while lote := list(itertools.islice(iterador, tamano)):
+        yield lote
@@ -0,0 +1,125 @@
+import asyncio
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client, override_settings
+
+from productos.benchmarks import base_de_datos_temporal, percentil, sembrar_productos
+from productos.models import Producto
+
+
+def _latencia_simulada(segundos):
+    # execute_wrapper que duerme antes de cada consulta: simula la ida y vuelta
+    # de red a una base remota (o una consulta lenta) en cualquier motor
+    def envoltorio(execute, sql, params, many, context):
+        time.sleep(segundos)
+        return execute(sql, params, many, context)
+    return envoltorio
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el throughput de las lecturas de productos servidas por WSGI "
+        "(vistas DRF en N hilos, como gunicorn --threads) y por ASGI (vistas "
+        "async con N peticiones concurrentes) en una base de datos temporal."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=5000)
+        parser.add_argument('--peticiones', type=int, default=2000)
+        parser.add_argument('--concurrencia', type=int, default=32)
+        parser.add_argument(
+            '--latencia-ms', type=float, default=2.0,
+            help="Latencia añadida a cada consulta SQL (0 para medir sólo CPU)",
+        )
+        parser.add_argument('--semilla', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            sembrar_productos(options['productos'], semilla=options['semilla'])
+            ids = list(Producto.objects.values_list('id', flat=True))
+            peticiones = self._peticiones(ids, options['peticiones'], options['semilla'])
+
+            envoltorio = _latencia_simulada(options['latencia_ms'] / 1000)
+
+            def instalar(sender, connection, **kwargs):
+                connection.execute_wrappers.append(envoltorio)
+
+            connection.execute_wrappers.append(envoltorio)
+            connection_created.connect(instalar)
+            try:
+                for modo, medir in (('WSGI', self._wsgi), ('ASGI', self._asgi)):
+                    caches['productos'].clear()
+                    segundos, tiempos = medir(peticiones, options['concurrencia'])
+                    self._informar(modo, segundos, tiempos)
+            finally:
+                connection_created.disconnect(instalar)
+                connection.execute_wrappers.remove(envoltorio)
+
+    @staticmethod
+    def _peticiones(ids, n, semilla):
+        # Mezcla de lecturas típicas: detalle, página del listado y lote del carrito
+        aleatorio = random.Random(semilla)
+        peticiones = []
+        for i in range(n):
+            tipo = i % 3
+            if tipo == 0:
+                peticiones.append((f'/api/productos/{aleatorio.choice(ids)}/', {}))
+            elif tipo == 1:
+                peticiones.append(('/api/productos/', {'limit': 20, 'orden': 'precio', 'en_stock': 1}))
+            else:
+                lote = aleatorio.sample(ids, 10)
+                peticiones.append(('/api/productos/', {'ids': ','.join(map(str, lote))}))
+        return peticiones
+
+    @staticmethod
+    def _wsgi(peticiones, concurrencia):
+        def trabajador(asignadas):
+            cliente, tiempos = Client(), []
+            try:
+                for url, params in asignadas:
+                    inicio = time.perf_counter()
+                    cliente.get(url, params)
+                    tiempos.append(time.perf_counter() - inicio)
+            finally:
+                connections.close_all()
+            return tiempos
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(concurrencia) as ejecutor:
+            partes = ejecutor.map(trabajador, [peticiones[i::concurrencia] for i in range(concurrencia)])
+            tiempos = [t for parte in partes for t in parte]
+        return time.perf_counter() - inicio, tiempos
+
+    @staticmethod
+    def _asgi(peticiones, concurrencia):
+        async def principal():
+            cliente, tiempos = AsyncClient(), []
+            semaforo = asyncio.Semaphore(concurrencia)
+
+            async def pedir(url, params):
+                async with semaforo:
+                    inicio = time.perf_counter()
+                    await cliente.get(url, params)
+                    tiempos.append(time.perf_counter() - inicio)
+
+            await asyncio.gather(*(pedir(url, params) for url, params in peticiones))
+            return tiempos
+
+        with override_settings(ROOT_URLCONF='servicio_productos.urls_asgi'):
+            inicio = time.perf_counter()
+            tiempos = asyncio.run(principal())
+        return time.perf_counter() - inicio, tiempos
+
+    def _informar(self, modo, segundos, tiempos):
+        milisegundos = [t * 1000 for t in tiempos]
+        self.stdout.write(
+            f"{modo}: {len(tiempos) / segundos:8.1f} pet/s | "
+            f"p50 {statistics.median(milisegundos):7.2f} ms | p99 {percentil(milisegundos, 0.99):7.2f} ms"
+        )
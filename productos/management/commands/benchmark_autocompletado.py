@@ -0,0 +1,78 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from productos.autocompletado import IndicePrefijos
+from productos.benchmarks import percentil
+
+SUSTANTIVOS = [
+    'Árbol', 'Lámpara', 'Mesa', 'Silla', 'Camiseta', 'Zapatilla', 'Teléfono', 'Cámara',
+    'Ratón', 'Teclado', 'Monitor', 'Cafetera', 'Sartén', 'Balón', 'Mochila', 'Reloj',
+    'Cuaderno', 'Bicicleta', 'Almohada', 'Ñandú', 'Guitarra', 'Pantalón', 'Champú', 'Cepillo',
+]
+ADJETIVOS = [
+    'eléctrico', 'clásico', 'plegable', 'inalámbrico', 'ergonómico', 'térmico', 'compacto',
+    'deportivo', 'mágico', 'económico', 'resistente', 'básico', 'portátil', 'único',
+]
+MARCAS = ['Acmé', 'Óptima', 'Nórdica', 'Solaris', 'Brío', 'Ibérica', 'Zenit', 'Pampa']
+
+
+def generar_nombres(n, semilla):
+    aleatorio = random.Random(semilla)
+    for i in range(n):
+        yield (
+            i,
+            f"{aleatorio.choice(SUSTANTIVOS)} {aleatorio.choice(ADJETIVOS)} "
+            f"{aleatorio.choice(MARCAS)} {i}",
+            aleatorio.randint(0, 1000),
+        )
+
+
+class Command(BaseCommand):
+    help = "Microbenchmark del índice de autocompletado en memoria (sin base de datos)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nombres', type=int, default=1_000_000)
+        parser.add_argument('--consultas', type=int, default=20_000)
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--semilla', type=int, default=0)
+
+    def handle(self, *args, **options):
+        n, k = options['nombres'], options['k']
+        aleatorio = random.Random(options['semilla'])
+
+        indice = IndicePrefijos()
+        inicio = time.perf_counter()
+        indice.construir(generar_nombres(n, options['semilla']))
+        self.stdout.write(f"construcción de {n} nombres: {time.perf_counter() - inicio:.2f} s")
+
+        # Prefijos reales de 1 a 6 caracteres, como los de alguien tecleando
+        muestras = [nombre for _, nombre, _ in generar_nombres(2000, options['semilla'] + 1)]
+        for largo in (1, 2, 3, 4, 6):
+            tiempos = []
+            for _ in range(options['consultas'] // 5):
+                prefijo = aleatorio.choice(muestras)[:largo]
+                t0 = time.perf_counter()
+                indice.buscar(prefijo, k)
+                tiempos.append((time.perf_counter() - t0) * 1_000_000)
+            self.stdout.write(
+                f"prefijo de {largo} car.: p50 {statistics.median(tiempos):8.1f} µs | "
+                f"p99 {percentil(tiempos, 0.99):8.1f} µs | máx {max(tiempos):9.1f} µs"
+            )
+
+        # Cambios incrementales (lo que hace ProductoService en cada mutación)
+        tiempos = []
+        for i in range(1000):
+            t0 = time.perf_counter()
+            indice.guardar(n + i, f"Producto nuevo {i}", i)
+            tiempos.append((time.perf_counter() - t0) * 1_000_000)
+        for i in range(1000):
+            t0 = time.perf_counter()
+            indice.eliminar(n + i)
+            tiempos.append((time.perf_counter() - t0) * 1_000_000)
+        self.stdout.write(
+            f"alta/baja incremental: p50 {statistics.median(tiempos):8.1f} µs | "
+            f"p99 {percentil(tiempos, 0.99):8.1f} µs"
+        )
@@ -0,0 +1,259 @@
+import json
+import platform
+import random
+import time
+import tracemalloc
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from categorias.models import Categoria
+from productos import urls
+from productos.benchmarks import base_de_datos_temporal, comparar_con_base, resumir_latencias
+from productos.models import Producto
+
+BASE_POR_DEFECTO = Path(settings.BASE_DIR) / 'benchmarks' / 'endpoints.json'
+
+
+def _ids(contexto, aleatorio, n):
+    return aleatorio.sample(contexto['ids'], min(n, len(contexto['ids'])))
+
+
+# (nombre, ruta de productos/urls.py, método, petición(contexto, aleatorio) -> (path, datos)).
+# Todas las rutas deben tener al menos un escenario (se comprueba al arrancar).
+# Las reservas usan productos con stock de sobra para no acabar en 409.
+ESCENARIOS = [
+    ('listado', 'productos', 'get',
+     lambda c, a: (reverse('productos'), {'limit': 20, 'orden': 'precio', 'en_stock': 1})),
+    ('listado_categoria', 'productos', 'get',
+     lambda c, a: (reverse('productos'), {'limit': 20, 'categoria': a.choice(c['categorias'])})),
+    ('busqueda', 'productos', 'get',
+     lambda c, a: (reverse('productos'), {'q': a.choice(c['palabras']), 'limit': 20})),
+    ('por_ids', 'productos', 'get',
+     lambda c, a: (reverse('productos'), {'ids': ','.join(map(str, _ids(c, a, 10)))})),
+    ('crear', 'productos', 'post',
+     lambda c, a: (reverse('productos'), {
+         'nombre': f"Benchmark {a.random()}", 'precio': a.randint(1, 2000), 'categoria_id': a.choice(c['categorias']),
+     })),
+    ('alta_masiva', 'productos-bulk', 'post',
+     lambda c, a: (reverse('productos-bulk'), [
+         {'nombre': f"Masivo {a.random()}", 'precio': a.randint(1, 2000), 'categoria_id': a.choice(c['categorias'])}
+         for _ in range(50)
+     ])),
+    ('precios_masivo', 'productos-bulk', 'patch',
+     lambda c, a: (reverse('productos-bulk'), [
+         {'id': producto_id, 'precio': a.randint(1, 2000)} for producto_id in _ids(c, a, 50)
+     ])),
+    ('lote', 'productos-lote', 'post',
+     lambda c, a: (reverse('productos-lote'), {'ids': _ids(c, a, 50)})),
+    ('carrito', 'productos-reservas', 'post',
+     lambda c, a: (reverse('productos-reservas'), {
+         'items': [{'id': producto_id, 'cantidad': 1} for producto_id in a.sample(c['con_stock'], 3)],
+     })),
+    ('autocompletar', 'productos-autocomplete', 'get',
+     lambda c, a: (reverse('productos-autocomplete'), {'prefix': a.choice(c['palabras'])[:3]})),
+    ('facetas', 'productos-facetas', 'get',
+     lambda c, a: (reverse('productos-facetas'), {'categoria': a.choice(c['categorias'])})),
+    ('exportar', 'productos-exportar', 'get',
+     lambda c, a: (reverse('productos-exportar'), {'categoria': a.choice(c['categorias'])})),
+    ('cache', 'productos-cache', 'get', lambda c, a: (reverse('productos-cache'), {})),
+    ('conexiones', 'productos-conexiones', 'get', lambda c, a: (reverse('productos-conexiones'), {})),
+    ('detalle', 'producto', 'get',
+     lambda c, a: (reverse('producto', args=[a.choice(c['ids'])]), {})),
+    ('actualizar', 'producto', 'patch',
+     lambda c, a: (reverse('producto', args=[a.choice(c['ids'])]), {'precio': a.randint(1, 2000)})),
+    ('reservar', 'producto-reservar', 'post',
+     lambda c, a: (reverse('producto-reservar', args=[a.choice(c['con_stock'])]), {'cantidad': 1})),
+    ('liberar', 'producto-liberar', 'post',
+     lambda c, a: (reverse('producto-liberar', args=[a.choice(c['con_stock'])]), {'cantidad': 1})),
+]
+
+# Rutas de diagnóstico sólo para administradores: no forman parte del benchmark
+RUTAS_EXCLUIDAS = {'productos-perfiles', 'producto-perfil'}
+
+# La exportación recorre toda una categoría: menos repeticiones
+REPETICIONES_RELATIVAS = {'exportar': 0.1}
+
+# Cache propia del benchmark: resultados repetibles y sin tocar una cache compartida
+CACHES_BENCHMARK = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'},
+    'productos': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark-productos',
+        'KEY_PREFIX': 'productos',
+        'TIMEOUT': 300,
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de las rutas de productos/urls.py sobre una base temporal con "
+        "--productos filas: latencia p50/p95/p99, consultas por petición y memoria pico. "
+        "Con --guardar actualiza la línea base JSON; si no, compara con ella y falla "
+        "si alguna métrica empeora más de lo tolerado. Las líneas base sólo son "
+        "comparables en la misma máquina y el mismo motor de base de datos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=1000, help="p. ej. 1000, 100000, 1000000")
+        parser.add_argument('--repeticiones', type=int, default=200)
+        parser.add_argument('--calentamiento', type=int, default=5)
+        parser.add_argument('--muestras', type=int, default=5,
+                            help="Peticiones por escenario para contar consultas y memoria")
+        parser.add_argument('--escenarios', help="Lista separada por comas (por defecto todos)")
+        parser.add_argument('--base', default=str(BASE_POR_DEFECTO))
+        parser.add_argument('--guardar', action='store_true', help="Guarda el resultado como línea base")
+        parser.add_argument('--tolerancia-latencia', type=float, default=0.5)
+        parser.add_argument('--margen-ms', type=float, default=1.0)
+        parser.add_argument('--tolerancia-memoria', type=float, default=0.5)
+        parser.add_argument('--procesos', type=int, default=0, help="Procesos de generar_datos")
+        parser.add_argument('--semilla', type=int, default=0)
+
+    def handle(self, *args, **options):
+        escenarios = self._seleccionar(options['escenarios'])
+
+        with base_de_datos_temporal(), override_settings(DEBUG=False, DB_REPLICAS=[], CACHES=CACHES_BENCHMARK):
+            inicio = time.perf_counter()
+            call_command(
+                'generar_datos', productos=options['productos'], procesos=options['procesos'],
+                semilla=options['semilla'], limpiar=True, stdout=StringIO(),
+            )
+            self.stdout.write(f"{options['productos']} productos sembrados en {time.perf_counter() - inicio:.1f} s")
+            contexto = self._contexto(options['semilla'])
+
+            resultados = {}
+            for nombre, _, metodo, peticion in escenarios:
+                aleatorio = random.Random(f"{options['semilla']}:{nombre}")
+                repeticiones = max(1, int(options['repeticiones'] * REPETICIONES_RELATIVAS.get(nombre, 1)))
+                tiempos = self._latencias(
+                    metodo, peticion, contexto, aleatorio, options['calentamiento'], repeticiones
+                )
+                consultas, memoria = self._consultas_y_memoria(
+                    metodo, peticion, contexto, aleatorio, options['muestras']
+                )
+                resultados[nombre] = {
+                    **resumir_latencias(tiempos), 'consultas': consultas, 'memoria_kb': memoria,
+                }
+                self._informar(nombre, resultados[nombre])
+
+        self._guardar_o_comparar(resultados, options)
+
+    @staticmethod
+    def _seleccionar(nombres):
+        if nombres:
+            pedidos = set(nombres.split(','))
+            desconocidos = pedidos - {nombre for nombre, *_ in ESCENARIOS}
+            if desconocidos:
+                raise CommandError(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+            return [escenario for escenario in ESCENARIOS if escenario[0] in pedidos]
+
+        # Una ruta nueva sin escenario es un fallo: el benchmark debe cubrirlas todas
+        rutas = {patron.name for patron in urls.urlpatterns} - RUTAS_EXCLUIDAS
+        sin_escenario = rutas - {ruta for _, ruta, _, _ in ESCENARIOS}
+        if sin_escenario:
+            raise CommandError(f"Rutas sin escenario de benchmark: {', '.join(sorted(sin_escenario))}")
+        return ESCENARIOS
+
+    @staticmethod
+    def _contexto(semilla):
+        aleatorio = random.Random(semilla)
+        ids = list(Producto.objects.values_list('id', flat=True))
+        nombres = Producto.objects.filter(pk__in=aleatorio.sample(ids, min(50, len(ids)))).values_list('nombre', flat=True)
+        con_stock = Producto.objects.filter(stock__gte=100)
+        # Reservas previas: el escenario liberar sólo puede devolver unidades reservadas
+        con_stock.update(reservado=F('stock'))
+        return {
+            'ids': ids,
+            'con_stock': list(con_stock.values_list('id', flat=True)),
+            'categorias': list(Categoria.objects.values_list('id', flat=True)),
+            # Primera palabra de nombres reales: búsquedas y prefijos con resultados
+            'palabras': [nombre.split()[0] for nombre in nombres],
+        }
+
+    @staticmethod
+    def _pedir(cliente, metodo, peticion, contexto, aleatorio):
+        path, datos = peticion(contexto, aleatorio)
+        if metodo == 'get':
+            response = cliente.get(path, datos)
+        else:
+            response = getattr(cliente, metodo)(path, json.dumps(datos), content_type='application/json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        if response.status_code >= 400:
+            raise CommandError(f"{metodo.upper()} {path} respondió {response.status_code}")
+        return response
+
+    def _latencias(self, metodo, peticion, contexto, aleatorio, calentamiento, repeticiones):
+        cliente = Client()
+        for _ in range(calentamiento):
+            self._pedir(cliente, metodo, peticion, contexto, aleatorio)
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            self._pedir(cliente, metodo, peticion, contexto, aleatorio)
+            tiempos.append(time.perf_counter() - inicio)
+        return tiempos
+
+    def _consultas_y_memoria(self, metodo, peticion, contexto, aleatorio, muestras):
+        # Pasada aparte: tracemalloc y la captura de SQL distorsionan las latencias
+        cliente = Client()
+        consultas, pico = 0, 0
+        tracemalloc.start()
+        try:
+            for _ in range(muestras):
+                tracemalloc.reset_peak()
+                base, _ = tracemalloc.get_traced_memory()
+                with CaptureQueriesContext(connection) as capturadas:
+                    self._pedir(cliente, metodo, peticion, contexto, aleatorio)
+                consultas = max(consultas, len(capturadas))
+                pico = max(pico, tracemalloc.get_traced_memory()[1] - base)
+        finally:
+            tracemalloc.stop()
+        return consultas, round(pico / 1024, 1)
+
+    def _informar(self, nombre, metricas):
+        self.stdout.write(
+            f"{nombre:20} p50 {metricas['p50_ms']:8.2f} ms | p95 {metricas['p95_ms']:8.2f} ms | "
+            f"p99 {metricas['p99_ms']:8.2f} ms | {metricas['consultas']:3} consultas | "
+            f"{metricas['memoria_kb']:9.1f} KB"
+        )
+
+    def _guardar_o_comparar(self, resultados, options):
+        ruta = Path(options['base'])
+        bases = json.loads(ruta.read_text()) if ruta.exists() else {}
+        # Una línea base por tamaño de catálogo en el mismo fichero
+        clave = str(options['productos'])
+
+        if options['guardar']:
+            escenarios = {**bases.get(clave, {}).get('escenarios', {}), **resultados}
+            bases[clave] = {
+                'motor': connection.vendor,
+                'python': platform.python_version(),
+                'maquina': platform.node(),
+                'escenarios': escenarios,
+            }
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            ruta.write_text(json.dumps(bases, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Línea base guardada en {ruta} ({clave} productos)"))
+            return
+
+        if clave not in bases:
+            self.stdout.write(self.style.WARNING(f"Sin línea base para {clave} productos en {ruta}: no se compara"))
+            return
+        regresiones = comparar_con_base(
+            resultados, bases[clave]['escenarios'],
+            tolerancia_latencia=options['tolerancia_latencia'], margen_ms=options['margen_ms'],
+            tolerancia_memoria=options['tolerancia_memoria'],
+        )
+        if regresiones:
+            raise CommandError("Regresiones frente a la línea base:\n  " + "\n  ".join(regresiones))
+        self.stdout.write(self.style.SUCCESS("Sin regresiones frente a la línea base"))
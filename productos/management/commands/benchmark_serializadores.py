@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from categorias.models import Categoria
+from productos.benchmarks import base_de_datos_temporal, cronometrar, sembrar_productos
+from productos.models import Producto
+from productos.serializers import ProductoListaSerializer, ProductoSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara ProductoSerializer(many=True) contra ProductoListaSerializer "
+        "(filas de .values()) en una base de datos temporal."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'tamanos', nargs='*', type=int, default=[10_000, 100_000],
+            help="Número de productos por escenario (por defecto 10000 y 100000)",
+        )
+        parser.add_argument('--repeticiones', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            for n in sorted(options['tamanos']):
+                Producto.objects.all().delete()
+                Categoria.objects.all().delete()
+                sembrar_productos(n)
+                self._escenario(n, options['repeticiones'])
+
+    def _escenario(self, n, repeticiones):
+        def con_drf():
+            productos = Producto.objects.select_related('categoria').order_by('id')[:n]
+            return ProductoSerializer(productos, many=True).data
+
+        def rapido():
+            filas = Producto.objects.order_by('id').values(*ProductoListaSerializer.COLUMNAS)[:n]
+            return ProductoListaSerializer(filas).data
+
+        tiempo_drf, datos_drf = cronometrar(con_drf, repeticiones)
+        tiempo_rapido, datos_rapido = cronometrar(rapido, repeticiones)
+
+        if [dict(d, categoria=dict(d['categoria'])) for d in datos_drf] != datos_rapido:
+            raise CommandError(f"Las salidas no coinciden con {n} filas")
+
+        self.stdout.write(
+            f"{n:>9} filas | DRF {tiempo_drf * 1000:9.1f} ms | "
+            f"rápido {tiempo_rapido * 1000:9.1f} ms | x{tiempo_drf / tiempo_rapido:.1f}"
+        )
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from productos.benchmarks import base_de_datos_temporal, estresar_reservas, sembrar_productos
+from productos.models import Producto
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de estrés de reservas de carritos concurrentes en una base de "
+        "datos temporal: informa throughput, deadlocks y sobreventa."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=16)
+        parser.add_argument('--carritos', type=int, default=200, help="Carritos por hilo")
+        parser.add_argument('--productos', type=int, default=20, help="Productos en disputa")
+        parser.add_argument('--tamano-carrito', type=int, default=4)
+        parser.add_argument('--stock', type=int, default=500, help="Stock inicial de cada producto")
+        parser.add_argument('--semilla', type=int, default=0)
+        parser.add_argument('--max-reintentos', type=int, default=20,
+                            help="Reintentos por bloqueo antes de abandonar un carrito")
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            sembrar_productos(options['productos'], semilla=options['semilla'])
+            Producto.objects.update(stock=options['stock'])
+            ids = list(Producto.objects.values_list('id', flat=True))
+
+            metricas = estresar_reservas(
+                ids,
+                hilos=options['hilos'],
+                carritos_por_hilo=options['carritos'],
+                tamano_carrito=options['tamano_carrito'],
+                semilla=options['semilla'],
+                max_reintentos=options['max_reintentos'],
+            )
+
+            vendidas = options['stock'] * len(ids) - sum(
+                Producto.objects.values_list('stock', flat=True)
+            )
+
+        esperadas = metricas['reservas'] * min(options['tamano_carrito'], len(ids))
+        self.stdout.write(
+            f"carritos reservados: {metricas['reservas']} | rechazados sin stock: {metricas['sin_stock']}\n"
+            f"deadlocks: {metricas['deadlocks']} | reintentos por bloqueo: {metricas['reintentos']} | "
+            f"abandonados: {metricas['abandonados']}\n"
+            f"throughput: {metricas['carritos_por_segundo']:.1f} carritos/s en {metricas['segundos']:.2f} s"
+        )
+        if vendidas != esperadas:
+            raise CommandError(f"Inconsistencia: {vendidas} unidades descontadas, {esperadas} reservadas")
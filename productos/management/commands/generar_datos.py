@@ -0,0 +1,143 @@
+import multiprocessing
+import os
+import time
+from collections import deque
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from categorias.models import Categoria
+from productos import generacion
+from productos.models import Producto
+from productos.services import ProductoService
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera productos de prueba en lotes y en paralelo (semilla determinista). "
+        "En PostgreSQL cada proceso inserta con COPY; en otras bases los procesos "
+        "generan y este proceso inserta con executemany."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=2000)
+        parser.add_argument('--lote', type=int, default=10_000)
+        parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1,
+                            help="Procesos generadores; 0 genera en este proceso")
+        parser.add_argument('--semilla', type=int, default=0)
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--limpiar', action='store_true', help="Borra productos y categorías antes")
+
+    def handle(self, *args, **options):
+        total, tamano = options['productos'], options['lote']
+        if total < 0 or tamano < 1:
+            raise CommandError("--productos debe ser >= 0 y --lote >= 1")
+        alias = options['database']
+        conexion = connections[alias]
+
+        if options['limpiar']:
+            Producto.objects.using(alias).all().delete()
+            Categoria.objects.using(alias).all().delete()
+        categoria_ids = self._categorias(alias)
+
+        lotes = (total + tamano - 1) // tamano
+        copy = conexion.vendor == 'postgresql'
+        if copy:
+            tarea, insertar = generacion.copiar_lote, None
+            # Cada proceso abre su conexión una vez y la usa para todos sus lotes
+            inicializar = (generacion.conectar, (self._conn_params(conexion),), generacion.desconectar)
+            argumentos = lambda numero: (
+                Producto._meta.db_table, numero, tamano, total, options['semilla'], categoria_ids,
+            )
+        else:
+            tarea, inicializar = generacion.generar_lote, None
+            insertar = lambda filas: self._insertar(alias, filas)
+            argumentos = lambda numero: (numero, tamano, total, options['semilla'], categoria_ids)
+
+        self.stdout.write(
+            f"{total} productos en {lotes} lotes de {tamano} "
+            f"({'COPY' if copy else 'executemany'}, {options['procesos']} procesos)"
+        )
+        inicio = time.perf_counter()
+        self._ultimo_informe = inicio
+        hechas = 0
+        lotes_en_curso = self._ejecutar(tarea, map(argumentos, range(lotes)), options['procesos'], inicializar)
+        for resultado in lotes_en_curso:
+            hechas += insertar(resultado) if insertar else resultado
+            self._informar(hechas, total, inicio)
+
+        if copy:
+            with conexion.cursor() as cursor:
+                cursor.execute(f'ANALYZE {Producto._meta.db_table}')
+        for categoria_id in categoria_ids:
+            ProductoService.invalidar_categoria(categoria_id)
+
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"{hechas} productos en {segundos:.1f} s ({hechas / segundos if segundos else 0:.0f} filas/s)"
+        ))
+
+    def _categorias(self, alias):
+        ids = []
+        for nombre in generacion.CATEGORIAS:
+            categoria, _ = Categoria.objects.using(alias).get_or_create(nombre=nombre)
+            ids.append(categoria.id)
+        return ids
+
+    @staticmethod
+    def _conn_params(conexion):
+        # Sólo datos serializables: los procesos hijos conectan con psycopg sin Django
+        ajustes = conexion.settings_dict
+        params = {
+            'dbname': ajustes['NAME'], 'user': ajustes['USER'], 'password': ajustes['PASSWORD'],
+            'host': ajustes['HOST'], 'port': ajustes['PORT'],
+        }
+        return {clave: valor for clave, valor in params.items() if valor}
+
+    @staticmethod
+    def _insertar(alias, filas):
+        # executemany directo: construir y compilar instancias del ORM cuesta más que generarlas
+        conexion = connections[alias]
+        tabla = conexion.ops.quote_name(Producto._meta.db_table)
+        columnas = ', '.join(conexion.ops.quote_name(columna) for columna in generacion.COLUMNAS)
+        marcadores = ', '.join(['%s'] * len(generacion.COLUMNAS))
+        fecha = conexion.ops.adapt_datetimefield_value(filas[0][-1]) if filas else None
+        with transaction.atomic(using=alias), conexion.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {tabla} ({columnas}) VALUES ({marcadores})',
+                [fila[:-1] + (fecha,) for fila in filas],
+            )
+        return len(filas)
+
+    @staticmethod
+    def _ejecutar(tarea, argumentos, procesos, inicializar=None):
+        # Como mucho 2 lotes pendientes por proceso: la memoria no crece con --productos.
+        # inicializar: (función, args, cierre); la función se ejecuta una vez en cada
+        # proceso (los workers del Pool cierran por su cuenta al terminar)
+        inicializador, args_inicializador, cierre = inicializar or (None, (), None)
+        if procesos <= 0:
+            if inicializador is not None:
+                inicializador(*args_inicializador)
+            try:
+                for args in argumentos:
+                    yield tarea(*args)
+            finally:
+                if cierre is not None:
+                    cierre()
+            return
+        contexto = multiprocessing.get_context('spawn')
+        with contexto.Pool(procesos, initializer=inicializador, initargs=args_inicializador) as pool:
+            pendientes = deque()
+            for args in argumentos:
+                pendientes.append(pool.apply_async(tarea, args))
+                if len(pendientes) >= 2 * procesos:
+                    yield pendientes.popleft().get()
+            while pendientes:
+                yield pendientes.popleft().get()
+
+    def _informar(self, hechas, total, inicio):
+        ahora = time.perf_counter()
+        if ahora - self._ultimo_informe < 1 and hechas < total:
+            return
+        self._ultimo_informe = ahora
+        self.stdout.write(f"  {hechas}/{total} ({hechas / (ahora - inicio):.0f} filas/s)")
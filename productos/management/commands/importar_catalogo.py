@@ -0,0 +1,89 @@
+import gzip
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from productos import importacion
+from productos.services import ProductoService
+
+FORMATOS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa un catálogo de proveedor (CSV o NDJSON, opcionalmente .gz) en streaming. "
+        "Columnas: sku, nombre, precio, categoria (nombre) y opcionales descripcion, stock, "
+        "imagen_url. Los productos se crean o actualizan por sku."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--formato', choices=['csv', 'ndjson'],
+                            help="Por defecto según la extensión (.csv, .ndjson, .jsonl)")
+        parser.add_argument('--lote', type=int, default=1000)
+        parser.add_argument('--delimitador', default=',')
+        parser.add_argument('--max-errores', type=int, default=1000,
+                            help="Aborta si hay más filas rechazadas (los lotes ya escritos se mantienen)")
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        comprimido = ruta.endswith('.gz')
+        formato = options['formato'] or FORMATOS.get(os.path.splitext(ruta[:-3] if comprimido else ruta)[1])
+        if formato is None:
+            raise CommandError("No se reconoce el formato: usa --formato csv|ndjson")
+        if options['lote'] < 1:
+            raise CommandError("--lote debe ser >= 1")
+
+        abrir = gzip.open if comprimido else open
+        try:
+            archivo = abrir(ruta, 'rt', encoding='utf-8-sig', newline='')
+        except OSError as e:
+            raise CommandError(str(e))
+
+        errores = importacion.ErroresImportacion(options['max_errores'])
+        mapa = importacion.MapaCategorias()
+        tamano = None if comprimido else os.path.getsize(ruta)
+        creados = actualizados = 0
+        inicio = ultimo_informe = time.perf_counter()
+
+        with archivo:
+            if formato == 'csv':
+                filas = importacion.leer_csv(archivo, options['delimitador'])
+            else:
+                filas = importacion.leer_ndjson(archivo)
+            validas = importacion.validar(filas, mapa, errores)
+            try:
+                for lote in importacion.en_lotes(validas, options['lote']):
+                    nuevos, cambiados = ProductoService.importar_lote(lote)
+                    creados += nuevos
+                    actualizados += cambiados
+                    ahora = time.perf_counter()
+                    if ahora - ultimo_informe >= 1:
+                        ultimo_informe = ahora
+                        self._informar(archivo, tamano, creados + actualizados, errores.total, ahora - inicio)
+            except importacion.DemasiadosErrores as e:
+                self._resumen(creados, actualizados, errores, mapa, time.perf_counter() - inicio)
+                raise CommandError(str(e))
+
+        self._resumen(creados, actualizados, errores, mapa, time.perf_counter() - inicio)
+
+    def _informar(self, archivo, tamano, procesadas, rechazadas, segundos):
+        progreso = ''
+        if tamano:
+            # Posición en bytes del fichero (incluye lo que el buffer ya leyó por delante)
+            progreso = f" ({100 * archivo.buffer.tell() / tamano:.1f}%)"
+        self.stdout.write(
+            f"  {procesadas} filas{progreso}, {rechazadas} rechazadas, {procesadas / segundos:.0f} filas/s"
+        )
+
+    def _resumen(self, creados, actualizados, errores, mapa, segundos):
+        total = creados + actualizados
+        for linea, motivo in errores.primeros:
+            self.stderr.write(f"  línea {linea}: {motivo}")
+        if mapa.creadas:
+            self.stdout.write(f"Categorías creadas: {', '.join(mapa.creadas)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{creados} creados, {actualizados} actualizados, {errores.total} rechazados "
+            f"en {segundos:.1f} s ({total / segundos if segundos else 0:.0f} filas/s)"
+        ))
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from productos.perfilado import firmar_token
+
+
+class Command(BaseCommand):
+    help = "Genera el valor de la cabecera X-Perfilar para perfilar peticiones bajo demanda."
+
+    def handle(self, *args, **options):
+        try:
+            token = firmar_token()
+        except ValueError as e:
+            raise CommandError(f"{e}: defina la variable de entorno PERFILADO_CLAVE")
+        self.stdout.write(token)
+        self.stderr.write(f"Válido durante {settings.PERFILADO_TOKEN_VALIDEZ} s. Uso: curl -H 'X-Perfilar: <token>' ...")
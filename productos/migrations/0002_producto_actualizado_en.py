@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-17 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
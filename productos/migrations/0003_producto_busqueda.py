@@ -0,0 +1,61 @@
+# Generated by Django 4.2.13 on 2026-10-17 11:40
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# El trigger y el índice GIN sólo existen en PostgreSQL; en SQLite (tests) la
+# columna queda vacía y ProductoRepository usa la búsqueda portable.
+CREAR_BUSQUEDA = [
+    """
+    CREATE OR REPLACE FUNCTION productos_busqueda_trigger() RETURNS trigger AS $$
+    BEGIN
+        NEW.busqueda :=
+            setweight(to_tsvector('pg_catalog.spanish', coalesce(NEW.nombre, '')), 'A') ||
+            setweight(to_tsvector('pg_catalog.spanish', coalesce(NEW.descripcion, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER productos_busqueda_actualizar
+        BEFORE INSERT OR UPDATE OF nombre, descripcion ON productos
+        FOR EACH ROW EXECUTE FUNCTION productos_busqueda_trigger()
+    """,
+    # Rellena las filas existentes disparando el trigger
+    "UPDATE productos SET nombre = nombre",
+    "CREATE INDEX productos_busqueda_gin ON productos USING gin (busqueda)",
+]
+
+ELIMINAR_BUSQUEDA = [
+    "DROP INDEX IF EXISTS productos_busqueda_gin",
+    "DROP TRIGGER IF EXISTS productos_busqueda_actualizar ON productos",
+    "DROP FUNCTION IF EXISTS productos_busqueda_trigger()",
+]
+
+
+def crear_busqueda(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sentencia in CREAR_BUSQUEDA:
+            schema_editor.execute(sentencia, params=None)
+
+
+def eliminar_busqueda(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sentencia in ELIMINAR_BUSQUEDA:
+            schema_editor.execute(sentencia, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0002_producto_actualizado_en'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='busqueda',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(crear_busqueda, eliminar_busqueda),
+    ]
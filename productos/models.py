@@ -1,16 +1,47 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from categorias.models import Categoria  
 
+# PositiveIntegerField: entero de 32 bits en PostgreSQL. Un valor mayor haría
+# fallar el INSERT/UPDATE de todo el lote en lugar de rechazar sólo la fila
+MAX_ENTERO = 2147483647
+
 class Producto(models.Model):
     nombre = models.CharField(max_length=200)
     descripcion = models.TextField(blank=True)
     precio = models.PositiveIntegerField()
     stock = models.PositiveIntegerField(default=0)
+    # Unidades reservadas aún no liberadas: una liberación nunca puede devolver
+    # al stock más de lo que se reservó (ver ProductoRepository.liberar_stock)
+    reservado = models.PositiveIntegerField(default=0)
     categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE)
     imagen_url = models.URLField(blank=True)
+    # Clave natural del proveedor: las importaciones de catálogo actualizan por ella
+    # (ver importar_catalogo). Opcional para los productos dados de alta por la API.
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    # Versión por producto: se usa para ETag del detalle
+    actualizado_en = models.DateTimeField(auto_now=True)
+    # tsvector de nombre + descripción para la búsqueda de texto completo.
+    # En PostgreSQL lo mantiene un trigger y lo indexa un GIN (ver migración 0003).
+    busqueda = SearchVectorField(null=True, editable=False)
 
     def __str__(self):
         return f"{self.nombre} ({self.categoria.nombre})"
     
     class Meta:
-        db_table = 'productos'
\ No newline at end of file
+        db_table = 'productos'
+        # Respaldan los filtros y órdenes del listado (ver ProductoRepository._filtrar).
+        # Todos terminan en 'id' como el keyset de paginacion.ORDENES, así la
+        # paginación lee el índice en orden sin ordenar en memoria.
+        indexes = [
+            # ?categoria=&orden=precio y rangos de precio dentro de una categoría
+            models.Index(fields=['categoria', 'precio', 'id'], name='productos_cat_precio_idx'),
+            # ?precio_min=&precio_max= y ?orden=precio|-precio sobre todo el catálogo
+            models.Index(fields=['precio', 'id'], name='productos_precio_idx'),
+            models.Index(fields=['nombre', 'id'], name='productos_nombre_idx'),
+            # ?en_stock=1: índices parciales, sólo las filas con stock > 0
+            models.Index(fields=['id'], condition=models.Q(stock__gt=0), name='productos_en_stock_idx'),
+            models.Index(
+                fields=['precio', 'id'], condition=models.Q(stock__gt=0), name='productos_en_stock_precio_idx'
+            ),
+        ]
\ No newline at end of file
@@ -0,0 +1,150 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+
+from django.db.models import Q
+
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 500
+
+# Cada orden es una clave única (siempre termina en 'id') para que el keyset
+# sea estable aunque haya valores repetidos en la primera columna.
+ORDENES = {
+    'id': ('id',),
+    'precio': ('precio', 'id'),
+    '-precio': ('-precio', '-id'),
+    'nombre': ('nombre', 'id'),
+    # Sólo disponible en búsquedas (?q=), donde se anota la relevancia
+    'relevancia': ('-relevancia', 'id'),
+}
+
+
+@dataclass
+class Pagina:
+    items: list = field(default_factory=list)
+    siguiente: str = None
+    anterior: str = None
+
+
+def leer_limite(valor):
+    if valor in (None, ''):
+        return LIMITE_POR_DEFECTO
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError("El parámetro limit debe ser un entero")
+    if limite < 1:
+        raise ValueError("El parámetro limit debe ser mayor que 0")
+    return min(limite, LIMITE_MAXIMO)
+
+
+def codificar_cursor(orden, direccion, valores):
+    crudo = json.dumps({'o': orden, 'd': direccion, 'v': list(valores)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, orden):
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        direccion, valores = datos['d'], datos['v']
+        cursor_orden = datos['o']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise ValueError("Cursor inválido")
+
+    # Un cursor sólo vale para el orden con el que se generó y sus valores
+    # llegan tal cual al filtro: una lista de escalares, uno por campo del orden
+    if (
+        cursor_orden != orden
+        or direccion not in ('n', 'p')
+        or not isinstance(valores, list)
+        or len(valores) != len(ORDENES[orden])
+        or not all(isinstance(valor, (str, int, float)) for valor in valores)
+    ):
+        raise ValueError("Cursor inválido")
+    return direccion, valores
+
+
+def _valor(item, campo):
+    if isinstance(item, dict):
+        return item[campo]
+    return getattr(item, campo)
+
+
+def _clave(item, campos):
+    return [_valor(item, campo.lstrip('-')) for campo in campos]
+
+
+def _filtro_keyset(campos, valores, hacia_adelante):
+    # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y), respetando la dirección de cada campo
+    filtro = Q()
+    iguales = {}
+    for campo, valor in zip(campos, valores):
+        nombre = campo.lstrip('-')
+        ascendente = not campo.startswith('-')
+        lookup = 'gt' if ascendente == hacia_adelante else 'lt'
+        filtro |= Q(**iguales, **{f'{nombre}__{lookup}': valor})
+        iguales[nombre] = valor
+    return filtro
+
+
+def _invertir(campos):
+    return tuple(campo[1:] if campo.startswith('-') else f'-{campo}' for campo in campos)
+
+
+def _preparar(queryset, orden, limite, cursor):
+    # Devuelve la consulta de la página (aún sin ejecutar) y el contexto para armarla
+    if orden not in ORDENES:
+        raise ValueError(f"Orden no soportado: {orden}")
+    campos = ORDENES[orden]
+    limite = leer_limite(limite)
+
+    direccion, valores = 'n', None
+    if cursor:
+        direccion, valores = decodificar_cursor(cursor, orden)
+    hacia_adelante = direccion == 'n'
+
+    if valores is not None:
+        queryset = queryset.filter(_filtro_keyset(campos, valores, hacia_adelante))
+    orden_sql = campos if hacia_adelante else _invertir(campos)
+
+    # Pedimos uno de más para saber si existe otra página sin hacer un COUNT
+    return queryset.order_by(*orden_sql)[:limite + 1], (orden, campos, limite, valores, hacia_adelante)
+
+
+def _armar(items, contexto):
+    orden, campos, limite, valores, hacia_adelante = contexto
+    hay_mas = len(items) > limite
+    items = items[:limite]
+    if not hacia_adelante:
+        items.reverse()
+
+    pagina = Pagina(items=items)
+    if hacia_adelante:
+        if hay_mas:
+            pagina.siguiente = codificar_cursor(orden, 'n', _clave(items[-1], campos))
+        if valores is not None:
+            limite_previo = _clave(items[0], campos) if items else valores
+            pagina.anterior = codificar_cursor(orden, 'p', limite_previo)
+    else:
+        if hay_mas:
+            pagina.anterior = codificar_cursor(orden, 'p', _clave(items[0], campos))
+        limite_siguiente = _clave(items[-1], campos) if items else valores
+        pagina.siguiente = codificar_cursor(orden, 'n', limite_siguiente)
+    return pagina
+
+
+def paginar(queryset, orden='id', limite=None, cursor=None):
+    """
+    Paginación por keyset: en vez de OFFSET filtra por la clave del último
+    elemento visto, así el coste de cada página no crece con la tabla.
+    """
+    consulta, contexto = _preparar(queryset, orden, limite, cursor)
+    return _armar(list(consulta), contexto)
+
+
+async def apaginar(queryset, orden='id', limite=None, cursor=None):
+    # Igual que paginar(), leyendo la página con el ORM asíncrono
+    consulta, contexto = _preparar(queryset, orden, limite, cursor)
+    return _armar([item async for item in consulta], contexto)
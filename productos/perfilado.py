@@ -0,0 +1,349 @@
+"""
+Perfilado bajo demanda de las vistas de productos (decorador @perfilar).
+
+Una petición se perfila si:
+- trae la cabecera X-Perfilar con un token firmado con settings.PERFILADO_CLAVE
+  (comando token_perfilado; sin clave configurada la cabecera se ignora),
+- cae en el muestreo (settings.PERFILADO_MUESTREO, fracción de peticiones),
+- o tarda más de settings.PERFILADO_UMBRAL_MS (captura automática).
+
+En los dos primeros casos se ejecuta con cProfile desde el principio. Para el
+umbral no se sabe de antemano qué petición será lenta: un hilo muestrea cada
+INTERVALO_MUESTRAS la pila de las peticiones en curso (sólo cuestan las que
+duran más que eso) y se guardan las pilas agregadas. En todos los casos se
+registra el SQL ejecutado y el EXPLAIN de las consultas más lentas.
+
+Las capturas se escriben en segundo plano (no alargan la respuesta) en
+settings.PERFILADO_DIRECTORIO, que conserva sólo las PERFILADO_MAXIMO últimas.
+Con PERFILADO_MAX_PENDIENTES capturas esperando a escribirse no se perfilan
+más peticiones hasta que se vacíe la cola (la memoria queda acotada).
+La respuesta perfilada lleva la cabecera X-Perfil-Id.
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core import signing
+from django.db import DatabaseError, connections
+
+CABECERA = 'HTTP_X_PERFILAR'
+SAL_TOKEN = 'productos.perfilado'
+VALOR_TOKEN = 'perfilar'
+
+INTERVALO_MUESTRAS = 0.01
+MAX_CONSULTAS = 500
+MAX_EXPLAIN = 5
+
+_ID_VALIDO = re.compile(r'^\d+-[0-9a-f]{6}$')
+
+logger = logging.getLogger(__name__)
+
+
+def _firmante():
+    # Clave propia, nunca SECRET_KEY: quien conozca el repositorio no debe poder firmar
+    return signing.TimestampSigner(key=settings.PERFILADO_CLAVE, salt=SAL_TOKEN)
+
+
+def firmar_token():
+    if not settings.PERFILADO_CLAVE:
+        raise ValueError("PERFILADO_CLAVE no está configurada")
+    return _firmante().sign(VALOR_TOKEN)
+
+
+def _token_valido(valor):
+    if not settings.PERFILADO_CLAVE:
+        return False
+    try:
+        firmado = _firmante().unsign(valor, max_age=settings.PERFILADO_TOKEN_VALIDEZ)
+    except signing.BadSignature:
+        return False
+    return firmado == VALOR_TOKEN
+
+
+def _motivo(request):
+    valor = request.META.get(CABECERA)
+    if valor and _token_valido(valor):
+        return 'cabecera'
+    muestreo = settings.PERFILADO_MUESTREO
+    if muestreo and random.random() < muestreo:
+        return 'muestreo'
+    return None
+
+
+class _Muestreador:
+    """Hilo que recoge la pila de las peticiones registradas cada INTERVALO_MUESTRAS."""
+
+    def __init__(self):
+        self._capturas = {}  # id del hilo -> _Captura
+        self._lock = threading.Lock()
+        self._hilo = None
+
+    def registrar(self, captura):
+        with self._lock:
+            self._capturas[threading.get_ident()] = captura
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name='perfilado-muestras', daemon=True)
+                self._hilo.start()
+
+    def quitar(self):
+        with self._lock:
+            self._capturas.pop(threading.get_ident(), None)
+
+    def _bucle(self):
+        while True:
+            time.sleep(INTERVALO_MUESTRAS)
+            with self._lock:
+                capturas = list(self._capturas.items())
+            if not capturas:
+                continue
+            marcos = sys._current_frames()
+            for hilo, captura in capturas:
+                marco = marcos.get(hilo)
+                if marco is not None:
+                    captura.pilas[_pila(marco)] += 1
+
+
+def _pila(marco):
+    # Formato "colapsado" de flame graphs: raíz;...;hoja
+    nombres = []
+    while marco is not None:
+        codigo = marco.f_code
+        nombres.append(f'{codigo.co_filename}:{codigo.co_name}:{marco.f_lineno}')
+        marco = marco.f_back
+    return ';'.join(reversed(nombres))
+
+
+_muestreador = _Muestreador()
+
+
+class _Captura:
+    def __init__(self, con_cprofile):
+        self.perfil = cProfile.Profile() if con_cprofile else None
+        self.pilas = Counter()
+        self.consultas = []
+        self.omitidas = 0
+
+    def _registrador(self, alias):
+        def registrar(execute, sql, params, many, context):
+            inicio = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                if len(self.consultas) < MAX_CONSULTAS:
+                    self.consultas.append({
+                        'alias': alias, 'sql': sql, 'params': None if many else params,
+                        'ms': round((time.perf_counter() - inicio) * 1000, 3),
+                    })
+                else:
+                    self.omitidas += 1
+        return registrar
+
+    def __enter__(self):
+        self._pila = ExitStack()
+        for conexion in connections.all():
+            self._pila.enter_context(conexion.execute_wrapper(self._registrador(conexion.alias)))
+        if self.perfil is not None:
+            try:
+                self.perfil.enable()
+            except ValueError:
+                # Ya hay otro perfilador activo en el hilo: se recurre al muestreo
+                self.perfil = None
+        if self.perfil is None:
+            _muestreador.registrar(self)
+        return self
+
+    def __exit__(self, *exc):
+        if self.perfil is not None:
+            self.perfil.disable()
+        else:
+            _muestreador.quitar()
+        self._pila.close()
+
+
+def perfilar(vista):
+    """Decorador para las vistas DRF (por fuera de @api_view)."""
+    # @api_view devuelve la vista de una clase con el nombre de la función
+    nombre = getattr(vista, 'view_class', vista).__name__
+
+    @wraps(vista)
+    def envoltorio(request, *args, **kwargs):
+        motivo = _motivo(request)
+        umbral = settings.PERFILADO_UMBRAL_MS
+        if (motivo is None and not umbral) or _saturado():
+            return vista(request, *args, **kwargs)
+
+        inicio = time.perf_counter()
+        with _Captura(con_cprofile=motivo is not None) as captura:
+            response = vista(request, *args, **kwargs)
+        milisegundos = (time.perf_counter() - inicio) * 1000
+        if motivo is None:
+            if milisegundos < umbral:
+                return response
+            motivo = 'umbral'
+
+        perfil_id = f'{time.time_ns()}-{secrets.token_hex(3)}'
+        datos = {
+            'id': perfil_id,
+            'motivo': motivo,
+            'metodo': request.method,
+            'ruta': request.get_full_path(),
+            'vista': nombre,
+            'codigo': response.status_code,
+            'ms': round(milisegundos, 3),
+            'fecha': time.time(),
+        }
+        if not _encolar(perfil_id, datos, captura):
+            logger.warning("Cola de perfiles llena: se descarta %s", perfil_id)
+            return response
+        response['X-Perfil-Id'] = perfil_id
+        return response
+
+    return envoltorio
+
+
+# --- Almacenamiento (hilo de fondo, con sus propias conexiones) ---
+_escritor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='perfilado')
+_pendientes = 0
+_lock_pendientes = threading.Lock()
+
+
+def _saturado():
+    return _pendientes >= settings.PERFILADO_MAX_PENDIENTES
+
+
+def _encolar(perfil_id, datos, captura):
+    # La cola del ThreadPoolExecutor no tiene límite: se lleva la cuenta aquí
+    global _pendientes
+    with _lock_pendientes:
+        if _pendientes >= settings.PERFILADO_MAX_PENDIENTES:
+            return False
+        _pendientes += 1
+    _escritor.submit(_guardar, perfil_id, datos, captura)
+    return True
+
+
+def esperar():
+    """Bloquea hasta que se hayan escrito las capturas pendientes."""
+    _escritor.submit(lambda: None).result()
+
+
+def _directorio():
+    directorio = settings.PERFILADO_DIRECTORIO
+    os.makedirs(directorio, exist_ok=True)
+    return directorio
+
+
+def _explicar(consultas):
+    # Sólo SELECT: EXPLAIN no ejecuta la consulta (nunca EXPLAIN ANALYZE)
+    lentas = sorted(
+        (c for c in consultas if c['sql'].lstrip().upper().startswith('SELECT') and c['params'] is not None),
+        key=lambda c: c['ms'], reverse=True,
+    )[:MAX_EXPLAIN]
+    planes = []
+    for consulta in lentas:
+        conexion = connections[consulta['alias']]
+        try:
+            with conexion.cursor() as cursor:
+                cursor.execute(f"{conexion.ops.explain_query_prefix()} {consulta['sql']}", consulta['params'])
+                plan = [' '.join(str(columna) for columna in fila) for fila in cursor.fetchall()]
+        except DatabaseError as e:
+            plan = [f'Error: {e}']
+        planes.append({'sql': consulta['sql'], 'ms': consulta['ms'], 'plan': plan})
+    return planes
+
+
+def _guardar(perfil_id, datos, captura):
+    global _pendientes
+    try:
+        _escribir(perfil_id, datos, captura)
+    except Exception:
+        # En un hilo de fondo nadie recogería la excepción
+        logger.exception("No se pudo guardar el perfil %s", perfil_id)
+    finally:
+        with _lock_pendientes:
+            _pendientes -= 1
+
+
+def _escribir(perfil_id, datos, captura):
+    try:
+        datos['explain'] = _explicar(captura.consultas)
+    finally:
+        connections.close_all()
+    datos['consultas'] = [{**c, 'params': repr(c['params'])} for c in captura.consultas]
+    datos['consultas_omitidas'] = captura.omitidas
+
+    directorio = _directorio()
+    if captura.perfil is not None:
+        texto = io.StringIO()
+        estadisticas = pstats.Stats(captura.perfil, stream=texto)
+        estadisticas.sort_stats('cumulative').print_stats(40)
+        datos['perfil'] = {'tipo': 'cprofile', 'resumen': texto.getvalue()}
+        estadisticas.dump_stats(os.path.join(directorio, f'{perfil_id}.prof'))
+    else:
+        datos['perfil'] = {
+            'tipo': 'muestras',
+            'intervalo_ms': INTERVALO_MUESTRAS * 1000,
+            'pilas': [{'pila': pila, 'muestras': n} for pila, n in captura.pilas.most_common()],
+        }
+
+    temporal = os.path.join(directorio, f'.{perfil_id}.json')
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump(datos, archivo, ensure_ascii=False)
+    os.replace(temporal, os.path.join(directorio, f'{perfil_id}.json'))
+    _recortar(directorio)
+
+
+def _ids(directorio):
+    # Los ids empiezan por el instante en ns: orden alfabético = cronológico
+    return sorted(nombre[:-5] for nombre in os.listdir(directorio) if nombre.endswith('.json') and not nombre.startswith('.'))
+
+
+def _recortar(directorio):
+    # Buffer circular: sólo las PERFILADO_MAXIMO capturas más recientes
+    ids = _ids(directorio)
+    for perfil_id in ids[:max(0, len(ids) - settings.PERFILADO_MAXIMO)]:
+        for extension in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(directorio, perfil_id + extension))
+            except FileNotFoundError:
+                pass
+
+
+# --- Lectura (endpoint de administración) ---
+def listar():
+    directorio = _directorio()
+    resumen = []
+    for perfil_id in reversed(_ids(directorio)):
+        try:
+            with open(os.path.join(directorio, f'{perfil_id}.json'), encoding='utf-8') as archivo:
+                datos = json.load(archivo)
+        except (FileNotFoundError, ValueError):
+            continue
+        resumen.append({
+            clave: datos[clave] for clave in ('id', 'motivo', 'metodo', 'ruta', 'vista', 'codigo', 'ms', 'fecha')
+        })
+    return resumen
+
+
+def ruta(perfil_id, extension='.json'):
+    """Ruta del fichero de una captura; ValueError si no existe."""
+    if not _ID_VALIDO.match(perfil_id):
+        raise ValueError("Perfil no encontrado")
+    camino = os.path.join(_directorio(), perfil_id + extension)
+    if not os.path.exists(camino):
+        raise ValueError("Perfil no encontrado")
+    return camino
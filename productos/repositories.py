@@ -1,27 +1,184 @@
-from django.db.models import ObjectDoesNotExist
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Case, Count, F, FloatField, Max, Min, ObjectDoesNotExist, Q, Sum, Value, When
+from django.utils import timezone
 from productos.models import Producto
 from categorias.models import Categoria
+from productos.paginacion import ORDENES, apaginar, paginar
+
+# Configuración de texto de PostgreSQL (stemming y stopwords en español)
+CONFIG_BUSQUEDA = 'spanish'
+
 
 class ProductoRepository:
+    # --- Búsqueda ---
+    @staticmethod
+    def buscar(productos, q):
+        # Filtra por texto y anota 'relevancia' (mayor es mejor)
+        if connection.vendor == 'postgresql':
+            return ProductoRepository._buscar_tsvector(productos, q)
+        return ProductoRepository._buscar_portable(productos, q)
+
+    @staticmethod
+    def _buscar_tsvector(productos, q):
+        # Usa la columna 'busqueda' (tsvector mantenido por trigger, índice GIN)
+        consulta = SearchQuery(q, config=CONFIG_BUSQUEDA, search_type='websearch')
+        return productos.filter(busqueda=consulta).annotate(
+            relevancia=SearchRank(F('busqueda'), consulta)
+        )
+
+    @staticmethod
+    def _buscar_portable(productos, q):
+        # Alternativa para SQLite (tests): cada término debe aparecer en nombre o
+        # descripción; una coincidencia en el nombre pesa más que en la descripción
+        relevancia = Value(0.0)
+        for termino in q.split():
+            productos = productos.filter(
+                Q(nombre__icontains=termino) | Q(descripcion__icontains=termino)
+            )
+            relevancia = relevancia + Case(
+                When(nombre__icontains=termino, then=Value(1.0)),
+                default=Value(0.4),
+                output_field=FloatField(),
+            )
+        return productos.annotate(relevancia=relevancia)
+
+    @staticmethod
+    def _filtrar(productos, categoria_id=None, q=None, filtros=None):
+        # filtros: {'precio_min', 'precio_max', 'en_stock'} (todos opcionales).
+        # Cada combinación tiene un índice que la respalda (ver migración 0004).
+        if categoria_id:
+            productos = productos.filter(categoria_id=categoria_id)
+        filtros = filtros or {}
+        if filtros.get('precio_min') is not None:
+            productos = productos.filter(precio__gte=filtros['precio_min'])
+        if filtros.get('precio_max') is not None:
+            productos = productos.filter(precio__lte=filtros['precio_max'])
+        if filtros.get('en_stock'):
+            # Misma condición que el índice parcial: así el planificador puede usarlo
+            productos = productos.filter(stock__gt=0)
+        if q:
+            productos = ProductoRepository.buscar(productos, q)
+        return productos
+
     # --- Consultas ---
     @staticmethod
     def listar():
-        # Django ORM: Devuelve todos los objetos.
-        return Producto.objects.all() 
+        # Django ORM: Devuelve todos los objetos con su categoría en el mismo JOIN
+        return Producto.objects.select_related('categoria')
 
     @staticmethod
     def obtener_por_id(id):
         try:
             # Django ORM: Usa get para obtener por Clave Primaria (pk)
             # Si no lo encuentra, lanza una excepción (mejor que devolver None)
-            return Producto.objects.get(pk=id)
+            return Producto.objects.select_related('categoria').get(pk=id)
         except ObjectDoesNotExist:
             return None # Devolvemos None para mantener la firma original
     
+    @staticmethod
+    def obtener_por_ids(ids):
+        # Una consulta IN (in_bulk la parte si supera el límite de parámetros del motor)
+        return Producto.objects.select_related('categoria').in_bulk(ids)
+
+    @staticmethod
+    def obtener_categoria_id(id):
+        # Sólo la FK, sin traer la fila completa
+        return Producto.objects.filter(pk=id).values_list('categoria_id', flat=True).first()
+
     @staticmethod
     def obtener_por_categoria(categoria_id):
         # 🟢 Opción 1: Filtrar usando el campo ForeignKey_id
-        return Producto.objects.filter(categoria_id=categoria_id)
+        return Producto.objects.select_related('categoria').filter(categoria_id=categoria_id)
+
+    @staticmethod
+    def listar_filas(columnas, categoria_id=None, q=None, filtros=None, orden=None):
+        # .values() trae diccionarios directamente del cursor, sin instanciar modelos.
+        # Las columnas 'categoria__*' se resuelven con un JOIN en la misma consulta.
+        productos = ProductoRepository._filtrar(Producto.objects.all(), categoria_id, q, filtros)
+        if orden:
+            productos = productos.order_by(*ORDENES[orden])
+        return productos.values(*columnas)
+
+    @staticmethod
+    def iterar_filas(columnas, categoria_id=None, tamano_lote=2000):
+        # iterator() usa un cursor del lado del servidor en PostgreSQL: las filas
+        # llegan por lotes de tamano_lote y nunca se materializa la tabla completa.
+        filas = ProductoRepository.listar_filas(columnas, categoria_id=categoria_id)
+        return filas.order_by('id').iterator(chunk_size=tamano_lote)
+
+    @staticmethod
+    def iterar_nombres(tamano_lote=5000):
+        # (id, nombre, stock) de todo el catálogo para construir el índice de autocompletado
+        return Producto.objects.order_by().values_list('id', 'nombre', 'stock').iterator(chunk_size=tamano_lote)
+
+    @staticmethod
+    def _consulta_pagina(categoria_id, orden, columnas, q, filtros):
+        productos = ProductoRepository._filtrar(
+            Producto.objects.select_related('categoria'), categoria_id, q, filtros
+        )
+        if columnas:
+            # El keyset necesita leer de cada fila las columnas del orden
+            # (relevancia, precio, nombre...) aunque no se hayan pedido
+            claves = [campo.lstrip('-') for campo in ORDENES.get(orden, ())]
+            columnas = tuple(columnas) + tuple(c for c in claves if c not in columnas)
+            productos = productos.values(*columnas)
+        return productos
+
+    @staticmethod
+    def listar_pagina(categoria_id=None, orden='id', limite=None, cursor=None, columnas=None, q=None,
+                      filtros=None):
+        # Paginación por cursor (keyset) sobre el listado completo, por categoría o por búsqueda
+        productos = ProductoRepository._consulta_pagina(categoria_id, orden, columnas, q, filtros)
+        return paginar(productos, orden=orden, limite=limite, cursor=cursor)
+
+    # --- Consultas asíncronas (vistas ASGI, ver productos/views_async.py) ---
+    @staticmethod
+    async def alistar_filas(columnas, categoria_id=None, q=None, filtros=None, orden=None):
+        filas = ProductoRepository.listar_filas(columnas, categoria_id, q, filtros, orden)
+        return [fila async for fila in filas]
+
+    @staticmethod
+    async def alistar_pagina(categoria_id=None, orden='id', limite=None, cursor=None, columnas=None, q=None,
+                             filtros=None):
+        productos = ProductoRepository._consulta_pagina(categoria_id, orden, columnas, q, filtros)
+        return await apaginar(productos, orden=orden, limite=limite, cursor=cursor)
+
+    @staticmethod
+    async def aobtener_por_id(id):
+        try:
+            return await Producto.objects.select_related('categoria').aget(pk=id)
+        except ObjectDoesNotExist:
+            return None
+
+    @staticmethod
+    async def aobtener_por_ids(ids):
+        return await Producto.objects.select_related('categoria').ain_bulk(ids)
+
+    @staticmethod
+    def facetas(tramos, categoria_id=None, q=None, filtros=None):
+        # Una sola consulta agregada: GROUP BY categoría con conteo, min/max/suma
+        # de precio y un COUNT(...) FILTER (WHERE ...) por cada tramo de precio.
+        # tramos: límites inferiores ascendentes; el último tramo es abierto.
+        productos = ProductoRepository._filtrar(Producto.objects.all(), categoria_id, q, filtros)
+        conteos = {}
+        for indice, desde in enumerate(tramos):
+            condicion = Q(precio__gte=desde)
+            if indice + 1 < len(tramos):
+                condicion &= Q(precio__lt=tramos[indice + 1])
+            conteos[f'tramo_{indice}'] = Count('id', filter=condicion)
+        return list(
+            productos.order_by()
+            .values('categoria_id', 'categoria__nombre')
+            .annotate(
+                total=Count('id'),
+                precio_min=Min('precio'),
+                precio_max=Max('precio'),
+                precio_suma=Sum('precio'),
+                **conteos,
+            )
+            .order_by('categoria__nombre', 'categoria_id')
+        )
 
     # --- Mutaciones ---
     @staticmethod
@@ -29,20 +186,135 @@ class ProductoRepository:
         # 🟢 Mejor práctica: Usa el método .create() del Manager
         return Producto.objects.create(**datos)
 
+    @staticmethod
+    def crear_masivo(lista_datos, tamano_lote=None):
+        # Un INSERT multi-fila por lote en lugar de uno por producto
+        productos = [Producto(**datos) for datos in lista_datos]
+        return Producto.objects.bulk_create(productos, batch_size=tamano_lote)
+
+    @staticmethod
+    def categorias_por_sku(skus):
+        # {sku: (id, categoria_id)} de los que ya existen (una consulta IN)
+        return {
+            sku: (producto_id, categoria_id)
+            for sku, producto_id, categoria_id in Producto.objects.filter(sku__in=skus).values_list(
+                'sku', 'id', 'categoria_id'
+            )
+        }
+
+    @staticmethod
+    def upsert_por_sku(lista_datos, campos):
+        # INSERT ... ON CONFLICT (sku) DO UPDATE: altas y cambios en un solo viaje.
+        # Django 4.2 no devuelve los IDs de las filas actualizadas: se leen después.
+        # Devuelve {sku: id}
+        productos = [Producto(**datos) for datos in lista_datos]
+        Producto.objects.bulk_create(
+            productos, update_conflicts=True, unique_fields=['sku'],
+            update_fields=list(campos) + ['actualizado_en'],
+        )
+        return dict(
+            Producto.objects.filter(sku__in=[p.sku for p in productos]).values_list('sku', 'id')
+        )
+
+    @staticmethod
+    def categorias_existentes(categoria_ids):
+        # Una sola consulta IN para validar todas las categorías de un lote
+        return set(
+            Categoria.objects.filter(pk__in=set(categoria_ids)).values_list('pk', flat=True)
+        )
+
     @staticmethod
     def actualizar(id, datos):
         try:
-            producto = Producto.objects.get(pk=id)
+            producto = Producto.objects.select_related('categoria').get(pk=id)
         except ObjectDoesNotExist:
             return None
         
-        # Actualizar usando setattr() es correcto.
+        # Actualizar usando setattr() es correcto, pero sólo con lo que cambia
+        cambiados = []
         for campo, valor in datos.items():
-            setattr(producto, campo, valor)
-            
-        producto.save()
+            if getattr(producto, campo) != valor:
+                setattr(producto, campo, valor)
+                cambiados.append(campo)
+
+        if cambiados:
+            # UPDATE sólo de las columnas modificadas (más la marca de versión)
+            producto.save(update_fields=cambiados + ['actualizado_en'])
         return producto
 
+    @staticmethod
+    def obtener_para_actualizar(ids, campos):
+        # Sólo las columnas necesarias para un bulk_update posterior, con las
+        # filas bloqueadas (SELECT ... FOR UPDATE) en orden de ID ascendente como
+        # en bloquear_para_reserva: una reserva concurrente espera al UPDATE en
+        # lugar de perderse. Debe llamarse dentro de transaction.atomic().
+        return {
+            producto.pk: producto
+            for producto in Producto.objects.select_for_update()
+            .filter(pk__in=ids)
+            .order_by('pk')
+            .only('id', 'categoria_id', *campos)
+        }
+
+    @staticmethod
+    def actualizar_masivo(productos, campos, tamano_lote=None):
+        # bulk_update no dispara auto_now: la versión se fija explícitamente
+        ahora = timezone.now()
+        for producto in productos:
+            producto.actualizado_en = ahora
+        return Producto.objects.bulk_update(
+            productos, list(campos) + ['actualizado_en'], batch_size=tamano_lote
+        )
+
+    @staticmethod
+    def _mover_stock(id, unidades, limite):
+        # UPDATE ... SET stock = stock + u, reservado = reservado - u
+        # WHERE id = ? AND <limite> >= |u| RETURNING categoria_id, stock.
+        # La base lo aplica de forma atómica y devuelve el stock que dejó esta
+        # misma escritura, sin leer la fila antes ni después (otra lectura ya
+        # podría incluir reservas de otros clientes). Django 4.2 no expone
+        # RETURNING en update(); PostgreSQL y SQLite >= 3.35 lo admiten.
+        ops = connection.ops
+        tabla = ops.quote_name(Producto._meta.db_table)
+        stock, reservado, limite = ops.quote_name('stock'), ops.quote_name('reservado'), ops.quote_name(limite)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {tabla} SET {stock} = {stock} + %s, {reservado} = {reservado} - %s, "
+                f"{ops.quote_name('actualizado_en')} = %s "
+                f"WHERE {ops.quote_name('id')} = %s AND {limite} >= %s "
+                f"RETURNING {ops.quote_name('categoria_id')}, {stock}",
+                [unidades, unidades, ops.adapt_datetimefield_value(timezone.now()), id, abs(unidades)],
+            )
+            return cursor.fetchone()
+
+    @staticmethod
+    def reservar_stock(id, cantidad):
+        # (categoria_id, stock restante) o None si no existe o no alcanza el stock
+        return ProductoRepository._mover_stock(id, -cantidad, 'stock')
+
+    @staticmethod
+    def liberar_stock(id, cantidad):
+        # Simétrico a reservar_stock: sólo si hay al menos `cantidad` unidades reservadas
+        return ProductoRepository._mover_stock(id, cantidad, 'reservado')
+
+    @staticmethod
+    def bloquear_para_reserva(ids):
+        # SELECT ... FOR UPDATE en orden de ID ascendente: todas las
+        # transacciones toman los bloqueos en el mismo orden, así dos carritos
+        # con los mismos productos nunca se esperan mutuamente (sin deadlocks).
+        # Debe llamarse dentro de transaction.atomic().
+        return list(
+            Producto.objects.select_for_update()
+            .filter(pk__in=ids)
+            .order_by('pk')
+            .only('id', 'stock', 'reservado', 'categoria_id')
+        )
+
+    @staticmethod
+    def existe(id):
+        # De la primaria: se consulta tras una escritura fallida sobre ella
+        return Producto.objects.using('default').filter(pk=id).exists()
+
     @staticmethod
     def eliminar(id):
         try:
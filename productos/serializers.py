@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Producto 
+from .models import MAX_ENTERO, Producto
 from categorias.models import Categoria 
 
 class CategoriaSimpleSerializer(serializers.ModelSerializer):
@@ -30,4 +30,152 @@ class ProductoSerializer(serializers.ModelSerializer):
             'categoria',      # Lectura: objeto completo
             'categoria_id'    # Escritura: solo ID
         )
-        read_only_fields = ('id',)
\ No newline at end of file
+        read_only_fields = ('id',)
+
+class ProductoMasivoSerializer(serializers.ModelSerializer):
+    # Para altas masivas la categoría se valida aparte con una sola consulta IN,
+    # así que aquí sólo se comprueba que sea un entero (sin consulta por ítem)
+    categoria_id = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = Producto
+        fields = (
+            'nombre',
+            'descripcion',
+            'precio',
+            'stock',
+            'imagen_url',
+            'categoria_id'
+        )
+
+
+class ProductoPrecioStockSerializer(serializers.Serializer):
+    # Ítem de la actualización masiva: sólo precio y/o stock por ID
+    id = serializers.IntegerField(min_value=1, max_value=MAX_ENTERO)
+    precio = serializers.IntegerField(min_value=0, max_value=MAX_ENTERO, required=False)
+    stock = serializers.IntegerField(min_value=0, max_value=MAX_ENTERO, required=False)
+
+    def validate(self, attrs):
+        if 'precio' not in attrs and 'stock' not in attrs:
+            raise serializers.ValidationError("Se requiere 'precio' o 'stock'")
+        return attrs
+
+
+class CantidadSerializer(serializers.Serializer):
+    cantidad = serializers.IntegerField(min_value=1)
+
+
+class ItemCarritoSerializer(CantidadSerializer):
+    id = serializers.IntegerField(min_value=1)
+
+
+class CarritoSerializer(serializers.Serializer):
+    items = ItemCarritoSerializer(many=True, allow_empty=False)
+
+
+class IdsSerializer(serializers.Serializer):
+    # Cuerpo de POST productos/lote/: {"ids": [1, 2, 3]}
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+
+
+class ProductoListaSerializer:
+    """
+    Serializador de solo lectura para listados grandes.
+
+    Produce exactamente el mismo JSON que ProductoSerializer, pero a partir de
+    filas de .values() (diccionarios), sin instanciar modelos ni recorrer los
+    campos de DRF uno por uno.
+
+    Con `campos` (ver seleccionar_campos) sólo emite esos campos; las
+    columnas() correspondientes son las únicas que se piden a la base.
+    """
+    COLUMNAS = (
+        'id',
+        'nombre',
+        'descripcion',
+        'precio',
+        'stock',
+        'imagen_url',
+        'categoria_id',
+        'categoria__nombre',
+    )
+
+    # Campo público -> columnas de .values() que necesita. 'categoria' es el
+    # único que requiere el JOIN con categorias.
+    CAMPOS = {
+        'id': ('id',),
+        'nombre': ('nombre',),
+        'descripcion': ('descripcion',),
+        'precio': ('precio',),
+        'stock': ('stock',),
+        'imagen_url': ('imagen_url',),
+        'categoria': ('categoria_id', 'categoria__nombre'),
+    }
+
+    def __init__(self, filas, campos=None):
+        self.filas = filas
+        self.campos = campos
+
+    @classmethod
+    def seleccionar_campos(cls, fields=None, exclude=None):
+        """
+        ?fields=id,nombre / ?exclude=descripcion -> tupla de campos en el orden
+        de CAMPOS, o None si se piden todos.
+        """
+        if not fields and not exclude:
+            return None
+        pedidos = [campo.strip() for campo in (fields or '').split(',') if campo.strip()]
+        excluidos = [campo.strip() for campo in (exclude or '').split(',') if campo.strip()]
+        desconocidos = sorted(set(pedidos + excluidos) - set(cls.CAMPOS))
+        if desconocidos:
+            raise ValueError(f"Campos desconocidos: {', '.join(desconocidos)}")
+
+        campos = tuple(
+            campo for campo in cls.CAMPOS
+            if (not pedidos or campo in pedidos) and campo not in excluidos
+        )
+        if not campos:
+            raise ValueError("La selección de campos está vacía")
+        return campos
+
+    @classmethod
+    def columnas(cls, campos=None):
+        if campos is None:
+            return cls.COLUMNAS
+        return tuple(columna for campo in campos for columna in cls.CAMPOS[campo])
+
+    @staticmethod
+    def to_representation(fila):
+        return {
+            'id': fila['id'],
+            'nombre': fila['nombre'],
+            'descripcion': fila['descripcion'],
+            'precio': fila['precio'],
+            'stock': fila['stock'],
+            'imagen_url': fila['imagen_url'],
+            'categoria': {
+                'id': fila['categoria_id'],
+                'nombre': fila['categoria__nombre'],
+            },
+        }
+
+    @staticmethod
+    def proyectar(datos, campos):
+        # Recorta un payload ya serializado (p. ej. el detalle cacheado)
+        if campos is None:
+            return datos
+        return {campo: datos[campo] for campo in campos}
+
+    def _representar_campos(self, fila):
+        datos = {}
+        for campo in self.campos:
+            if campo == 'categoria':
+                datos['categoria'] = {'id': fila['categoria_id'], 'nombre': fila['categoria__nombre']}
+            else:
+                datos[campo] = fila[campo]
+        return datos
+
+    @property
+    def data(self):
+        representar = self.to_representation if self.campos is None else self._representar_campos
+        return [representar(fila) for fila in self.filas]
@@ -1,8 +1,96 @@
 from productos.repositories import ProductoRepository
+from productos.cache import CambiosAutocompletado, FacetasCache, ProductoCache, VersionCatalogo, VersionCategorias
+from productos.serializers import ProductoSerializer
+from productos.autocompletado import AutocompletadoCatalogo
+from productos.paginacion import ORDENES
 from categorias.models import Categoria
 from django.core.exceptions import ObjectDoesNotExist 
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from servicio_productos.routers import consultas_por_alias, leyendo_de_primaria, usar_primaria
+
+# Altas masivas: tamaño de cada lote (una transacción y un INSERT por lote)
+TAMANO_LOTE_MASIVO = 500
+MAX_ITEMS_MASIVO = 10000
+
+# Lecturas por lote (?ids= / productos/lote/)
+MAX_IDS_LOTE = 1000
+
+# Facetas: límites inferiores de los tramos de precio por defecto (el último es abierto)
+TRAMOS_PRECIO = (0, 50, 100, 250, 500, 1000)
+MAX_TRAMOS = 20
+
+# Backend con pool de conexiones (DB_POOL=1)
+MOTOR_POOL = 'servicio_productos.postgresql_pool'
+
+# Índice de nombres en memoria de este proceso (ver productos/autocompletado.py)
+autocompletado = AutocompletadoCatalogo(
+    cargar_todo=ProductoRepository.iterar_nombres,
+    cambios=CambiosAutocompletado,
+    verificar_cada=settings.AUTOCOMPLETADO_VERIFICAR_CADA,
+    max_antiguedad=settings.AUTOCOMPLETADO_MAX_ANTIGUEDAD,
+    # La reconstrucción de fondo abre su propia conexión: se cierra al terminar
+    al_terminar_hilo=connections.close_all,
+)
+
+
+class StockInsuficiente(ValueError):
+    def __init__(self, mensaje, faltantes=None):
+        super().__init__(mensaje)
+        # [{'id', 'solicitado', 'disponible'}] cuando se reserva un carrito
+        self.faltantes = faltantes or []
+
+
+class ReservaInsuficiente(ValueError):
+    pass
+
 
 class ProductoService:
+    @staticmethod
+    def _registrar_cambios(producto_ids, categoria_ids, indice=(), categorias=()):
+        # Punto único tras cualquier mutación: invalida el detalle cacheado,
+        # renueva las versiones de catálogo/categoría usadas en los ETag y
+        # publica los cambios (id, nombre, stock) del índice de autocompletado
+        # (vacío si no cambia ni nombre ni stock, p. ej. un cambio de precio).
+        # `categorias` son las categorías cuyo nombre o recuento de productos
+        # cambia (altas, bajas, traslados): sólo ellas renuevan la cache de la
+        # API de categorías, que no depende de precios ni de stock
+        ProductoCache.invalidar(*producto_ids)
+        VersionCatalogo.incrementar([c for c in categoria_ids if c is not None])
+        if categorias:
+            VersionCategorias.incrementar([c for c in categorias if c is not None])
+        autocompletado.refrescar(indice)
+
+    @staticmethod
+    def invalidar_categoria(categoria_id, producto_ids=(), indice=()):
+        # Escrituras de categorías: renueva sus versiones (ETag, facetas, cache de
+        # categorías) y los detalles de los productos indicados, que incluyen su
+        # nombre; `indice` lleva los cambios de autocompletado (p. ej. bajas en cascada)
+        ProductoService._registrar_cambios(
+            list(producto_ids), [categoria_id], indice, categorias=[categoria_id]
+        )
+
+    @staticmethod
+    def version_listado(categoria_id=None):
+        return VersionCatalogo.obtener(categoria_id)
+
+    @staticmethod
+    def validadores_activos():
+        # Los ETag por versión sólo valen si todos los procesos ven la misma
+        # versión: con una cache por proceso (locmem) una escritura en otro
+        # worker no la cambiaría y se responderían 304 con datos viejos
+        return settings.CACHE_VERSIONES_COMPARTIDAS
+
+    @staticmethod
+    def validadores_listado_activos():
+        # El listado no se cachea: si se lee de una réplica puede ir por detrás de
+        # la versión y un ETag con ella fijaría datos viejos (304 indefinidos)
+        return ProductoService.validadores_activos() and (not settings.DB_REPLICAS or leyendo_de_primaria())
+
+    @staticmethod
+    def autocompletar(prefijo, k=10):
+        return autocompletado.buscar(prefijo, k)
+
     @staticmethod
     def listar_productos():
         return ProductoRepository.listar()
@@ -13,6 +101,153 @@ class ProductoService:
         # o simplemente delegar al repositorio.
         return ProductoRepository.obtener_por_categoria(categoria_id)
 
+    @staticmethod
+    def _validar_consulta(q, orden, filtros):
+        # En una búsqueda el orden por defecto es la relevancia
+        orden = orden or ('relevancia' if q else None)
+        if orden is not None and orden not in ORDENES:
+            raise ValueError(f"Orden no soportado: {orden}")
+        if orden == 'relevancia' and not q:
+            raise ValueError("El orden por relevancia requiere ?q=")
+
+        filtros = filtros or {}
+        precio_min, precio_max = filtros.get('precio_min'), filtros.get('precio_max')
+        if (precio_min is not None and precio_min < 0) or (precio_max is not None and precio_max < 0):
+            raise ValueError("El precio no puede ser negativo")
+        if precio_min is not None and precio_max is not None and precio_min > precio_max:
+            raise ValueError("precio_min no puede ser mayor que precio_max")
+        return orden
+
+    @staticmethod
+    def listar_filas(columnas, categoria_id=None, q=None, filtros=None, orden=None):
+        orden = ProductoService._validar_consulta(q, orden, filtros)
+        return ProductoRepository.listar_filas(
+            columnas, categoria_id=categoria_id, q=q, filtros=filtros, orden=orden
+        )
+
+    @staticmethod
+    def exportar_catalogo(columnas, categoria_id=None, tamano_lote=2000):
+        return ProductoRepository.iterar_filas(
+            columnas, categoria_id=categoria_id, tamano_lote=tamano_lote
+        )
+
+    @staticmethod
+    def listar_pagina(categoria_id=None, orden=None, limite=None, cursor=None, columnas=None, q=None,
+                      filtros=None):
+        orden = ProductoService._validar_consulta(q, orden, filtros) or 'id'
+        return ProductoRepository.listar_pagina(
+            categoria_id=categoria_id, orden=orden, limite=limite, cursor=cursor, columnas=columnas, q=q,
+            filtros=filtros,
+        )
+
+    @staticmethod
+    def facetas(categoria_id=None, q=None, filtros=None, tramos=None):
+        """
+        Conteos por categoría, estadísticas de precio e histograma por tramos
+        para los filtros dados. Se calcula con una consulta y se cachea por
+        combinación de filtros hasta la siguiente mutación del catálogo.
+        """
+        ProductoService._validar_consulta(q, None, filtros)
+        tramos = tuple(tramos or TRAMOS_PRECIO)
+        if len(tramos) > MAX_TRAMOS:
+            raise ValueError(f"Máximo {MAX_TRAMOS} tramos de precio")
+        if any(desde < 0 for desde in tramos) or list(tramos) != sorted(set(tramos)):
+            raise ValueError("Los tramos deben ser precios ascendentes y no negativos")
+
+        parametros = {'categoria_id': categoria_id, 'q': q, 'tramos': tramos, **(filtros or {})}
+        return FacetasCache.obtener_o_calcular(
+            VersionCatalogo.obtener(categoria_id),
+            parametros,
+            lambda: ProductoService._armar_facetas(
+                ProductoRepository.facetas(tramos, categoria_id=categoria_id, q=q, filtros=filtros), tramos
+            ),
+        )
+
+    @staticmethod
+    def _armar_facetas(filas, tramos):
+        def histograma(conteos):
+            return [
+                {'desde': desde, 'hasta': tramos[i + 1] if i + 1 < len(tramos) else None, 'total': total}
+                for i, (desde, total) in enumerate(zip(tramos, conteos))
+            ]
+
+        def precio(minimo, maximo, suma, total):
+            promedio = round(suma / total, 2) if total else None
+            return {'min': minimo, 'max': maximo, 'promedio': promedio}
+
+        categorias = []
+        for fila in filas:
+            conteos = [fila[f'tramo_{i}'] for i in range(len(tramos))]
+            categorias.append({
+                'id': fila['categoria_id'],
+                'nombre': fila['categoria__nombre'],
+                'total': fila['total'],
+                'precio': precio(fila['precio_min'], fila['precio_max'], fila['precio_suma'], fila['total']),
+                'histograma': histograma(conteos),
+            })
+
+        # Los totales globales se derivan de las filas por categoría, sin otra consulta
+        total = sum(fila['total'] for fila in filas)
+        return {
+            'total': total,
+            'precio': precio(
+                min((fila['precio_min'] for fila in filas), default=None),
+                max((fila['precio_max'] for fila in filas), default=None),
+                sum(fila['precio_suma'] for fila in filas),
+                total,
+            ),
+            'histograma': histograma(
+                [sum(fila[f'tramo_{i}'] for fila in filas) for i in range(len(tramos))]
+            ),
+            'categorias': categorias,
+        }
+
+    # --- Lecturas asíncronas (vistas ASGI, ver productos/views_async.py) ---
+    # Mismas reglas y misma cache que sus equivalentes síncronos.
+    @staticmethod
+    async def aversion_listado(categoria_id=None):
+        return await VersionCatalogo.aobtener(categoria_id)
+
+    @staticmethod
+    async def alistar_filas(columnas, categoria_id=None, q=None, filtros=None, orden=None):
+        orden = ProductoService._validar_consulta(q, orden, filtros)
+        return await ProductoRepository.alistar_filas(
+            columnas, categoria_id=categoria_id, q=q, filtros=filtros, orden=orden
+        )
+
+    @staticmethod
+    async def alistar_pagina(categoria_id=None, orden=None, limite=None, cursor=None, columnas=None, q=None,
+                             filtros=None):
+        orden = ProductoService._validar_consulta(q, orden, filtros) or 'id'
+        return await ProductoRepository.alistar_pagina(
+            categoria_id=categoria_id, orden=orden, limite=limite, cursor=cursor, columnas=columnas, q=q,
+            filtros=filtros,
+        )
+
+    @staticmethod
+    async def aobtener_detalle(producto_id):
+        async def cargar():
+            producto = await ProductoRepository.aobtener_por_id(producto_id)
+            if not producto:
+                return None
+            return ProductoService._entrada_detalle(producto)
+
+        entrada = await ProductoCache.aobtener_o_cargar(producto_id, cargar)
+        if entrada is None:
+            raise ValueError("Producto no encontrado")
+        return entrada
+
+    @staticmethod
+    async def aobtener_detalles(producto_ids):
+        ids = ProductoService._ids_lote(producto_ids)
+
+        async def cargar_varios(pendientes):
+            productos = await ProductoRepository.aobtener_por_ids(pendientes)
+            return ProductoService._entradas_detalle(productos)
+
+        entradas = await ProductoCache.aobtener_o_cargar_varios(ids, cargar_varios)
+        return ProductoService._separar_lote(ids, entradas)
+
     @staticmethod
     def crear_producto(datos):
         # --- Lógica de Negocio (Validaciones) ---
@@ -38,8 +273,92 @@ class ProductoService:
             raise ValueError("Categoría no encontrada")
             
         # --- Persistencia ---
-        return ProductoRepository.crear(datos)
+        producto = ProductoRepository.crear(datos)
+        # Invalida también un posible 404 cacheado para este ID
+        ProductoService._registrar_cambios(
+            [producto.id], [producto.categoria_id], [(producto.id, producto.nombre, producto.stock)],
+            categorias=[producto.categoria_id],
+        )
+        return producto
     
+    @staticmethod
+    def crear_productos_masivo(lista_datos, tamano_lote=TAMANO_LOTE_MASIVO):
+        """
+        Crea muchos productos con bulk_create. Devuelve una lista alineada con
+        la entrada: el Producto creado o un ValueError con el motivo del fallo.
+        """
+        if len(lista_datos) > MAX_ITEMS_MASIVO:
+            raise ValueError(f"Máximo {MAX_ITEMS_MASIVO} productos por petición")
+
+        resultados = [None] * len(lista_datos)
+
+        # Todas las categorías se validan con una sola consulta IN
+        existentes = ProductoRepository.categorias_existentes(
+            datos['categoria_id'] for datos in lista_datos
+        )
+        pendientes = []
+        for indice, datos in enumerate(lista_datos):
+            # Mismas reglas de negocio que crear_producto
+            if datos.get('precio', 0) < 0:
+                resultados[indice] = ValueError("El precio no puede ser negativo")
+            elif datos.get('stock', 0) < 0:
+                resultados[indice] = ValueError("El stock no puede ser negativo")
+            elif datos['categoria_id'] not in existentes:
+                resultados[indice] = ValueError("Categoría no encontrada")
+            else:
+                pendientes.append(indice)
+
+        for inicio in range(0, len(pendientes), tamano_lote):
+            lote = pendientes[inicio:inicio + tamano_lote]
+            try:
+                with transaction.atomic():
+                    creados = ProductoRepository.crear_masivo([lista_datos[i] for i in lote])
+            except DatabaseError:
+                for indice in lote:
+                    resultados[indice] = ValueError("No se pudo guardar el lote")
+                continue
+            for indice, producto in zip(lote, creados):
+                resultados[indice] = producto
+
+        creados = [r for r in resultados if not isinstance(r, ValueError)]
+        if creados:
+            ProductoService._registrar_cambios(
+                [p.id for p in creados], [p.categoria_id for p in creados],
+                [(p.id, p.nombre, p.stock) for p in creados],
+                categorias=[p.categoria_id for p in creados],
+            )
+        return resultados
+
+    @staticmethod
+    def importar_lote(lista_datos):
+        """
+        Upsert de productos por 'sku' (clave natural del proveedor).
+        Si un sku se repite en el lote gana la última fila.
+        Devuelve (creados, actualizados).
+        """
+        por_sku = {datos['sku']: datos for datos in lista_datos}
+        if not por_sku:
+            return 0, 0
+        campos = {campo for datos in por_sku.values() for campo in datos if campo != 'sku'}
+        # Los sku existentes y los IDs tras el upsert se leen de la primaria: una
+        # réplica con retraso no vería las filas recién escritas (sin middleware
+        # que lo fuerce, p. ej. desde importar_catalogo)
+        with usar_primaria(), transaction.atomic():
+            # Las categorías anteriores también cambian si un producto se mueve
+            existentes = ProductoRepository.categorias_por_sku(list(por_sku))
+            ids = ProductoRepository.upsert_por_sku(list(por_sku.values()), campos)
+        categorias = {d['categoria_id'] for d in por_sku.values()} | {c for _, c in existentes.values()}
+        # Cambian de recuento las categorías con altas y las de origen y destino de un traslado
+        recuentos = set()
+        for sku, datos in por_sku.items():
+            anterior = existentes.get(sku, (None, None))[1]
+            if anterior != datos['categoria_id']:
+                recuentos.update((anterior, datos['categoria_id']))
+        ProductoService._registrar_cambios(list(ids.values()), categorias, [
+            (ids[sku], datos.get('nombre'), datos.get('stock')) for sku, datos in por_sku.items()
+        ], categorias=recuentos)
+        return len(por_sku) - len(existentes), len(existentes)
+
     @staticmethod
     def obtener_producto(producto_id):
         producto = ProductoRepository.obtener_por_id(producto_id)
@@ -47,12 +366,239 @@ class ProductoService:
             raise ValueError("Producto no encontrado")
         return producto
 
+    @staticmethod
+    def obtener_detalle(producto_id):
+        # Read-through: el payload serializado y su versión se sirven desde cache
+        def cargar():
+            producto = ProductoRepository.obtener_por_id(producto_id)
+            if not producto:
+                return None
+            return ProductoService._entrada_detalle(producto)
+
+        entrada = ProductoCache.obtener_o_cargar(producto_id, cargar)
+        if entrada is None:
+            raise ValueError("Producto no encontrado")
+        return entrada
+
+    @staticmethod
+    def _entrada_detalle(producto):
+        datos = dict(ProductoSerializer(producto).data)
+        return {'datos': datos, 'etag': ProductoCache.etag(producto.id, datos)}
+
+    @staticmethod
+    def obtener_detalles(producto_ids):
+        """
+        Detalle de varios productos en el orden pedido (sin repetidos).
+        Los calientes salen de la cache del detalle y el resto de una sola
+        consulta IN. Devuelve (payloads encontrados, ids inexistentes).
+        """
+        ids = ProductoService._ids_lote(producto_ids)
+
+        def cargar_varios(pendientes):
+            productos = ProductoRepository.obtener_por_ids(pendientes)
+            return ProductoService._entradas_detalle(productos)
+
+        entradas = ProductoCache.obtener_o_cargar_varios(ids, cargar_varios)
+        return ProductoService._separar_lote(ids, entradas)
+
+    @staticmethod
+    def _ids_lote(producto_ids):
+        ids = list(dict.fromkeys(producto_ids))
+        if not ids:
+            raise ValueError("Se requiere al menos un ID")
+        if len(ids) > MAX_IDS_LOTE:
+            raise ValueError(f"Máximo {MAX_IDS_LOTE} IDs por petición")
+        return ids
+
+    @staticmethod
+    def _entradas_detalle(productos):
+        # {id: Producto} -> {id: entrada de cache del detalle}
+        return {
+            producto_id: ProductoService._entrada_detalle(producto)
+            for producto_id, producto in productos.items()
+        }
+
+    @staticmethod
+    def _separar_lote(ids, entradas):
+        encontrados = [entradas[i]['datos'] for i in ids if entradas[i] is not None]
+        faltantes = [i for i in ids if entradas[i] is None]
+        return encontrados, faltantes
+
+    @staticmethod
+    def obtener_producto_serializado(producto_id):
+        return ProductoService.obtener_detalle(producto_id)['datos']
+
     @staticmethod
     def actualizar_producto(id, datos):
         # Lógica de servicio antes de actualizar, como validar campos o permisos
-        return ProductoRepository.actualizar(id, datos)
+        if datos.get('precio', 0) < 0:
+            raise ValueError("El precio no puede ser negativo")
+
+        categoria_anterior = None
+        if 'categoria' in datos or 'categoria_id' in datos:
+            categoria_anterior = ProductoRepository.obtener_categoria_id(id)
+
+        producto = ProductoRepository.actualizar(id, datos)
+        if producto:
+            indice = [(id, producto.nombre, producto.stock)] if {'nombre', 'stock'} & set(datos) else []
+            # Un traslado cambia el recuento de las dos categorías
+            trasladado = categoria_anterior is not None and categoria_anterior != producto.categoria_id
+            ProductoService._registrar_cambios(
+                [id], [categoria_anterior, producto.categoria_id], indice,
+                categorias=[categoria_anterior, producto.categoria_id] if trasladado else (),
+            )
+        return producto
+
+    @staticmethod
+    def actualizar_precios_stock_masivo(cambios, tamano_lote=TAMANO_LOTE_MASIVO):
+        """
+        Aplica cambios de precio/stock a muchos productos con bulk_update.
+        cambios: [{'id': ..., 'precio': ..., 'stock': ...}] (precio/stock opcionales).
+        Devuelve (ids actualizados, ids inexistentes).
+        """
+        if len(cambios) > MAX_ITEMS_MASIVO:
+            raise ValueError(f"Máximo {MAX_ITEMS_MASIVO} productos por petición")
+
+        # Si un ID aparece varias veces, los cambios se acumulan en orden
+        por_id = {}
+        for cambio in cambios:
+            por_id.setdefault(cambio['id'], {}).update(
+                {campo: valor for campo, valor in cambio.items() if campo != 'id'}
+            )
+
+        actualizados, no_encontrados, categorias, indice = [], [], set(), []
+        ids = list(por_id)
+        for inicio in range(0, len(ids), tamano_lote):
+            lote = ids[inicio:inicio + tamano_lote]
+            campos = {campo for i in lote for campo in por_id[i]}
+            with transaction.atomic():
+                # Un SELECT (con bloqueo) y un UPDATE (CASE ... WHEN) por lote y
+                # por combinación de campos: cada fila sólo escribe las columnas
+                # que cambia, así un cambio de precio nunca reescribe el stock
+                productos = ProductoRepository.obtener_para_actualizar(lote, campos)
+                grupos = {}
+                for producto_id in lote:
+                    producto = productos.get(producto_id)
+                    if producto is None:
+                        no_encontrados.append(producto_id)
+                        continue
+                    for campo, valor in por_id[producto_id].items():
+                        setattr(producto, campo, valor)
+                    grupos.setdefault(frozenset(por_id[producto_id]), []).append(producto)
+                    if 'stock' in por_id[producto_id]:
+                        indice.append((producto_id, None, producto.stock))
+                for campos_grupo, productos_grupo in grupos.items():
+                    if campos_grupo:
+                        ProductoRepository.actualizar_masivo(productos_grupo, campos_grupo)
+            actualizados.extend(productos)
+            categorias.update(p.categoria_id for p in productos.values())
+
+        if actualizados:
+            ProductoService._registrar_cambios(actualizados, categorias, indice)
+        return actualizados, no_encontrados
+
+    @staticmethod
+    def reservar_stock(id, cantidad):
+        # Devuelve el stock restante; StockInsuficiente si no alcanza
+        if cantidad < 1:
+            raise ValueError("La cantidad debe ser mayor que 0")
+
+        actual = ProductoRepository.reservar_stock(id, cantidad)
+        if actual is None:
+            if not ProductoRepository.existe(id):
+                raise ValueError("Producto no encontrado")
+            raise StockInsuficiente("Stock insuficiente")
+        categoria_id, stock = actual
+
+        ProductoService._registrar_cambios([id], [categoria_id], [(id, None, stock)])
+        return stock
+
+    @staticmethod
+    def reservar_carrito(items):
+        """
+        Reserva todos los ítems de un carrito o ninguno.
+        items: [{'id': ..., 'cantidad': ...}]. Devuelve {id: stock restante}.
+        """
+        cantidades = {}
+        for item in items:
+            if item['cantidad'] < 1:
+                raise ValueError("La cantidad debe ser mayor que 0")
+            cantidades[item['id']] = cantidades.get(item['id'], 0) + item['cantidad']
+        if not cantidades:
+            raise ValueError("El carrito está vacío")
+
+        with transaction.atomic():
+            productos = ProductoRepository.bloquear_para_reserva(sorted(cantidades))
+
+            encontrados = {producto.id for producto in productos}
+            no_encontrados = sorted(set(cantidades) - encontrados)
+            if no_encontrados:
+                raise ValueError(f"Productos no encontrados: {no_encontrados}")
+
+            faltantes = [
+                {'id': p.id, 'solicitado': cantidades[p.id], 'disponible': p.stock}
+                for p in productos
+                if p.stock < cantidades[p.id]
+            ]
+            if faltantes:
+                # Salir con excepción revierte la transacción y libera los bloqueos
+                raise StockInsuficiente("Stock insuficiente", faltantes)
+
+            for producto in productos:
+                producto.stock -= cantidades[producto.id]
+                producto.reservado += cantidades[producto.id]
+            ProductoRepository.actualizar_masivo(productos, ['stock', 'reservado'])
+
+        ProductoService._registrar_cambios(
+            [p.id for p in productos], [p.categoria_id for p in productos],
+            [(p.id, None, p.stock) for p in productos],
+        )
+        return {producto.id: producto.stock for producto in productos}
+
+    @staticmethod
+    def liberar_stock(id, cantidad):
+        if cantidad < 1:
+            raise ValueError("La cantidad debe ser mayor que 0")
+        actual = ProductoRepository.liberar_stock(id, cantidad)
+        if actual is None:
+            if not ProductoRepository.existe(id):
+                raise ValueError("Producto no encontrado")
+            raise ReservaInsuficiente("No hay tantas unidades reservadas")
+
+        categoria_id, stock = actual
+        ProductoService._registrar_cambios([id], [categoria_id], [(id, None, stock)])
+        return stock
 
     @staticmethod
     def eliminar_producto(id):
         # Lógica de servicio, como verificar si hay dependencias antes de eliminar
-        return ProductoRepository.eliminar(id)
\ No newline at end of file
+        categoria_id = ProductoRepository.obtener_categoria_id(id)
+        eliminado = ProductoRepository.eliminar(id)
+        if eliminado:
+            ProductoService._registrar_cambios([id], [categoria_id], [(id, None, None)], categorias=[categoria_id])
+        return eliminado
+
+    @staticmethod
+    def estadisticas_cache():
+        return ProductoCache.estadisticas()
+
+    @staticmethod
+    def estadisticas_conexiones():
+        # Por alias: métricas del pool (DB_POOL=1) o la reutilización por hilo y las consultas ejecutadas
+        datos = {}
+        consultas = consultas_por_alias()
+        for alias in connections:
+            ajustes = connections.settings[alias]
+            pool = None
+            if ajustes['ENGINE'] == MOTOR_POOL:
+                from servicio_productos.postgresql_pool.base import pools
+                pool = pools().get(alias)
+            datos[alias] = {
+                'motor': ajustes['ENGINE'],
+                'conn_max_age': ajustes['CONN_MAX_AGE'],
+                'conn_health_checks': ajustes['CONN_HEALTH_CHECKS'],
+                'pool': pool.estadisticas() if pool is not None else None,
+                'consultas': consultas[alias],
+                'replica': alias in settings.DB_REPLICAS,
+            }
+        return datos
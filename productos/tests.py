@@ -1,12 +1,23 @@
-from django.test import TestCase, Client
-from rest_framework.test import APITestCase
+from django.test import TestCase, TransactionTestCase, Client, AsyncClient, override_settings
+from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
 from django.urls import reverse
+from django.conf import settings as django_settings
 from productos.models import Producto
 from productos.services import ProductoService
 from productos.repositories import ProductoRepository
+from productos.cache import ProductoCache
+from productos.serializers import ProductoListaSerializer
 from categorias.models import Categoria
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from asgiref.sync import sync_to_async
+from concurrent.futures import ThreadPoolExecutor
 import json
+import os
+import random
+import time
 
 
 class CategoriaModelTests(TestCase):
@@ -276,6 +287,7 @@ class ProductoAPITests(APITestCase):
     """Tests para los endpoints de la API"""
     
     def setUp(self):
+        caches['productos'].clear()
         self.client = Client()
         self.categoria = Categoria.objects.create(
             nombre="Electrónica",
@@ -392,6 +404,7 @@ class IntegrationTests(TestCase):
     """Tests de integración del flujo completo"""
     
     def setUp(self):
+        caches['productos'].clear()
         self.client = Client()
         self.categoria = Categoria.objects.create(
             nombre="Electrónica",
@@ -443,3 +456,2405 @@ class IntegrationTests(TestCase):
         # Verificar
         producto_actualizado = Producto.objects.get(pk=producto.id)
         self.assertEqual(producto_actualizado.stock, 5)
+
+
+class PaginacionCursorTests(APITestCase):
+    """Tests para la paginación por cursor (keyset) del listado"""
+
+    def setUp(self):
+        self.client = Client()
+        self.categoria = Categoria.objects.create(nombre="Electrónica")
+        self.categoria2 = Categoria.objects.create(nombre="Ropa")
+        self.productos = [
+            Producto.objects.create(
+                nombre=f"Producto {i}",
+                precio=(i % 3) * 100,
+                stock=i,
+                categoria=self.categoria if i % 2 else self.categoria2
+            )
+            for i in range(7)
+        ]
+
+    def _recorrer(self, params):
+        ids = []
+        response = self.client.get(reverse('productos'), params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(p['id'] for p in response.data['results'])
+            if not response.data['next']:
+                return ids, response
+            response = self.client.get(
+                reverse('productos'), {**params, 'cursor': response.data['next']}
+            )
+
+    def test_primera_pagina(self):
+        """Verifica que ?limit= devuelve la primera página y el cursor siguiente"""
+        response = self.client.get(reverse('productos'), {'limit': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [p['id'] for p in response.data['results']],
+            [p.id for p in self.productos[:3]]
+        )
+        self.assertIsNotNone(response.data['next'])
+        self.assertIsNone(response.data['prev'])
+
+    def test_recorrer_todas_las_paginas(self):
+        """Verifica que siguiendo 'next' se obtiene cada producto una sola vez"""
+        ids, ultima = self._recorrer({'limit': 3})
+        self.assertEqual(ids, [p.id for p in self.productos])
+        self.assertIsNotNone(ultima.data['prev'])
+
+    def test_pagina_anterior(self):
+        """Verifica que el cursor 'prev' devuelve la página previa"""
+        primera = self.client.get(reverse('productos'), {'limit': 3})
+        segunda = self.client.get(reverse('productos'), {'limit': 3, 'cursor': primera.data['next']})
+        previa = self.client.get(reverse('productos'), {'limit': 3, 'cursor': segunda.data['prev']})
+        self.assertEqual(previa.data['results'], primera.data['results'])
+        self.assertIsNone(previa.data['prev'])
+        self.assertEqual(previa.data['next'], primera.data['next'])
+
+    def test_orden_por_precio(self):
+        """Verifica el keyset (precio, id) con precios repetidos"""
+        ids, _ = self._recorrer({'limit': 2, 'orden': 'precio'})
+        esperado = [p.id for p in sorted(self.productos, key=lambda p: (p.precio, p.id))]
+        self.assertEqual(ids, esperado)
+
+    def test_paginacion_por_categoria(self):
+        """Verifica que ?categoria= también se pagina"""
+        ids, _ = self._recorrer({'limit': 2, 'categoria': self.categoria.id})
+        esperado = [p.id for p in self.productos if p.categoria_id == self.categoria.id]
+        self.assertEqual(ids, esperado)
+
+    def test_cursor_invalido(self):
+        """Verifica que un cursor manipulado retorna 400"""
+        response = self.client.get(reverse('productos'), {'cursor': 'no-es-un-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor_de_otro_orden(self):
+        """Verifica que un cursor no se puede reutilizar con otro orden"""
+        response = self.client.get(reverse('productos'), {'limit': 2, 'orden': 'precio'})
+        response = self.client.get(
+            reverse('productos'), {'limit': 2, 'cursor': response.data['next']}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor_con_valores_manipulados(self):
+        """Verifica que un cursor con valores que no son una lista de escalares retorna 400"""
+        import base64
+        siguiente = self.client.get(reverse('productos'), {'limit': 2}).data['next']
+        datos = json.loads(base64.urlsafe_b64decode(siguiente + '=' * (-len(siguiente) % 4)))
+        for valores in (5, None, [{'a': 1}] * len(datos['v']), [None] * len(datos['v'])):
+            cursor = base64.urlsafe_b64encode(json.dumps({**datos, 'v': valores}).encode()).decode()
+            response = self.client.get(reverse('productos'), {'limit': 2, 'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data, {'error': "Cursor inválido"})
+
+    def test_limit_invalido(self):
+        """Verifica que un limit no numérico retorna 400"""
+        response = self.client.get(reverse('productos'), {'limit': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sin_limit_devuelve_lista_completa(self):
+        """Verifica que sin parámetros de paginación se mantiene la lista completa"""
+        response = self.client.get(reverse('productos'))
+        self.assertEqual(len(response.data), 7)
+
+
+class PresupuestoConsultasTests(APITestCase):
+    """Presupuestos de consultas SQL por endpoint (evita regresiones N+1)"""
+
+    def setUp(self):
+        caches['productos'].clear()
+        self.client = Client()
+        self.categorias = [Categoria.objects.create(nombre=f"Categoría {i}") for i in range(3)]
+        self.productos = [
+            Producto.objects.create(
+                nombre=f"Producto {i}",
+                precio=100 + i,
+                stock=i,
+                categoria=self.categorias[i % 3]
+            )
+            for i in range(12)
+        ]
+
+    def test_listar_productos(self):
+        """GET /productos/ usa una sola consulta sin importar cuántos productos haya"""
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('productos'))
+        self.assertEqual(len(response.data), 12)
+
+    def test_listar_por_categoria(self):
+        """GET /productos/?categoria= usa una sola consulta"""
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('productos'), {'categoria': self.categorias[0].id})
+        self.assertEqual(len(response.data), 4)
+
+    def test_listar_paginado(self):
+        """GET /productos/?limit= usa una sola consulta por página"""
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('productos'), {'limit': 5})
+        with self.assertNumQueries(1):
+            self.client.get(reverse('productos'), {'limit': 5, 'cursor': response.data['next']})
+
+    def test_obtener_producto(self):
+        """GET /productos/<id>/ usa una sola consulta"""
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('producto', args=[self.productos[0].id]))
+        self.assertEqual(response.data['categoria']['nombre'], "Categoría 0")
+
+    def test_crear_producto(self):
+        """POST /productos/ valida la categoría una vez e inserta"""
+        datos = {'nombre': 'Monitor', 'precio': 300, 'stock': 5, 'categoria_id': self.categorias[0].id}
+        with self.assertNumQueries(2):
+            response = self.client.post(
+                reverse('productos'),
+                data=json.dumps(datos),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_str_desde_repositorio(self):
+        """str() de un producto del repositorio no dispara otra consulta"""
+        with self.assertNumQueries(1):
+            productos = [str(p) for p in ProductoRepository.listar()]
+        self.assertEqual(len(productos), 12)
+        with self.assertNumQueries(1):
+            str(ProductoRepository.obtener_por_id(self.productos[0].id))
+
+
+class ProductoListaSerializerTests(TestCase):
+    """Tests para el serializador rápido de listados"""
+
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nombre="Electrónica")
+        self.categoria2 = Categoria.objects.create(nombre="Ropa")
+        Producto.objects.create(
+            nombre="Laptop",
+            descripcion="Laptop de alta gama",
+            precio=1500,
+            stock=10,
+            categoria=self.categoria,
+            imagen_url="https://example.com/laptop.jpg"
+        )
+        Producto.objects.create(nombre="Camiseta", precio=20, categoria=self.categoria2)
+
+    def test_misma_salida_que_producto_serializer(self):
+        """Verifica que el JSON es idéntico al de ProductoSerializer"""
+        from productos.serializers import ProductoSerializer, ProductoListaSerializer
+        esperado = ProductoSerializer(ProductoRepository.listar().order_by('id'), many=True).data
+        filas = ProductoRepository.listar_filas(ProductoListaSerializer.COLUMNAS).order_by('id')
+        obtenido = ProductoListaSerializer(filas).data
+        self.assertEqual(json.loads(json.dumps(esperado)), obtenido)
+
+    def test_no_instancia_modelos(self):
+        """Verifica que la lectura rápida trabaja sobre diccionarios en una consulta"""
+        from productos.serializers import ProductoListaSerializer
+        filas = ProductoRepository.listar_filas(ProductoListaSerializer.COLUMNAS)
+        with self.assertNumQueries(1):
+            filas = list(filas)
+        self.assertTrue(all(isinstance(fila, dict) for fila in filas))
+
+
+class ExportacionCatalogoTests(APITestCase):
+    """Tests para la exportación en streaming del catálogo"""
+
+    def setUp(self):
+        self.client = Client()
+        self.categoria = Categoria.objects.create(nombre="Electrónica")
+        self.categoria2 = Categoria.objects.create(nombre="Ropa")
+        for i in range(5):
+            Producto.objects.create(
+                nombre=f"Producto {i}",
+                precio=100 + i,
+                stock=i,
+                categoria=self.categoria if i % 2 else self.categoria2
+            )
+
+    def _leer(self, response):
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_exportar_ndjson(self):
+        """Verifica que por defecto se emite un producto por línea"""
+        response = self.client.get(reverse('productos-exportar'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lineas = self._leer(response).splitlines()
+        self.assertEqual(len(lineas), 5)
+        primero = json.loads(lineas[0])
+        self.assertEqual(primero['nombre'], 'Producto 0')
+        self.assertEqual(primero['categoria']['nombre'], 'Ropa')
+
+    def test_exportar_json(self):
+        """Verifica que ?formato=json emite un array JSON válido"""
+        response = self.client.get(reverse('productos-exportar'), {'formato': 'json'})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        productos = json.loads(self._leer(response))
+        self.assertEqual([p['nombre'] for p in productos], [f"Producto {i}" for i in range(5)])
+
+    def test_exportar_json_vacio(self):
+        """Verifica que un catálogo vacío produce un array vacío"""
+        Producto.objects.all().delete()
+        response = self.client.get(reverse('productos-exportar'), {'formato': 'json'})
+        self.assertEqual(json.loads(self._leer(response)), [])
+
+    def test_exportar_por_categoria(self):
+        """Verifica que la exportación respeta ?categoria="""
+        response = self.client.get(reverse('productos-exportar'), {'categoria': self.categoria.id})
+        self.assertEqual(len(self._leer(response).splitlines()), 2)
+
+    def test_exportar_por_trozos(self):
+        """Verifica que el cuerpo se entrega en varios trozos y no de una vez"""
+        from productos import exportacion
+        original = exportacion.FILAS_POR_TROZO
+        exportacion.FILAS_POR_TROZO = 2
+        try:
+            response = self.client.get(reverse('productos-exportar'))
+            trozos = list(response.streaming_content)
+        finally:
+            exportacion.FILAS_POR_TROZO = original
+        self.assertEqual(len(trozos), 3)
+
+    def test_formato_invalido(self):
+        """Verifica que un formato desconocido retorna 400"""
+        response = self.client.get(reverse('productos-exportar'), {'formato': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_categoria_invalida(self):
+        """Verifica que una categoría no numérica retorna 400"""
+        response = self.client.get(reverse('productos-exportar'), {'categoria': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'error': "El parámetro categoria debe ser un entero"})
+
+    def test_exportar_una_consulta(self):
+        """Verifica que la exportación usa una sola consulta"""
+        with self.assertNumQueries(1):
+            self._leer(self.client.get(reverse('productos-exportar')))
+
+
+class ProductoCacheTests(APITestCase):
+    """Tests para la cache read-through del detalle de producto"""
+
+    def setUp(self):
+        from productos.cache import ProductoCache
+        caches['productos'].clear()
+        ProductoCache.reiniciar_estadisticas()
+        self.client = Client()
+        self.categoria = Categoria.objects.create(nombre="Electrónica")
+        self.producto = Producto.objects.create(
+            nombre="Laptop",
+            precio=1500,
+            stock=10,
+            categoria=self.categoria
+        )
+
+    def test_segunda_lectura_sin_consultas(self):
+        """Verifica que el detalle cacheado no vuelve a la base de datos"""
+        url = reverse('producto', args=[self.producto.id])
+        with self.assertNumQueries(1):
+            primera = self.client.get(url)
+        with self.assertNumQueries(0):
+            segunda = self.client.get(url)
+        self.assertEqual(primera.data, segunda.data)
+
+    def test_404_cacheado(self):
+        """Verifica que un ID inexistente se recuerda como 404"""
+        url = reverse('producto', args=[9999])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_actualizar_invalida(self):
+        """Verifica que actualizar_producto invalida la entrada cacheada"""
+        url = reverse('producto', args=[self.producto.id])
+        self.client.get(url)
+        ProductoService.actualizar_producto(self.producto.id, {'precio': 999})
+        response = self.client.get(url)
+        self.assertEqual(response.data['precio'], 999)
+
+    def test_eliminar_invalida(self):
+        """Verifica que eliminar_producto invalida la entrada cacheada"""
+        url = reverse('producto', args=[self.producto.id])
+        self.client.get(url)
+        ProductoService.eliminar_producto(self.producto.id)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalidacion_exacta(self):
+        """Verifica que invalidar un producto no afecta a los demás"""
+        otro = Producto.objects.create(nombre="Mouse", precio=25, categoria=self.categoria)
+        self.client.get(reverse('producto', args=[self.producto.id]))
+        self.client.get(reverse('producto', args=[otro.id]))
+        ProductoService.actualizar_producto(self.producto.id, {'stock': 1})
+        with self.assertNumQueries(0):
+            self.client.get(reverse('producto', args=[otro.id]))
+
+    def test_crear_descarta_404_cacheado(self):
+        """Verifica que crear un producto elimina el 404 cacheado de su ID"""
+        siguiente_id = self.producto.id + 1
+        self.client.get(reverse('producto', args=[siguiente_id]))
+        producto = ProductoService.crear_producto({
+            'nombre': 'Monitor', 'precio': 300, 'stock': 5, 'categoria': self.categoria
+        })
+        self.assertEqual(producto.id, siguiente_id)
+        response = self.client.get(reverse('producto', args=[siguiente_id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_estadisticas(self):
+        """Verifica los contadores de hits y misses"""
+        url = reverse('producto', args=[self.producto.id])
+        self.client.get(url)
+        self.client.get(url)
+        self.client.get(reverse('producto', args=[9999]))
+        self.client.get(reverse('producto', args=[9999]))
+        response = self.client.get(reverse('productos-cache'))
+        self.assertEqual(response.data['hits'], 1)
+        self.assertEqual(response.data['hits_no_encontrado'], 1)
+        self.assertEqual(response.data['misses'], 2)
+        self.assertEqual(response.data['ratio_hits'], 0.5)
+
+    def test_limite_de_entradas(self):
+        """Verifica que la cache no crece más allá de MAX_ENTRIES"""
+        from django.test import override_settings
+        limitada = {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'productos': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'productos-limitada',
+                'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_FREQUENCY': 3},
+            },
+        }
+        with override_settings(CACHES=limitada):
+            for producto_id in range(1000, 1010):
+                self.client.get(reverse('producto', args=[producto_id]))
+            self.assertLessEqual(len(caches['productos']._cache), 3)
+
+
+class GetCondicionalTests(APITestCase):
+    """Tests para ETag en los endpoints de lectura"""
+
+    def setUp(self):
+        caches['productos'].clear()
+        self.client = Client()
+        self.categoria = Categoria.objects.create(nombre="Electrónica")
+        self.categoria2 = Categoria.objects.create(nombre="Ropa")
+        self.producto = Producto.objects.create(
+            nombre="Laptop",
+            precio=1500,
+            stock=10,
+            categoria=self.categoria
+        )
+        self.producto2 = Producto.objects.create(
+            nombre="Camiseta",
+            precio=20,
+            stock=50,
+            categoria=self.categoria2
+        )
+
+    def test_listado_304_sin_consultas(self):
+        """Verifica que If-None-Match responde 304 sin ejecutar la consulta"""
+        response = self.client.get(reverse('productos'))
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('productos'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_listado_etag_depende_de_parametros(self):
+        """Verifica que cada combinación de parámetros tiene su propio ETag"""
+        completo = self.client.get(reverse('productos'))
+        paginado = self.client.get(reverse('productos'), {'limit': 1})
+        self.assertNotEqual(completo['ETag'], paginado['ETag'])
+        response = self.client.get(
+            reverse('productos'), {'limit': 1}, HTTP_IF_NONE_MATCH=completo['ETag']
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_mutacion_cambia_etag_del_listado(self):
+        """Verifica que una mutación del servicio invalida el ETag del catálogo"""
+        etag = self.client.get(reverse('productos'))['ETag']
+        ProductoService.actualizar_producto(self.producto.id, {'precio': 999})
+        response = self.client.get(reverse('productos'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_version_por_categoria(self):
+        """Verifica que un cambio en otra categoría no invalida el listado filtrado"""
+        params = {'categoria': self.categoria.id}
+        etag = self.client.get(reverse('productos'), params)['ETag']
+        ProductoService.actualizar_producto(self.producto2.id, {'stock': 1})
+        response = self.client.get(reverse('productos'), params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        ProductoService.actualizar_producto(self.producto.id, {'stock': 1})
+        response = self.client.get(reverse('productos'), params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_cambio_de_categoria_invalida_ambas(self):
+        """Verifica que mover un producto invalida la categoría de origen y la de destino"""
+        origen = self.client.get(reverse('productos'), {'categoria': self.categoria.id})['ETag']
+        destino = self.client.get(reverse('productos'), {'categoria': self.categoria2.id})['ETag']
+        ProductoService.actualizar_producto(self.producto.id, {'categoria': self.categoria2})
+        for categoria, etag in ((self.categoria, origen), (self.categoria2, destino)):
+            response = self.client.get(
+                reverse('productos'), {'categoria': categoria.id}, HTTP_IF_NONE_MATCH=etag
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_sin_last_modified(self):
+        """Verifica que dos cambios en el mismo segundo no dan un 304 por If-Modified-Since"""
+        from django.utils.http import http_date
+        response = self.client.get(reverse('productos'))
+        self.assertNotIn('Last-Modified', response)
+        ProductoService.actualizar_producto(self.producto.id, {'precio': 999})
+        response = self.client.get(reverse('productos'), HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 1))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(CACHE_VERSIONES_COMPARTIDAS=False)
+    def test_sin_cache_compartida(self):
+        """Verifica que con versiones por proceso no se emiten ETag de versión"""
+        response = self.client.get(reverse('productos'))
+        self.assertNotIn('ETag', response)
+        response = self.client.get(reverse('productos-facetas'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('ETag', response)
+        # El ETag del detalle es la huella de su cuerpo, no una versión compartida
+        self.assertIn('ETag', self.client.get(reverse('producto', args=[self.producto.id])))
+
+    def test_detalle_304_sin_consultas(self):
+        """Verifica que el detalle responde 304 desde la cache sin consultas"""
+        url = reverse('producto', args=[self.producto.id])
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detalle_cambia_tras_actualizar(self):
+        """Verifica que actualizar el producto cambia su ETag"""
+        url = reverse('producto', args=[self.producto.id])
+        etag = self.client.get(url)['ETag']
+        ProductoService.actualizar_producto(self.producto.id, {'precio': 999})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['precio'], 999)
+
+    def test_detalle_sin_last_modified(self):
+        """Verifica que el detalle se valida sólo por ETag"""
+        from django.utils.http import http_date
+        url = reverse('producto', args=[self.producto.id])
+        self.assertNotIn('Last-Modified', self.client.get(url))
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 1))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class AltaMasivaTests(APITestCase):
+    """Tests para el alta masiva de productos (bulk_create)"""
+
+    def setUp(self):
+        caches['productos'].clear()
+        self.client = Client()
+        self.categoria = Categoria.objects.create(nombre="Electrónica")
+        self.categoria2 = Categoria.objects.create(nombre="Ropa")
+
+    def _post(self, datos):
+        return self.client.post(
+            reverse('productos-bulk'),
+            data=json.dumps(datos),
+            content_type='application/json'
+        )
+
+    def _items(self, n):
+        return [
+            {
+                'nombre': f'Producto {i}',
+                'precio': 100 + i,
+                'stock': i,
+                'categoria_id': (self.categoria if i % 2 else self.categoria2).id
+            }
+            for i in range(n)
+        ]
+
+    def test_alta_masiva_exitosa(self):
+        """Verifica que se crean todos los productos y se devuelven sus IDs"""
+        response = self._post(self._items(5))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([c['indice'] for c in response.data['creados']], list(range(5)))
+        self.assertEqual(response.data['errores'], [])
+        self.assertEqual(Producto.objects.count(), 5)
+        creado = Producto.objects.get(pk=response.data['creados'][1]['id'])
+        self.assertEqual(creado.nombre, 'Producto 1')
+
+    def test_errores_por_item(self):
+        """Verifica que los ítems inválidos se reportan sin bloquear a los válidos"""
+        items = self._items(4)
+        items[1]['precio'] = -5
+        items[2]['categoria_id'] = 9999
+        del items[3]['nombre']
+        response = self._post(items)
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([c['indice'] for c in response.data['creados']], [0])
+        self.assertEqual([e['indice'] for e in response.data['errores']], [1, 2, 3])
+        self.assertEqual(response.data['errores'][0]['errores']['error'], "El precio no puede ser negativo")
+        self.assertEqual(response.data['errores'][1]['errores']['error'], "Categoría no encontrada")
+        self.assertEqual(Producto.objects.count(), 1)
+
+    def test_todos_invalidos(self):
+        """Verifica que si nada se crea la respuesta es 400"""
+        items = self._items(2)
+        for item in items:
+            item['categoria_id'] = 9999
+        response = self._post(items)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Producto.objects.count(), 0)
+
+    def test_cuerpo_no_es_array(self):
+        """Verifica que un objeto en lugar de un array retorna 400"""
+        response = self._post(self._items(1)[0])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_limite_antes_de_validar(self):
+        """Verifica que un array por encima del máximo se rechaza sin validar sus ítems"""
+        from unittest import mock
+        from productos.serializers import ProductoMasivoSerializer
+        with mock.patch('productos.views.MAX_ITEMS_MASIVO', 3), \
+                mock.patch.object(ProductoMasivoSerializer, 'is_valid') as is_valid:
+            response = self._post(self._items(4))
+            patch = self.client.patch(
+                reverse('productos-bulk'), data=json.dumps([{'id': 1, 'precio': 1}] * 4),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "Máximo 3 productos por petición")
+        self.assertEqual(patch.status_code, status.HTTP_400_BAD_REQUEST)
+        is_valid.assert_not_called()
+        self.assertEqual(Producto.objects.count(), 0)
+
+    def test_consultas_por_lote(self):
+        """Verifica una consulta IN de categorías más un INSERT por lote"""
+        with self.assertNumQueries(1 + 3 * 2):
+            # Cada lote: SAVEPOINT + INSERT + RELEASE (dentro del TestCase)
+            resultados = ProductoService.crear_productos_masivo(
+                [
+                    {'nombre': f'P{i}', 'precio': i, 'stock': 1, 'categoria_id': self.categoria.id}
+                    for i in range(10)
+                ],
+                tamano_lote=5
+            )
+        self.assertTrue(all(isinstance(r, Producto) for r in resultados))
+
+    def test_invalida_listados(self):
+        """Verifica que el alta masiva cambia el ETag del catálogo"""
+        etag = self.client.get(reverse('productos'))['ETag']
+        self._post(self._items(2))
+        response = self.client.get(reverse('productos'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+
+class ActualizacionProductoAPITests(APITestCase):
+    """Tests para PUT/PATCH/DELETE de un producto y la actualización masiva"""
+
+    def setUp(self):
+        caches['productos'].clear()
+        self.client = Client()
+        self.categoria = Categoria.objects.create(nombre="Electrónica")
+        self.categoria2 = Categoria.objects.create(nombre="Ropa")
+        self.producto = Producto.objects.create(
+            nombre="Laptop",
+            descripcion="Laptop de alta gama",
+            precio=1500,
+            stock=10,
+            categoria=self.categoria
+        )
+
+    def _enviar(self, metodo, url, datos):
+        return getattr(self.client, metodo)(url, data=json.dumps(datos), content_type='application/json')
+
+    def test_patch_parcial(self):
+        """Verifica que PATCH modifica sólo los campos enviados"""
+        url = reverse('producto', args=[self.producto.id])
+        response = self._enviar('patch', url, {'precio': 1200})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['precio'], 1200)
+        self.assertEqual(response.data['nombre'], 'Laptop')
+
+    def test_patch_escribe_solo_columnas_cambiadas(self):
+        """Verifica que el UPDATE sólo incluye las columnas modificadas"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as contexto:
+            ProductoRepository.actualizar(self.producto.id, {'stock': 3})
+        updates = [q['sql'] for q in contexto.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"stock"', updates[0])
+        self.assertNotIn('"descripcion"', updates[0])
+        self.assertNotIn('"nombre"', updates[0])
+
+    def test_sin_cambios_no_escribe(self):
+        """Verifica que si los valores no cambian no se ejecuta UPDATE"""
+        with self.assertNumQueries(1):
+            ProductoRepository.actualizar(self.producto.id, {'precio': 1500})
+
+    def test_put_completo(self):
+        """Verifica que PUT reemplaza el producto y permite cambiar la categoría"""
+        url = reverse('producto', args=[self.producto.id])
+        datos = {
+            'nombre': 'Camiseta',
+            'descripcion': '',
+            'precio': 20,
+            'stock': 5,
+            'categoria_id': self.categoria2.id,
+            'imagen_url': ''
+        }
+        response = self._enviar('put', url, datos)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['categoria']['nombre'], 'Ropa')
+
+    def test_put_incompleto(self):
+        """Verifica que PUT sin todos los campos obligatorios retorna 400"""
+        response = self._enviar('put', reverse('producto', args=[self.producto.id]), {'precio': 1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_patch_precio_negativo(self):
+        """Verifica que PATCH rechaza precios negativos"""
+        response = self._enviar('patch', reverse('producto', args=[self.producto.id]), {'precio': -1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_patch_inexistente(self):
+        """Verifica que PATCH de un producto inexistente retorna 404"""
+        response = self._enviar('patch', reverse('producto', args=[9999]), {'precio': 1})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_patch_invalida_cache(self):
+        """Verifica que el detalle cacheado refleja el PATCH"""
+        url = reverse('producto', args=[self.producto.id])
+        self.client.get(url)
+        self._enviar('patch', url, {'stock': 1})
+        self.assertEqual(self.client.get(url).data['stock'], 1)
+
+    def test_delete(self):
+        """Verifica que DELETE elimina el producto y luego retorna 404"""
+        url = reverse('producto', args=[self.producto.id])
+        self.client.get(url)
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Producto.objects.filter(pk=self.producto.id).exists())
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_patch_masivo(self):
+        """Verifica que PATCH /productos/bulk/ actualiza precio y stock por ID"""
+        otro = Producto.objects.create(nombre="Mouse", precio=25, stock=100, categoria=self.categoria)
+        response = self._enviar('patch', reverse('productos-bulk'), [
+            {'id': self.producto.id, 'precio': 1400},
+            {'id': otro.id, 'stock': 90},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(response.data['actualizados']), sorted([self.producto.id, otro.id]))
+        self.producto.refresh_from_db()
+        otro.refresh_from_db()
+        self.assertEqual((self.producto.precio, self.producto.stock), (1400, 10))
+        self.assertEqual((otro.precio, otro.stock), (25, 90))
+
+    def test_patch_masivo_errores(self):
+        """Verifica que se reportan IDs inexistentes e ítems inválidos"""
+        response = self._enviar('patch', reverse('productos-bulk'), [
+            {'id': self.producto.id, 'precio': 1400},
+            {'id': 9999, 'precio': 1},
+            {'id': self.producto.id},
+            {'id': self.producto.id, 'stock': -1},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['no_encontrados'], [9999])
+        self.assertEqual([e['indice'] for e in response.data['errores']], [2, 3])
+
+    def test_patch_masivo_fuera_de_rango(self):
+        """Verifica que un precio o stock que no cabe en la columna se rechaza por ítem, sin un 500"""
+        response = self._enviar('patch', reverse('productos-bulk'), [
+            {'id': self.producto.id, 'precio': 10 ** 12},
+            {'id': self.producto.id, 'stock': 2147483648},
+            {'id': self.producto.id, 'stock': 2147483647},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([e['indice'] for e in response.data['errores']], [0, 1])
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 2147483647)
+
+    def test_patch_masivo_consultas_por_lote(self):
+        """Verifica un SELECT y un UPDATE por lote"""
+        for i in range(9):
+            Producto.objects.create(nombre=f"P{i}", precio=i, categoria=self.categoria)
+        cambios = [{'id': p.id, 'precio': 7} for p in Producto.objects.all()]
+        # Cada lote: SAVEPOINT + SELECT + UPDATE + RELEASE (dentro del TestCase)
+        with self.assertNumQueries(4 * 2):
+            actualizados, _ = ProductoService.actualizar_precios_stock_masivo(cambios, tamano_lote=5)
+        self.assertEqual(len(actualizados), 10)
+        self.assertEqual(set(Producto.objects.values_list('precio', flat=True)), {7})
+
+    def test_patch_masivo_no_pisa_reservas(self):
+        """Verifica que una reserva entre la lectura y la escritura no se pierde"""
+        from unittest import mock
+        otro = Producto.objects.create(nombre="Mouse", precio=25, stock=100, categoria=self.categoria)
+        leer = ProductoRepository.obtener_para_actualizar
+
+        def leer_y_reservar(ids, campos):
+            productos = leer(ids, campos)
+            ProductoService.reservar_stock(self.producto.id, 3)
+            return productos
+
+        with mock.patch.object(ProductoRepository, 'obtener_para_actualizar', side_effect=leer_y_reservar):
+            ProductoService.actualizar_precios_stock_masivo([
+                {'id': self.producto.id, 'precio': 1400},
+                {'id': otro.id, 'stock': 90},
+            ])
+        self.producto.refresh_from_db()
+        otro.refresh_from_db()
+        self.assertEqual((self.producto.precio, self.producto.stock), (1400, 7))
+        self.assertEqual((otro.precio, otro.stock), (25, 90))
+
+    def test_patch_masivo_invalida_detalle(self):
+        """Verifica que la actualización masiva invalida el detalle cacheado"""
+        url = reverse('producto', args=[self.producto.id])
+        etag = self.client.get(url)['ETag']
+        self._enviar('patch', reverse('productos-bulk'), [{'id': self.producto.id, 'precio': 1}])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['precio'], 1)
+
+
+class ReservaStockTests(APITestCase):
+    """Tests para la reserva/liberación atómica de stock"""
+
+    def setUp(self):
+        caches['productos'].clear()
+        self.client = Client()
+        self.categoria = Categoria.objects.create(nombre="Electrónica")
+        self.producto = Producto.objects.create(
+            nombre="Laptop",
+            precio=1500,
+            stock=10,
+            categoria=self.categoria
+        )
+
+    def _post(self, nombre, producto_id, cantidad):
+        return self.client.post(
+            reverse(nombre, args=[producto_id]),
+            data=json.dumps({'cantidad': cantidad}),
+            content_type='application/json'
+        )
+
+    def test_reservar(self):
+        """Verifica que reservar descuenta el stock y devuelve el restante"""
+        response = self._post('producto-reservar', self.producto.id, 3)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['stock'], 7)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 7)
+
+    def test_reservar_stock_insuficiente(self):
+        """Verifica que sin stock suficiente responde 409 y no modifica nada"""
+        response = self._post('producto-reservar', self.producto.id, 11)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 10)
+
+    def test_reservar_inexistente(self):
+        """Verifica que reservar un producto inexistente retorna 404"""
+        response = self._post('producto-reservar', 9999, 1)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cantidad_invalida(self):
+        """Verifica que la cantidad debe ser un entero positivo"""
+        response = self._post('producto-reservar', self.producto.id, 0)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_liberar(self):
+        """Verifica que liberar devuelve unidades al stock"""
+        self._post('producto-reservar', self.producto.id, 4)
+        response = self._post('producto-liberar', self.producto.id, 4)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['stock'], 10)
+
+    def test_liberar_mas_de_lo_reservado(self):
+        """Verifica que no se puede liberar más de lo reservado (ni inflar el stock)"""
+        response = self._post('producto-liberar', self.producto.id, 1)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self._post('producto-reservar', self.producto.id, 3)
+        ProductoService.reservar_carrito([{'id': self.producto.id, 'cantidad': 2}])
+        response = self._post('producto-liberar', self.producto.id, 6)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self._post('producto-liberar', self.producto.id, 5).data['stock'], 10)
+        self.producto.refresh_from_db()
+        self.assertEqual((self.producto.stock, self.producto.reservado), (10, 0))
+        self.assertEqual(self._post('producto-liberar', 9999, 1).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_reserva_es_un_update_condicional(self):
+        """Verifica que la reserva no lee la fila antes de escribir"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as contexto:
+            actual = ProductoRepository.reservar_stock(self.producto.id, 2)
+        self.assertEqual(len(contexto.captured_queries), 1)
+        self.assertTrue(contexto.captured_queries[0]['sql'].startswith('UPDATE'))
+        # El stock restante sale del propio UPDATE (RETURNING), no de otra lectura
+        self.assertIn('RETURNING', contexto.captured_queries[0]['sql'])
+        self.assertEqual(actual, (self.categoria.id, 8))
+        self.assertIsNone(ProductoRepository.reservar_stock(self.producto.id, 9))
+        self.assertEqual(ProductoRepository.liberar_stock(self.producto.id, 2), (self.categoria.id, 10))
+        self.assertIsNone(ProductoRepository.liberar_stock(self.producto.id, 1))
+
+    def test_reserva_invalida_cache(self):
+        """Verifica que el detalle cacheado refleja la reserva"""
+        url = reverse('producto', args=[self.producto.id])
+        self.client.get(url)
+        self._post('producto-reservar', self.producto.id, 2)
+        self.assertEqual(self.client.get(url).data['stock'], 8)
+
+
+class ReservaStockConcurrenteTests(TransactionTestCase):
+    """Reserva de stock desde muchos hilos a la vez: nunca se vende de más"""
+
+    HILOS = 8
+    INTENTOS_POR_HILO = 25
+    MAX_REINTENTOS = 200
+
+    def setUp(self):
+        caches['productos'].clear()
+        self.categoria = Categoria.objects.create(nombre="Electrónica")
+        self.producto = Producto.objects.create(
+            nombre="Consola",
+            precio=500,
+            stock=120,
+            categoria=self.categoria
+        )
+
+    def _reservar_con_reintentos(self, producto_id):
+        from django.db import OperationalError
+        from productos.services import StockInsuficiente
+        # SQLite en memoria bloquea la tabla ante escrituras simultáneas;
+        # el cliente reintenta igual que haría ante un timeout en PostgreSQL,
+        # pero con un tope: una base bloqueada para siempre falla en vez de colgar
+        for _ in range(self.MAX_REINTENTOS):
+            try:
+                ProductoService.reservar_stock(producto_id, 1)
+                return True
+            except StockInsuficiente:
+                return False
+            except OperationalError:
+                time.sleep(0.001)
+        self.fail(f"La reserva siguió bloqueada tras {self.MAX_REINTENTOS} reintentos")
+
+    def test_reservas_concurrentes(self):
+        """Verifica que la suma de reservas exitosas nunca supera el stock"""
+        from django.db import connection
+
+        def trabajador():
+            try:
+                return sum(
+                    self._reservar_con_reintentos(self.producto.id)
+                    for _ in range(self.INTENTOS_POR_HILO)
+                )
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.HILOS) as ejecutor:
+            exitos = sum(ejecutor.map(lambda _: trabajador(), range(self.HILOS)))
+
+        self.producto.refresh_from_db()
+        self.assertEqual(exitos, 120)
+        self.assertEqual(self.producto.stock, 0)
+
+
+class ReservaCarritoTests(APITestCase):
+    """Tests para la reserva de un carrito completo (todo o nada)"""
+
+    def setUp(self):
+        caches['productos'].clear()
+        self.client = Client()
+        self.categoria = Categoria.objects.create(nombre="Electrónica")
+        self.laptop = Producto.objects.create(nombre="Laptop", precio=1500, stock=5, categoria=self.categoria)
+        self.mouse = Producto.objects.create(nombre="Mouse", precio=25, stock=2, categoria=self.categoria)
+
+    def _post(self, items):
+        return self.client.post(
+            reverse('productos-reservas'),
+            data=json.dumps({'items': items}),
+            content_type='application/json'
+        )
+
+    def test_reservar_carrito(self):
+        """Verifica que se reservan todos los ítems del carrito"""
+        response = self._post([
+            {'id': self.mouse.id, 'cantidad': 2},
+            {'id': self.laptop.id, 'cantidad': 1},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        restantes = {item['id']: item['stock'] for item in response.data['items']}
+        self.assertEqual(restantes, {self.laptop.id: 4, self.mouse.id: 0})
+
+    def test_faltante_revierte_todo(self):
+        """Verifica que si un ítem no alcanza no se reserva ninguno"""
+        response = self._post([
+            {'id': self.laptop.id, 'cantidad': 1},
+            {'id': self.mouse.id, 'cantidad': 3},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(
+            response.data['faltantes'],
+            [{'id': self.mouse.id, 'solicitado': 3, 'disponible': 2}]
+        )
+        self.laptop.refresh_from_db()
+        self.assertEqual(self.laptop.stock, 5)
+
+    def test_ids_repetidos_se_suman(self):
+        """Verifica que un mismo producto en varias líneas suma sus cantidades"""
+        response = self._post([
+            {'id': self.mouse.id, 'cantidad': 1},
+            {'id': self.mouse.id, 'cantidad': 2},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_producto_inexistente(self):
+        """Verifica que un ID inexistente retorna 404 sin reservar nada"""
+        response = self._post([
+            {'id': self.laptop.id, 'cantidad': 1},
+            {'id': 9999, 'cantidad': 1},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.laptop.refresh_from_db()
+        self.assertEqual(self.laptop.stock, 5)
+
+    def test_carrito_vacio(self):
+        """Verifica que un carrito vacío retorna 400"""
+        self.assertEqual(self._post([]).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bloqueo_en_orden_de_id(self):
+        """Verifica que las filas se bloquean en orden ascendente de ID"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as contexto:
+            ProductoService.reservar_carrito([
+                {'id': self.mouse.id, 'cantidad': 1},
+                {'id': self.laptop.id, 'cantidad': 1},
+            ])
+        select = next(q['sql'] for q in contexto.captured_queries if q['sql'].startswith('SELECT'))
+        self.assertIn('ORDER BY "productos"."id" ASC', select)
+
+
+class ReservaCarritoConcurrenteTests(TransactionTestCase):
+    """Prueba de estrés: carritos concurrentes en órdenes opuestos"""
+
+    def setUp(self):
+        caches['productos'].clear()
+        self.categoria = Categoria.objects.create(nombre="Electrónica")
+        self.productos = [
+            Producto.objects.create(nombre=f"P{i}", precio=10, stock=15, categoria=self.categoria)
+            for i in range(4)
+        ]
+
+    def test_sin_deadlocks_ni_sobreventa(self):
+        """Verifica que no hay deadlocks y que el stock descontado cuadra con las reservas"""
+        from productos.benchmarks import estresar_reservas
+        metricas = estresar_reservas(
+            [p.id for p in self.productos], hilos=6, carritos_por_hilo=10, tamano_carrito=3
+        )
+        self.assertEqual(metricas['deadlocks'], 0)
+        self.assertEqual(metricas['reservas'] + metricas['sin_stock'] + metricas['abandonados'], 60)
+        self.assertGreater(metricas['sin_stock'], 0)
+
+        stock_final = sum(Producto.objects.values_list('stock', flat=True))
+        self.assertEqual(15 * 4 - stock_final, metricas['reservas'] * 3)
+        self.assertTrue(all(s >= 0 for s in Producto.objects.values_list('stock', flat=True)))
+
+    def test_reintentos_acotados(self):
+        """Verifica que un carrito que siempre choca con un bloqueo se abandona tras los reintentos"""
+        from unittest import mock
+        from django.db import OperationalError
+        from productos.benchmarks import estresar_reservas
+        with mock.patch.object(
+            ProductoService, 'reservar_carrito', side_effect=OperationalError("database table is locked")
+        ) as reservar:
+            metricas = estresar_reservas(
+                [p.id for p in self.productos], hilos=2, carritos_por_hilo=3, max_reintentos=2
+            )
+        self.assertEqual(reservar.call_count, 2 * 3 * 3)
+        self.assertEqual((metricas['reservas'], metricas['abandonados'], metricas['reintentos']), (0, 6, 18))
+
+
+class BusquedaTests(APITestCase):
+    """Tests para la búsqueda ?q= (en SQLite se usa la alternativa portable)"""
+
+    def setUp(self):
+        caches['productos'].clear()
+        self.client = Client()
+        self.categoria = Categoria.objects.create(nombre="Electrónica")
+        self.categoria2 = Categoria.objects.create(nombre="Hogar")
+        self.laptop = Producto.objects.create(
+            nombre="Laptop gamer", descripcion="Pantalla de 15 pulgadas",
+            precio=1500, categoria=self.categoria
+        )
+        self.monitor = Producto.objects.create(
+            nombre="Monitor", descripcion="Ideal para tu laptop",
+            precio=300, categoria=self.categoria
+        )
+        self.mesa = Producto.objects.create(
+            nombre="Mesa para laptop", descripcion="Madera",
+            precio=80, categoria=self.categoria2
+        )
+        Producto.objects.create(nombre="Silla", descripcion="Oficina", precio=90, categoria=self.categoria2)
+
+    def _nombres(self, response):
+        datos = response.data['results'] if isinstance(response.data, dict) else response.data
+        return [p['nombre'] for p in datos]
+
+    def test_busqueda_por_nombre_y_descripcion(self):
+        """Verifica que ?q= encuentra coincidencias en nombre y descripción"""
+        response = self.client.get(reverse('productos'), {'q': 'laptop'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 3)
+
+    def test_relevancia(self):
+        """Verifica que las coincidencias en el nombre aparecen primero"""
+        response = self.client.get(reverse('productos'), {'q': 'laptop'})
+        self.assertEqual(self._nombres(response)[-1], "Monitor")
+
+    def test_todos_los_terminos(self):
+        """Verifica que todos los términos deben aparecer"""
+        response = self.client.get(reverse('productos'), {'q': 'laptop madera'})
+        self.assertEqual(self._nombres(response), ["Mesa para laptop"])
+
+    def test_combinado_con_categoria(self):
+        """Verifica que ?q= se combina con ?categoria="""
+        response = self.client.get(reverse('productos'), {'q': 'laptop', 'categoria': self.categoria2.id})
+        self.assertEqual(self._nombres(response), ["Mesa para laptop"])
+
+    def test_busqueda_paginada(self):
+        """Verifica que la búsqueda se pagina por relevancia con cursor"""
+        completa = self._nombres(self.client.get(reverse('productos'), {'q': 'laptop'}))
+        primera = self.client.get(reverse('productos'), {'q': 'laptop', 'limit': 2})
+        segunda = self.client.get(
+            reverse('productos'), {'q': 'laptop', 'limit': 2, 'cursor': primera.data['next']}
+        )
+        self.assertEqual(self._nombres(primera) + self._nombres(segunda), completa)
+        self.assertIsNone(segunda.data['next'])
+        self.assertNotIn('relevancia', primera.data['results'][0])
+
+    def test_busqueda_paginada_por_precio(self):
+        """Verifica que una búsqueda admite otro orden explícito"""
+        response = self.client.get(reverse('productos'), {'q': 'laptop', 'limit': 5, 'orden': 'precio'})
+        self.assertEqual(self._nombres(response), ["Mesa para laptop", "Monitor", "Laptop gamer"])
+
+    def test_relevancia_sin_busqueda(self):
+        """Verifica que ordenar por relevancia sin ?q= retorna 400"""
+        response = self.client.get(reverse('productos'), {'limit': 5, 'orden': 'relevancia'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sin_resultados(self):
+        """Verifica que una búsqueda sin coincidencias devuelve una lista vacía"""
+        response = self.client.get(reverse('productos'), {'q': 'bicicleta'})
+        self.assertEqual(response.data, [])
+
+    def test_busqueda_una_consulta(self):
+        """Verifica que la búsqueda usa una sola consulta"""
+        with self.assertNumQueries(1):
+            self.client.get(reverse('productos'), {'q': 'laptop'})
+
+
+class IndicePrefijosTests(TestCase):
+    """Tests para el índice de autocompletado en memoria"""
+
+    def setUp(self):
+        from productos.autocompletado import IndicePrefijos
+        self.indice = IndicePrefijos()
+        self.indice.construir([
+            (1, "Árbol de Navidad", 5),
+            (2, "Arnés para perro", 50),
+            (3, "Ñandú de peluche", 7),
+            (4, "arco de violín", 20),
+            (5, "Silla", 1),
+        ])
+
+    def test_normalizar(self):
+        """Verifica que se pliegan mayúsculas, acentos y espacios"""
+        from productos.autocompletado import normalizar
+        self.assertEqual(normalizar("  Árbol   ÑANDÚ "), "arbol nandu")
+
+    def test_prefijo_sin_acentos_ni_mayusculas(self):
+        """Verifica que 'ar' encuentra 'Árbol', 'Arnés' y 'arco'"""
+        ids = [p['id'] for p in self.indice.buscar('AR')]
+        self.assertEqual(sorted(ids), [1, 2, 4])
+
+    def test_top_k_por_stock(self):
+        """Verifica que se devuelven los k de mayor stock"""
+        self.assertEqual([p['id'] for p in self.indice.buscar('ar', k=2)], [2, 4])
+
+    def test_enie(self):
+        """Verifica que 'nan' encuentra 'Ñandú'"""
+        self.assertEqual(self.indice.buscar('nan'), [{'id': 3, 'nombre': "Ñandú de peluche"}])
+
+    def test_prefijo_vacio(self):
+        """Verifica que un prefijo vacío no devuelve nada"""
+        self.assertEqual(self.indice.buscar('  '), [])
+
+    def test_cambios_incrementales(self):
+        """Verifica altas, renombres, cambios de stock y bajas sin reconstruir"""
+        self.assertEqual(len(self.indice.buscar('ar')), 3)
+        self.indice.guardar(6, "Armario", 100)
+        self.assertEqual(self.indice.buscar('ar', k=1)[0]['id'], 6)
+        self.indice.guardar(6, "Mesa", 100)
+        self.assertNotIn(6, [p['id'] for p in self.indice.buscar('ar')])
+        self.indice.guardar(1, "Árbol de Navidad", 500)
+        self.assertEqual(self.indice.buscar('ar', k=1)[0]['id'], 1)
+        self.indice.eliminar(1)
+        self.assertEqual(sorted(p['id'] for p in self.indice.buscar('ar')), [2, 4])
+        self.assertEqual(len(self.indice), 5)
+
+
+class AutocompletadoAPITests(APITestCase):
+    """Tests para GET /productos/autocomplete/"""
+
+    def setUp(self):
+        from productos.services import autocompletado
+        caches['productos'].clear()
+        autocompletado.descartar()
+        self.client = Client()
+        self.categoria = Categoria.objects.create(nombre="Electrónica")
+        self.laptop = Producto.objects.create(nombre="Laptop", precio=1500, stock=10, categoria=self.categoria)
+        Producto.objects.create(nombre="Lámpara", precio=30, stock=40, categoria=self.categoria)
+        Producto.objects.create(nombre="Mouse", precio=25, stock=100, categoria=self.categoria)
+
+    def tearDown(self):
+        # El índice es global del proceso: no debe sobrevivir a la base de este test
+        from productos.services import autocompletado
+        autocompletado.descartar()
+
+    def _buscar(self, prefijo, **params):
+        return self.client.get(reverse('productos-autocomplete'), {'prefix': prefijo, **params})
+
+    def test_autocompletar(self):
+        """Verifica las sugerencias ordenadas por stock"""
+        response = self._buscar('la')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['nombre'] for p in response.data], ["Lámpara", "Laptop"])
+
+    def test_sin_consultas_con_indice_caliente(self):
+        """Verifica que con el índice construido no se consulta la base"""
+        self._buscar('la')
+        with self.assertNumQueries(0):
+            self._buscar('lap')
+
+    def test_k(self):
+        """Verifica el parámetro k"""
+        self.assertEqual(len(self._buscar('la', k=1).data), 1)
+        self.assertEqual(self._buscar('la', k='x').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cambios_del_servicio(self):
+        """Verifica que el índice sigue los cambios hechos vía ProductoService"""
+        self._buscar('la')
+        ProductoService.crear_producto({
+            'nombre': 'Lavadora', 'precio': 500, 'stock': 1000, 'categoria': self.categoria
+        })
+        self.assertEqual(self._buscar('la').data[0]['nombre'], 'Lavadora')
+        ProductoService.actualizar_producto(self.laptop.id, {'nombre': 'Notebook'})
+        self.assertEqual([p['nombre'] for p in self._buscar('no').data], ['Notebook'])
+        ProductoService.eliminar_producto(self.laptop.id)
+        self.assertEqual(self._buscar('no').data, [])
+
+    def test_reservas_actualizan_stock(self):
+        """Verifica que una reserva cambia el orden por stock"""
+        self._buscar('la')
+        lampara = Producto.objects.get(nombre="Lámpara")
+        ProductoService.reservar_stock(lampara.id, 35)
+        self.assertEqual(self._buscar('la').data[0]['nombre'], 'Laptop')
+        ProductoService.liberar_stock(lampara.id, 35)
+        self.assertEqual(self._buscar('la').data[0]['nombre'], 'Lámpara')
+
+    def test_cambios_de_otro_proceso(self):
+        """Verifica que los cambios publicados por otro proceso se aplican sin consultar la base"""
+        from productos.cache import CambiosAutocompletado
+        from productos.services import autocompletado
+        self._buscar('la')
+        CambiosAutocompletado.publicar([(9999, 'Laca', 999), (self.laptop.id, None, 500)])
+        original = autocompletado.verificar_cada
+        autocompletado.verificar_cada = 0
+        try:
+            with self.assertNumQueries(0):
+                nombres = [p['nombre'] for p in self._buscar('la').data]
+        finally:
+            autocompletado.verificar_cada = original
+        self.assertEqual(nombres, ['Laca', 'Laptop', 'Lámpara'])
+
+    def test_reserva_no_relee_la_fila(self):
+        """Verifica que una reserva no añade consultas para el índice"""
+        self._buscar('la')
+        # Un solo UPDATE ... RETURNING: el stock restante viene de la propia escritura
+        with self.assertNumQueries(1):
+            ProductoService.reservar_stock(self.laptop.id, 1)
+
+    def test_cambio_de_precio_no_toca_el_indice(self):
+        """Verifica que un cambio de precio no publica cambios de autocompletado"""
+        from productos.cache import CambiosAutocompletado
+        secuencia = CambiosAutocompletado.secuencia()
+        ProductoService.actualizar_producto(self.laptop.id, {'precio': 1})
+        self.assertEqual(CambiosAutocompletado.secuencia(), secuencia)
+
+    def test_hueco_en_el_diario_reconstruye_en_segundo_plano(self):
+        """Verifica que si falta una entrada del diario se recarga sin bloquear las búsquedas"""
+        from productos.autocompletado import AutocompletadoCatalogo
+        from productos.cache import CambiosAutocompletado
+        import threading
+        filas = [(1, 'Laptop', 10)]
+        continuar = threading.Event()
+        continuar.set()
+
+        def cargar_todo():
+            continuar.wait()
+            return list(filas)
+
+        catalogo = AutocompletadoCatalogo(cargar_todo, CambiosAutocompletado, verificar_cada=0)
+        self.assertEqual(catalogo.buscar('la'), [{'id': 1, 'nombre': 'Laptop'}])
+
+        continuar.clear()
+        filas.append((2, 'Lavadora', 20))
+        secuencia = CambiosAutocompletado.publicar([(2, 'Lavadora', 20)])
+        caches['productos'].delete(CambiosAutocompletado.clave(secuencia))
+        # La búsqueda que detecta el hueco responde con el índice anterior mientras se recarga
+        self.assertEqual(len(catalogo.buscar('la')), 1)
+        hilo = catalogo._hilo
+        continuar.set()
+        hilo.join()
+        self.assertEqual([p['id'] for p in catalogo.buscar('la')], [2, 1])
+
+
+class FiltrosListadoTests(APITestCase):
+    """Tests para ?precio_min=, ?precio_max=, ?en_stock= y ?orden= en el listado"""
+
+    def setUp(self):
+        caches['productos'].clear()
+        self.client = Client()
+        self.categoria = Categoria.objects.create(nombre="Electrónica")
+        self.categoria2 = Categoria.objects.create(nombre="Hogar")
+        self.productos = [
+            Producto.objects.create(nombre=nombre, precio=precio, stock=stock, categoria=categoria)
+            for nombre, precio, stock, categoria in [
+                ("Teclado", 50, 5, self.categoria),
+                ("Auriculares", 120, 0, self.categoria),
+                ("Monitor", 300, 2, self.categoria),
+                ("Lámpara", 50, 0, self.categoria2),
+                ("Mesa", 200, 7, self.categoria2),
+                ("Cable", 10, 100, self.categoria),
+            ]
+        ]
+
+    def _nombres(self, params):
+        response = self.client.get(reverse('productos'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        datos = response.data['results'] if 'limit' in params else response.data
+        return [p['nombre'] for p in datos]
+
+    def _recorrer(self, params):
+        nombres = []
+        response = self.client.get(reverse('productos'), params)
+        while True:
+            nombres.extend(p['nombre'] for p in response.data['results'])
+            if not response.data['next']:
+                return nombres
+            response = self.client.get(reverse('productos'), {**params, 'cursor': response.data['next']})
+
+    def test_rango_de_precio(self):
+        """Verifica que precio_min y precio_max son inclusivos"""
+        nombres = self._nombres({'precio_min': 50, 'precio_max': 200, 'orden': 'precio'})
+        self.assertEqual(nombres, ["Teclado", "Lámpara", "Auriculares", "Mesa"])
+
+    def test_en_stock(self):
+        """Verifica que ?en_stock=1 excluye los productos agotados"""
+        nombres = self._nombres({'en_stock': 1, 'orden': 'id'})
+        self.assertEqual(nombres, ["Teclado", "Monitor", "Mesa", "Cable"])
+
+    def test_orden_precio_descendente(self):
+        """Verifica ?orden=-precio con desempate por id descendente"""
+        nombres = self._nombres({'orden': '-precio'})
+        self.assertEqual(nombres, ["Monitor", "Mesa", "Auriculares", "Lámpara", "Teclado", "Cable"])
+
+    def test_orden_por_nombre(self):
+        """Verifica ?orden=nombre"""
+        self.assertEqual(self._nombres({'orden': 'nombre'}), sorted(p.nombre for p in self.productos))
+
+    def test_paginado_con_filtros(self):
+        """Verifica que el keyset respeta filtros y orden en todas las páginas"""
+        for orden in ('precio', '-precio', 'nombre'):
+            params = {'precio_min': 10, 'precio_max': 250, 'orden': orden}
+            self.assertEqual(self._recorrer({**params, 'limit': 2}), self._nombres(params))
+
+    def test_combinado_con_categoria(self):
+        """Verifica filtros de precio y stock dentro de una categoría"""
+        nombres = self._nombres({'categoria': self.categoria.id, 'precio_max': 300, 'en_stock': 1, 'orden': 'precio'})
+        self.assertEqual(nombres, ["Cable", "Teclado", "Monitor"])
+
+    def test_parametros_invalidos(self):
+        """Verifica que filtros u órdenes inválidos retornan 400"""
+        for params in (
+            {'precio_min': 'abc'},
+            {'precio_min': 300, 'precio_max': 100},
+            {'precio_max': -1},
+            {'orden': 'stock'},
+            {'orden': 'stock', 'limit': 5},
+        ):
+            response = self.client.get(reverse('productos'), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class PlanesConsultaTests(TestCase):
+    """
+    Tests del plan de ejecución (EXPLAIN) del listado: cada combinación de
+    filtros y orden debe resolverse con su índice, sin recorrer la tabla ni
+    ordenar en memoria.
+    """
+
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nombre="Electrónica")
+        Producto.objects.bulk_create([
+            Producto(nombre=f"Producto {i}", precio=i % 97, stock=i % 3, categoria=self.categoria)
+            for i in range(500)
+        ])
+
+    def _plan(self, **kwargs):
+        filas = ProductoRepository.listar_filas(ProductoListaSerializer.COLUMNAS, **kwargs)
+        if connection.vendor == 'postgresql':
+            # Con tablas de test diminutas PostgreSQL preferiría un Seq Scan
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return filas[:50].explain()
+
+    def _assert_indice(self, indice, **kwargs):
+        plan = self._plan(**kwargs)
+        self.assertIn(indice, plan)
+        # SQLite anota los ORDER BY sin índice como "USE TEMP B-TREE"
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_rango_de_precio(self):
+        """Verifica que el rango de precio ordenado por precio usa productos_precio_idx"""
+        self._assert_indice(
+            'productos_precio_idx', filtros={'precio_min': 10, 'precio_max': 20}, orden='precio'
+        )
+
+    def test_orden_precio_descendente(self):
+        """Verifica que el orden por precio descendente recorre productos_precio_idx al revés"""
+        self._assert_indice('productos_precio_idx', orden='-precio')
+
+    def test_orden_por_nombre(self):
+        """Verifica que el orden por nombre usa productos_nombre_idx"""
+        self._assert_indice('productos_nombre_idx', orden='nombre')
+
+    def test_en_stock(self):
+        """Verifica que el filtro en_stock usa el índice parcial productos_en_stock_idx"""
+        self._assert_indice('productos_en_stock_idx', filtros={'en_stock': True}, orden='id')
+
+    def test_en_stock_por_precio(self):
+        """Verifica que en_stock con filtro y orden por precio usa productos_en_stock_precio_idx"""
+        self._assert_indice(
+            'productos_en_stock_precio_idx', filtros={'en_stock': True, 'precio_min': 5}, orden='precio'
+        )
+
+    def test_categoria_y_precio(self):
+        """Verifica que categoría más rango de precio usa el índice compuesto productos_cat_precio_idx"""
+        self._assert_indice(
+            'productos_cat_precio_idx',
+            categoria_id=self.categoria.id, filtros={'precio_min': 10, 'precio_max': 20}, orden='precio',
+        )
+
+
+class FacetasTests(APITestCase):
+    """Tests para GET /productos/facetas/"""
+
+    def setUp(self):
+        caches['productos'].clear()
+        self.client = Client()
+        self.electronica = Categoria.objects.create(nombre="Electrónica")
+        self.hogar = Categoria.objects.create(nombre="Hogar")
+        for nombre, precio, stock, categoria in [
+            ("Cable", 10, 100, self.electronica),
+            ("Teclado", 50, 5, self.electronica),
+            ("Monitor", 300, 0, self.electronica),
+            ("Lámpara", 40, 3, self.hogar),
+            ("Mesa", 1200, 1, self.hogar),
+        ]:
+            Producto.objects.create(nombre=nombre, precio=precio, stock=stock, categoria=categoria)
+
+    def _facetas(self, params=None):
+        response = self.client.get(reverse('productos-facetas'), params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_conteos_por_categoria(self):
+        """Verifica el total y las estadísticas de precio por categoría"""
+        facetas = self._facetas()
+        self.assertEqual(facetas['total'], 5)
+        self.assertEqual(facetas['precio'], {'min': 10, 'max': 1200, 'promedio': 320.0})
+        electronica, hogar = facetas['categorias']
+        self.assertEqual((electronica['id'], electronica['nombre'], electronica['total']),
+                         (self.electronica.id, "Electrónica", 3))
+        self.assertEqual(electronica['precio'], {'min': 10, 'max': 300, 'promedio': 120.0})
+        self.assertEqual(hogar['total'], 2)
+
+    def test_histograma(self):
+        """Verifica los tramos por defecto, con el último abierto"""
+        histograma = self._facetas()['histograma']
+        self.assertEqual(
+            [(t['desde'], t['hasta'], t['total']) for t in histograma],
+            [(0, 50, 2), (50, 100, 1), (100, 250, 0), (250, 500, 1), (500, 1000, 0), (1000, None, 1)]
+        )
+
+    def test_tramos_personalizados(self):
+        """Verifica ?tramos= por categoría"""
+        facetas = self._facetas({'tramos': '0,100'})
+        self.assertEqual([t['total'] for t in facetas['histograma']], [3, 2])
+        self.assertEqual([t['total'] for t in facetas['categorias'][1]['histograma']], [1, 1])
+
+    def test_respeta_filtros(self):
+        """Verifica que las facetas usan los mismos filtros que el listado"""
+        facetas = self._facetas({'en_stock': 1, 'precio_max': 100})
+        self.assertEqual(facetas['total'], 3)
+        self.assertEqual([c['total'] for c in facetas['categorias']], [2, 1])
+        facetas = self._facetas({'categoria': self.hogar.id, 'q': 'mesa'})
+        self.assertEqual(facetas['total'], 1)
+
+    def test_sin_resultados(self):
+        """Verifica la respuesta cuando ningún producto coincide"""
+        facetas = self._facetas({'precio_min': 5000})
+        self.assertEqual(facetas['total'], 0)
+        self.assertEqual(facetas['precio'], {'min': None, 'max': None, 'promedio': None})
+        self.assertEqual(facetas['categorias'], [])
+
+    def test_una_consulta_y_cache(self):
+        """Verifica que se calcula con una consulta y luego se sirve desde cache"""
+        with self.assertNumQueries(1):
+            self._facetas({'precio_min': 20})
+        with self.assertNumQueries(0):
+            self._facetas({'precio_min': 20})
+
+    def test_mutacion_invalida(self):
+        """Verifica que un cambio de producto renueva las facetas cacheadas"""
+        self.assertEqual(self._facetas()['total'], 5)
+        ProductoService.crear_producto({'nombre': "Silla", 'precio': 80, 'categoria': self.hogar})
+        self.assertEqual(self._facetas()['total'], 6)
+
+    def test_get_condicional(self):
+        """Verifica que con el mismo ETag se responde 304"""
+        response = self.client.get(reverse('productos-facetas'))
+        response = self.client.get(reverse('productos-facetas'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_tramos_invalidos(self):
+        """Verifica que tramos no numéricos o desordenados retornan 400"""
+        for tramos in ('a,b', '100,50', '-10,0'):
+            response = self.client.get(reverse('productos-facetas'), {'tramos': tramos})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, tramos)
+
+
+class CamposDispersosTests(APITestCase):
+    """Tests para ?fields= y ?exclude= en el listado y el detalle"""
+
+    def setUp(self):
+        caches['productos'].clear()
+        self.client = Client()
+        self.categoria = Categoria.objects.create(nombre="Electrónica")
+        self.productos = [
+            Producto.objects.create(
+                nombre=f"Producto {i}", descripcion="x" * 500, precio=100 - i,
+                categoria=self.categoria, imagen_url=f"https://img/{i}.png"
+            )
+            for i in range(5)
+        ]
+
+    def _sql(self, params, url=None):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url or reverse('productos'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, ' '.join(c['sql'] for c in consultas.captured_queries)
+
+    def test_fields_listado(self):
+        """Verifica que ?fields= recorta el JSON, las columnas y el JOIN"""
+        response, sql = self._sql({'fields': 'id,nombre,precio,imagen_url'})
+        self.assertEqual(
+            response.json()[0],
+            {'id': self.productos[0].id, 'nombre': "Producto 0", 'precio': 100, 'imagen_url': "https://img/0.png"}
+        )
+        self.assertNotIn('descripcion', sql)
+        self.assertNotIn('categorias', sql)
+
+    def test_exclude_listado(self):
+        """Verifica ?exclude= manteniendo la categoría anidada"""
+        response, sql = self._sql({'exclude': 'descripcion'})
+        self.assertNotIn('descripcion', response.json()[0])
+        self.assertEqual(response.json()[0]['categoria']['nombre'], "Electrónica")
+        self.assertNotIn('descripcion', sql)
+        self.assertIn('categorias', sql)
+
+    def test_fields_paginado_con_orden(self):
+        """Verifica que el keyset lee las columnas del orden aunque no se pidan"""
+        ids = []
+        params = {'fields': 'id', 'orden': 'precio', 'limit': 2}
+        response = self.client.get(reverse('productos'), params)
+        while True:
+            self.assertEqual(set(response.json()['results'][0]), {'id'})
+            ids.extend(p['id'] for p in response.json()['results'])
+            if not response.json()['next']:
+                break
+            response = self.client.get(reverse('productos'), {**params, 'cursor': response.json()['next']})
+        self.assertEqual(ids, [p.id for p in reversed(self.productos)])
+
+    def test_fields_detalle(self):
+        """Verifica ?fields= en el detalle, servido desde la cache"""
+        url = reverse('producto', args=[self.productos[0].id])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'fields': 'nombre,categoria'})
+        self.assertEqual(
+            response.json(),
+            {'nombre': "Producto 0", 'categoria': {'id': self.categoria.id, 'nombre': "Electrónica"}}
+        )
+
+    def test_campos_invalidos(self):
+        """Verifica que campos desconocidos o una selección vacía retornan 400"""
+        url_detalle = reverse('producto', args=[self.productos[0].id])
+        for url, params in (
+            (reverse('productos'), {'fields': 'nombre,password'}),
+            (reverse('productos'), {'fields': 'nombre', 'exclude': 'nombre'}),
+            (url_detalle, {'exclude': 'costo'}),
+        ):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class LotePorIdsTests(APITestCase):
+    """Tests para GET /productos/?ids= y POST /productos/lote/"""
+
+    def setUp(self):
+        caches['productos'].clear()
+        ProductoCache.reiniciar_estadisticas()
+        self.client = Client()
+        self.categoria = Categoria.objects.create(nombre="Electrónica")
+        self.productos = [
+            Producto.objects.create(nombre=f"Producto {i}", precio=10 * i, categoria=self.categoria)
+            for i in range(5)
+        ]
+        self.ids = [p.id for p in self.productos]
+
+    def _get(self, ids, **params):
+        return self.client.get(reverse('productos'), {'ids': ','.join(map(str, ids)), **params})
+
+    def test_orden_pedido_y_faltantes(self):
+        """Verifica que se respeta el orden pedido y se informan los IDs inexistentes"""
+        pedidos = [self.ids[3], 9999, self.ids[0], self.ids[3], self.ids[1]]
+        response = self._get(pedidos)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [p['id'] for p in response.json()['results']],
+            [self.ids[3], self.ids[0], self.ids[1]]
+        )
+        self.assertEqual(response.json()['faltantes'], [9999])
+        self.assertEqual(response.json()['results'][0]['categoria']['nombre'], "Electrónica")
+
+    def test_una_consulta_in(self):
+        """Verifica que todos los IDs se resuelven con una sola consulta"""
+        with self.assertNumQueries(1):
+            self._get(self.ids + [9999])
+
+    def test_usa_cache_del_detalle(self):
+        """Verifica que los detalles calientes no se consultan y los fríos quedan cacheados"""
+        self.client.get(reverse('producto', args=[self.ids[0]]))
+        with CaptureQueriesContext(connection) as consultas:
+            self._get(self.ids[:3] + [9999])
+        self.assertEqual(len(consultas), 1)
+        self.assertIn(f'IN ({self.ids[1]}, {self.ids[2]}, 9999)', consultas[0]['sql'])
+        with self.assertNumQueries(0):
+            self._get(self.ids[:3] + [9999])
+            self.client.get(reverse('producto', args=[self.ids[2]]))
+        self.assertEqual(ProductoService.estadisticas_cache()['misses'], 4)
+
+    def test_invalidacion(self):
+        """Verifica que una mutación se refleja en la siguiente lectura por lote"""
+        self._get(self.ids)
+        ProductoService.actualizar_producto(self.ids[1], {'precio': 999})
+        response = self._get(self.ids[:2])
+        self.assertEqual([p['precio'] for p in response.json()['results']], [0, 999])
+
+    def test_fields(self):
+        """Verifica que ?fields= también se aplica al lote"""
+        response = self._get(self.ids[:2], fields='id,precio')
+        self.assertEqual(response.json()['results'], [{'id': self.ids[0], 'precio': 0}, {'id': self.ids[1], 'precio': 10}])
+
+    def test_post(self):
+        """Verifica la variante POST para listas largas"""
+        response = self.client.post(
+            reverse('productos-lote'), {'ids': [self.ids[4], self.ids[2], 12345]},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in response.json()['results']], [self.ids[4], self.ids[2]])
+        self.assertEqual(response.json()['faltantes'], [12345])
+
+    def test_invalidos(self):
+        """Verifica que IDs no numéricos, vacíos o demasiados retornan 400"""
+        self.assertEqual(self.client.get(reverse('productos'), {'ids': '1,a'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('productos'), {'ids': ''}).status_code, 400)
+        response = self.client.post(reverse('productos-lote'), {'ids': []}, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(
+            reverse('productos-lote'), {'ids': list(range(1, 1002))}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(ROOT_URLCONF='servicio_productos.urls_asgi')
+class VistasAsyncTests(TestCase):
+    """Tests para las vistas de lectura async del modo ASGI"""
+
+    def setUp(self):
+        caches['productos'].clear()
+        self.categoria = Categoria.objects.create(nombre="Electrónica")
+        self.productos = [
+            Producto.objects.create(
+                nombre=f"Producto {i}", descripcion="Ñandú", precio=10 * (5 - i), stock=i,
+                categoria=self.categoria
+            )
+            for i in range(5)
+        ]
+
+    def test_resuelve_vistas_async(self):
+        """Verifica que el urlconf ASGI apunta a las vistas async"""
+        from django.urls import resolve
+        import asyncio
+        for url in (reverse('productos'), reverse('producto', args=[1]), reverse('productos-lote')):
+            self.assertTrue(asyncio.iscoroutinefunction(resolve(url).func), url)
+
+    async def test_mismo_json_que_wsgi(self):
+        """Verifica que las vistas async devuelven lo mismo que las DRF síncronas"""
+        sincrono, asincrono = Client(), AsyncClient()
+        primero = self.productos[0].id
+        casos = [
+            (reverse('productos'), {}),
+            (reverse('productos'), {'orden': 'precio', 'fields': 'id,precio'}),
+            (reverse('productos'), {'limit': 2, 'orden': 'nombre', 'en_stock': 1}),
+            (reverse('productos'), {'ids': f'{primero},999'}),
+            (reverse('productos'), {'orden': 'stock'}),
+            (reverse('producto', args=[primero]), {'exclude': 'descripcion'}),
+            (reverse('producto', args=[999]), {}),
+        ]
+        for url, params in casos:
+            esperado = await sync_to_async(sincrono.get)(url, params)
+            response = await asincrono.get(url, params)
+            self.assertEqual(response.status_code, esperado.status_code, params)
+            self.assertEqual(json.loads(response.content), json.loads(esperado.content), params)
+
+    async def test_detalle_cacheado_y_304(self):
+        """Verifica la cache del detalle y el GET condicional en la vista async"""
+        cliente = AsyncClient()
+        url = reverse('producto', args=[self.productos[1].id])
+        response = await cliente.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ProductoCache.reiniciar_estadisticas()
+        response = await cliente.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        estadisticas = ProductoService.estadisticas_cache()
+        self.assertEqual((estadisticas['hits'], estadisticas['misses']), (1, 0))
+
+    async def test_lote_post(self):
+        """Verifica POST productos/lote/ async"""
+        ids = [self.productos[2].id, 12345]
+        response = await AsyncClient().post(reverse('productos-lote'), {'ids': ids}, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['faltantes'], [12345])
+        response = await AsyncClient().post(reverse('productos-lote'), {'ids': []}, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_escrituras_delegadas(self):
+        """Verifica que POST/PATCH/DELETE en las rutas async usan las vistas DRF"""
+        cliente = AsyncClient()
+        response = await cliente.post(
+            reverse('productos'),
+            {'nombre': "Nuevo", 'precio': 5, 'categoria_id': self.categoria.id},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        url = reverse('producto', args=[json.loads(response.content)['id']])
+        response = await cliente.patch(url, {'precio': 7}, content_type='application/json')
+        self.assertEqual(json.loads(response.content)['precio'], 7)
+        self.assertEqual(json.loads((await cliente.get(url)).content)['precio'], 7)
+        self.assertEqual((await cliente.delete(url)).status_code, status.HTTP_204_NO_CONTENT)
+
+
+class _ConexionFalsa:
+    """Conexión mínima para probar el pool sin PostgreSQL."""
+
+    def __init__(self):
+        self.cerrada = False
+        self.sana = True
+
+    def close(self):
+        self.cerrada = True
+
+
+class PoolConexionesTests(TestCase):
+    def setUp(self):
+        from servicio_productos.postgresql_pool.pool import PoolConexiones
+        self.PoolConexiones = PoolConexiones
+        self.creadas = []
+
+    def fabrica(self):
+        conexion = _ConexionFalsa()
+        self.creadas.append(conexion)
+        return conexion
+
+    def test_reutiliza_conexiones(self):
+        """Verifica que una conexión devuelta se vuelve a entregar sin reconectar"""
+        pool = self.PoolConexiones(tamano_max=2)
+        conexion = pool.obtener(self.fabrica)
+        pool.devolver(conexion)
+        self.assertIs(pool.obtener(self.fabrica), conexion)
+        self.assertEqual(len(self.creadas), 1)
+        estadisticas = pool.estadisticas()
+        self.assertEqual((estadisticas['en_uso'], estadisticas['libres'], estadisticas['peticiones']), (1, 0, 2))
+
+    def test_carga_concurrente_no_supera_tamano(self):
+        """Verifica que con muchos hilos nunca hay más conexiones que tamano_max"""
+        import threading
+        pool = self.PoolConexiones(tamano_max=4, espera_max=5)
+        lock = threading.Lock()
+        activas = {'ahora': 0, 'maximo': 0}
+
+        def trabajar(_):
+            conexion = pool.obtener(self.fabrica)
+            with lock:
+                activas['ahora'] += 1
+                activas['maximo'] = max(activas['maximo'], activas['ahora'])
+            time.sleep(0.002)
+            with lock:
+                activas['ahora'] -= 1
+            pool.devolver(conexion)
+
+        with ThreadPoolExecutor(max_workers=16) as ejecutor:
+            list(ejecutor.map(trabajar, range(200)))
+
+        estadisticas = pool.estadisticas()
+        self.assertLessEqual(activas['maximo'], 4)
+        self.assertLessEqual(len(self.creadas), 4)
+        self.assertEqual(estadisticas['peticiones'], 200)
+        self.assertEqual(sum(estadisticas['espera_ms'].values()), 200)
+        self.assertEqual((estadisticas['en_uso'], estadisticas['esperando']), (0, 0))
+        self.assertEqual(estadisticas['rotacion']['creadas'], len(self.creadas))
+
+    def test_agotado(self):
+        """Verifica que sin cupo se espera hasta espera_max y se lanza PoolAgotado"""
+        from servicio_productos.postgresql_pool.pool import PoolAgotado
+        pool = self.PoolConexiones(tamano_max=1, espera_max=0.05)
+        pool.obtener(self.fabrica)
+        inicio = time.monotonic()
+        with self.assertRaises(PoolAgotado):
+            pool.obtener(self.fabrica)
+        self.assertGreaterEqual(time.monotonic() - inicio, 0.05)
+        self.assertEqual(pool.estadisticas()['agotadas'], 1)
+
+    def test_descarta_rotas_y_expiradas(self):
+        """Verifica que se cierran las conexiones rotas o más viejas que vida_max"""
+        pool = self.PoolConexiones(
+            tamano_max=2, verificar_tras=0,
+            validar=lambda conexion: conexion.sana,
+            reiniciar=lambda conexion: conexion.sana,
+        )
+        # Rota al devolverla: no vuelve al pool
+        conexion = pool.obtener(self.fabrica)
+        conexion.sana = False
+        pool.devolver(conexion)
+        self.assertTrue(conexion.cerrada)
+
+        # Se rompe estando libre: la validación previa la descarta
+        conexion = pool.obtener(self.fabrica)
+        pool.devolver(conexion)
+        conexion.sana = False
+        nueva = pool.obtener(self.fabrica)
+        self.assertIsNot(nueva, conexion)
+        self.assertTrue(conexion.cerrada)
+
+        pool.vida_max = 0
+        pool.devolver(nueva)
+        self.assertTrue(nueva.cerrada)
+
+        rotacion = pool.estadisticas()['rotacion']
+        self.assertEqual((rotacion['creadas'], rotacion['rotas'], rotacion['expiradas']), (3, 2, 1))
+        self.assertEqual(pool.estadisticas()['abiertas'], 0)
+
+    def test_error_al_conectar_libera_cupo(self):
+        """Verifica que un fallo de la fábrica no consume cupo del pool"""
+        pool = self.PoolConexiones(tamano_max=1, espera_max=0.01)
+
+        def fallar():
+            raise OSError("sin red")
+
+        with self.assertRaises(OSError):
+            pool.obtener(fallar)
+        self.assertIsNotNone(pool.obtener(self.fabrica))
+        self.assertEqual(pool.estadisticas()['rotacion']['errores_conexion'], 1)
+
+    def test_backend_devuelve_al_pool(self):
+        """Verifica que el backend toma la conexión del pool y la devuelve al cerrar"""
+        from types import SimpleNamespace
+        from unittest import mock
+        from django.db.backends.postgresql import base as postgresql
+        from psycopg import pq
+        from servicio_productos.postgresql_pool import base
+
+        def fabrica(conn_params):
+            conexion = self.fabrica()
+            conexion.closed = conexion.broken = False
+            conexion.info = SimpleNamespace(transaction_status=pq.TransactionStatus.IDLE)
+            return conexion
+
+        ajustes = {
+            'ENGINE': 'servicio_productos.postgresql_pool', 'NAME': 'x', 'OPTIONS': {},
+            'POOL': {'TAMANO_MAX': 1}, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False,
+            'AUTOCOMMIT': True, 'ATOMIC_REQUESTS': False, 'TIME_ZONE': None,
+        }
+        wrapper = base.DatabaseWrapper(ajustes, alias='pool-prueba')
+        try:
+            with mock.patch.object(postgresql.DatabaseWrapper, 'get_new_connection', side_effect=fabrica):
+                for _ in range(3):
+                    wrapper.connection = wrapper.get_new_connection({})
+                    wrapper._close()
+                    wrapper.connection = None
+            estadisticas = base.pools()['pool-prueba'].estadisticas()
+            self.assertEqual(len(self.creadas), 1)
+            self.assertEqual((estadisticas['libres'], estadisticas['peticiones']), (1, 3))
+        finally:
+            base._pools.pop('pool-prueba', None)
+
+    def test_endpoint_conexiones(self):
+        """Verifica GET productos/conexiones/ (sin pool en tests)"""
+        response = self.client.get(reverse('productos-conexiones'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.json()['default']['pool'])
+        self.assertIn('conn_max_age', response.json()['default'])
+
+
+@override_settings(
+    DB_REPLICAS=['replica'], DB_PRIMARIA_TRAS_ESCRITURA=5,
+    MIDDLEWARE=[*django_settings.MIDDLEWARE, 'servicio_productos.middleware.PrimariaTrasEscrituraMiddleware'],
+)
+class ReplicasLecturaTests(APITestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        caches['productos'].clear()
+        # Misma fila en las dos bases con distinto nombre: simula una réplica con retraso
+        self.categoria = Categoria.objects.create(nombre="Libros")
+        self.producto = Producto.objects.create(nombre="En primaria", precio=10, stock=3, categoria=self.categoria)
+        Categoria(id=self.categoria.id, nombre="Libros").save(using='replica')
+        Producto(id=self.producto.id, nombre="En replica", precio=10, stock=3, categoria_id=self.categoria.id).save(using='replica')
+
+    def test_lecturas_van_a_la_replica(self):
+        """Verifica que los GET del catálogo leen de la réplica y sin ETag de versión"""
+        response = self.client.get(reverse('productos'))
+        self.assertEqual([p['nombre'] for p in response.data], ["En replica"])
+        self.assertNotIn('ETag', response)
+
+    def test_cache_se_llena_desde_la_primaria(self):
+        """Verifica que un fallo de la cache del detalle se carga de la primaria"""
+        # Un cliente sin ventana llena la cache: no debe fijar la versión de la réplica
+        response = APIClient().get(reverse('producto', args=[self.producto.id]))
+        self.assertEqual(response.data['nombre'], "En primaria")
+        response = self.client.get(reverse('productos'), {'ids': str(self.producto.id)})
+        self.assertEqual(response.data['results'][0]['nombre'], "En primaria")
+
+    def test_escrituras_van_a_la_primaria(self):
+        """Verifica que un POST crea el producto sólo en la primaria"""
+        response = self.client.post(
+            reverse('productos'), {'nombre': "Nuevo", 'precio': 5, 'categoria_id': self.categoria.id}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Producto.objects.using('default').filter(nombre="Nuevo").exists())
+        self.assertFalse(Producto.objects.using('replica').filter(nombre="Nuevo").exists())
+
+    def test_lee_sus_escrituras(self):
+        """Verifica que tras escribir el mismo cliente lee de la primaria durante la ventana"""
+        url = reverse('producto', args=[self.producto.id])
+        response = self.client.patch(url, {'precio': 12}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('leer_primaria_hasta', response.cookies)
+
+        response = self.client.get(url)
+        self.assertEqual((response.data['nombre'], response.data['precio']), ("En primaria", 12))
+
+        # Otro cliente (sin la cookie) sigue leyendo de la réplica
+        otro = APIClient()
+        response = otro.get(reverse('productos'))
+        self.assertEqual([p['nombre'] for p in response.data], ["En replica"])
+
+    def test_ventana_expirada(self):
+        """Verifica que pasada la ventana el cliente vuelve a la réplica"""
+        self.client.cookies['leer_primaria_hasta'] = str(time.time() - 1)
+        response = self.client.get(reverse('productos'))
+        self.assertEqual([p['nombre'] for p in response.data], ["En replica"])
+
+    def test_consultas_por_alias(self):
+        """Verifica que productos/conexiones/ cuenta las consultas de cada alias"""
+        from servicio_productos.routers import reiniciar_consultas
+        reiniciar_consultas()
+        self.client.get(reverse('productos'))
+        datos = self.client.get(reverse('productos-conexiones')).json()
+        self.assertGreater(datos['replica']['consultas'], 0)
+        self.assertTrue(datos['replica']['replica'])
+        self.assertFalse(datos['default']['replica'])
+
+    async def test_vistas_async_respetan_la_ventana(self):
+        """Verifica el read-your-writes con las vistas async (modo ASGI)"""
+        with override_settings(ROOT_URLCONF='servicio_productos.urls_asgi'):
+            cliente = AsyncClient()
+            url = reverse('producto', args=[self.producto.id])
+            nombres = lambda response: [p['nombre'] for p in json.loads(response.content)]
+            self.assertEqual(nombres(await cliente.get(reverse('productos'))), ["En replica"])
+            response = await cliente.patch(url, {'precio': 12}, content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            cliente.cookies['leer_primaria_hasta'] = response.cookies['leer_primaria_hasta'].value
+            self.assertEqual(nombres(await cliente.get(reverse('productos'))), ["En primaria"])
+
+    def test_middleware_async_sin_adaptar(self):
+        """Verifica que el middleware no obliga a adaptar la cadena async (modo ASGI)"""
+        import logging
+        from django.core.handlers.asgi import ASGIHandler
+        # Django sólo registra las adaptaciones con DEBUG activo
+        with self.settings(DEBUG=True), self.assertLogs('django.request', 'DEBUG') as registros:
+            logging.getLogger('django.request').debug("Cargando middleware")
+            ASGIHandler()
+        adaptados = [linea for linea in registros.output if 'adapted' in linea]
+        self.assertFalse([linea for linea in adaptados if 'PrimariaTrasEscrituraMiddleware' in linea])
+
+    @override_settings(DB_REPLICAS=[])
+    def test_sin_replicas_no_se_instala(self):
+        """Verifica que sin réplicas el middleware se descarta al arrancar"""
+        from django.core.exceptions import MiddlewareNotUsed
+        from servicio_productos.middleware import PrimariaTrasEscrituraMiddleware
+        with self.assertRaises(MiddlewareNotUsed):
+            PrimariaTrasEscrituraMiddleware(lambda request: None)
+
+
+class GeneracionDatosTests(TestCase):
+    def test_genera_en_lotes(self):
+        """Verifica que generar_datos inserta todas las filas y las categorías base"""
+        from io import StringIO
+        from django.core.management import call_command
+        from productos import generacion
+        salida = StringIO()
+        call_command('generar_datos', productos=1234, lote=500, procesos=0, stdout=salida)
+        self.assertEqual(Producto.objects.count(), 1234)
+        self.assertEqual(
+            set(Categoria.objects.values_list('nombre', flat=True)), set(generacion.CATEGORIAS)
+        )
+        self.assertEqual(len(set(Producto.objects.values_list('nombre', flat=True))), 1234)
+        self.assertIn('filas/s', salida.getvalue())
+
+    def test_copy_reutiliza_la_conexion_del_proceso(self):
+        """Verifica que los lotes COPY de un proceso comparten una sola conexión"""
+        from unittest import mock
+        from productos import generacion
+        with mock.patch('psycopg.connect') as conectar:
+            generacion.conectar({'dbname': 'x'})
+            try:
+                hechas = sum(generacion.copiar_lote('productos', numero, 10, 30, 0, [1]) for numero in range(3))
+            finally:
+                generacion.desconectar()
+        self.assertEqual(hechas, 30)
+        conectar.assert_called_once_with(dbname='x')
+        self.assertEqual(conectar.return_value.commit.call_count, 3)
+        conectar.return_value.close.assert_called_once()
+
+    def test_lotes_deterministas(self):
+        """Verifica que un lote depende sólo de la semilla y su número"""
+        from productos import generacion
+        sin_fecha = lambda filas: [fila[:-1] for fila in filas]
+        lote = generacion.generar_lote(3, 100, 1000, 7, [1, 2])
+        self.assertEqual(sin_fecha(lote), sin_fecha(generacion.generar_lote(3, 100, 1000, 7, [1, 2])))
+        self.assertNotEqual(sin_fecha(lote), sin_fecha(generacion.generar_lote(3, 100, 1000, 8, [1, 2])))
+        self.assertEqual(len(generacion.generar_lote(9, 100, 950, 7, [1, 2])), 50)
+
+    def test_procesos_en_paralelo(self):
+        """Verifica que con procesos generadores se obtiene lo mismo que en serie"""
+        from io import StringIO
+        from django.core.management import call_command
+        call_command('generar_datos', productos=300, lote=100, procesos=2, semilla=5, stdout=StringIO())
+        paralelo = list(Producto.objects.order_by('nombre').values_list('nombre', 'precio', 'stock'))
+        Producto.objects.all().delete()
+        call_command('generar_datos', productos=300, lote=100, procesos=0, semilla=5, stdout=StringIO())
+        serie = list(Producto.objects.order_by('nombre').values_list('nombre', 'precio', 'stock'))
+        self.assertEqual(paralelo, serie)
+
+
+class ArchivosImportacionMixin:
+    """Catálogos temporales y ejecución de importar_catalogo"""
+
+    def setUp(self):
+        import tempfile
+        caches['productos'].clear()
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        self.ropa = Categoria.objects.create(nombre="Ropa")
+
+    def escribir(self, nombre, contenido):
+        import os
+        ruta = os.path.join(self.directorio.name, nombre)
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            archivo.write(contenido)
+        return ruta
+
+    def importar(self, ruta, **opciones):
+        from io import StringIO
+        from django.core.management import call_command
+        salida, errores = StringIO(), StringIO()
+        call_command('importar_catalogo', ruta, stdout=salida, stderr=errores, **opciones)
+        return salida.getvalue(), errores.getvalue()
+
+
+class ImportacionCatalogoTests(ArchivosImportacionMixin, TestCase):
+    def test_csv_crea_y_actualiza_por_sku(self):
+        """Verifica el upsert por sku y que las categorías se resuelven por nombre"""
+        ruta = self.escribir('feed.csv', (
+            "sku,nombre,precio,stock,categoria\n"
+            "A-1,Camisa,10,5, ropa \n"
+            "A-2,Lámpara,30,2,Hogar\n"
+            "A-3,Mesa,50,1,hogar\n"
+        ))
+        salida, _ = self.importar(ruta, lote=2)
+        self.assertIn("3 creados, 0 actualizados", salida)
+        self.assertEqual(Categoria.objects.filter(nombre__iexact="hogar").count(), 1)
+        self.assertEqual(Producto.objects.get(sku='A-1').categoria_id, self.ropa.id)
+
+        ruta = self.escribir('feed2.csv', (
+            "sku,nombre,precio,stock,categoria\n"
+            "A-1,Camisa azul,12,4,Hogar\n"
+            "A-4,Silla,20,0,Ropa\n"
+        ))
+        salida, _ = self.importar(ruta)
+        self.assertIn("1 creados, 1 actualizados", salida)
+        camisa = Producto.objects.get(sku='A-1')
+        self.assertEqual((camisa.nombre, camisa.precio, camisa.categoria.nombre), ("Camisa azul", 12, "Hogar"))
+        self.assertEqual(Producto.objects.count(), 4)
+
+    def test_ndjson_y_filas_rechazadas(self):
+        """Verifica NDJSON, el informe de filas inválidas y el sku repetido en un lote"""
+        ruta = self.escribir('feed.ndjson', "\n".join([
+            '{"sku": "B-1", "nombre": "Balón", "precio": 15, "categoria": "Ropa"}',
+            '{"sku": "B-2", "nombre": "Sin precio", "categoria": "Ropa"}',
+            'no es json',
+            '{"sku": "B-3", "nombre": "Negativo", "precio": -1, "categoria": "Ropa"}',
+            '{"sku": "B-1", "nombre": "Balón pro", "precio": 18.0, "stock": 3, "categoria": "Ropa"}',
+        ]))
+        salida, errores = self.importar(ruta)
+        self.assertIn("1 creados, 0 actualizados, 3 rechazados", salida)
+        self.assertIn("línea 2: Faltan: precio", errores)
+        self.assertIn("línea 3: Fila ilegible", errores)
+        balon = Producto.objects.get(sku='B-1')
+        self.assertEqual((balon.nombre, balon.precio, balon.stock), ("Balón pro", 18, 3))
+
+    def test_rangos_y_url(self):
+        """Verifica que enteros fuera de rango y URLs inválidas rechazan sólo su fila"""
+        ruta = self.escribir('feed.ndjson', "\n".join([
+            '{"sku": "F-1", "nombre": "Caro", "precio": 2147483648, "categoria": "Ropa"}',
+            '{"sku": "F-2", "nombre": "Mucho", "precio": 1, "stock": 99999999999, "categoria": "Ropa"}',
+            '{"sku": "F-3", "nombre": "Foto", "precio": 1, "imagen_url": "no es una url", "categoria": "Ropa"}',
+            '{"sku": "F-4", "nombre": "Bien", "precio": 2147483647, "imagen_url": "https://x.test/a.png", "categoria": "Ropa"}',
+        ]))
+        salida, errores = self.importar(ruta)
+        self.assertIn("1 creados, 0 actualizados, 3 rechazados", salida)
+        self.assertIn("línea 1: 'precio' supera 2147483647", errores)
+        self.assertIn("línea 3: 'imagen_url' no es una URL válida", errores)
+        self.assertEqual(list(Producto.objects.values_list('sku', flat=True)), ['F-4'])
+
+    def test_max_errores(self):
+        """Verifica que se aborta al superar --max-errores"""
+        from django.core.management.base import CommandError
+        ruta = self.escribir('feed.csv', "sku,nombre,precio,categoria\nC-1,,1,Ropa\nC-2,,1,Ropa\n")
+        with self.assertRaises(CommandError):
+            self.importar(ruta, max_errores=1)
+
+    def test_invalida_cache_del_detalle(self):
+        """Verifica que una importación invalida el detalle cacheado del producto"""
+        producto = Producto.objects.create(nombre="Viejo", precio=1, categoria=self.ropa, sku='D-1')
+        url = reverse('producto', args=[producto.id])
+        self.assertEqual(self.client.get(url).json()['nombre'], "Viejo")
+        self.importar(self.escribir('feed.csv', "sku,nombre,precio,categoria\nD-1,Nuevo,2,Ropa\n"))
+        self.assertEqual(self.client.get(url).json()['nombre'], "Nuevo")
+
+    def test_gzip(self):
+        """Verifica la lectura de un CSV comprimido"""
+        import gzip
+        import os
+        ruta = os.path.join(self.directorio.name, 'feed.csv.gz')
+        with gzip.open(ruta, 'wt', encoding='utf-8') as archivo:
+            archivo.write("sku,nombre,precio,categoria\nE-1,Gorra,9,Ropa\n")
+        salida, _ = self.importar(ruta)
+        self.assertIn("1 creados", salida)
+
+
+@override_settings(DB_REPLICAS=['replica'])
+class ImportacionConReplicasTests(ArchivosImportacionMixin, TestCase):
+    """La importación no pasa por el middleware: sus lecturas deben ir igualmente a la primaria"""
+    databases = {'default', 'replica'}
+
+    def test_replica_atrasada(self):
+        """Verifica que con una réplica vacía el upsert encuentra sus filas y los conteos cuadran"""
+        contenido = "sku,nombre,precio,categoria\nA1,Camisa,10,Ropa\nA2,Mesa,50,Hogar\n"
+        salida, _ = self.importar(self.escribir('feed.csv', contenido))
+        self.assertIn("2 creados, 0 actualizados", salida)
+        salida, _ = self.importar(self.escribir('feed2.csv', contenido))
+        self.assertIn("0 creados, 2 actualizados", salida)
+        self.assertEqual(Categoria.objects.using('default').filter(nombre="Ropa").count(), 1)
+        self.assertFalse(Producto.objects.using('replica').exists())
+
+
+class BenchmarkEndpointsTests(TestCase):
+    def setUp(self):
+        caches['productos'].clear()
+
+    def tearDown(self):
+        # El escenario de autocompletado construye el índice global del proceso
+        from productos.services import autocompletado
+        autocompletado.descartar()
+
+    def test_todas_las_rutas_tienen_escenario(self):
+        """Verifica que el benchmark cubre cada ruta de productos/urls.py"""
+        from productos.management.commands.benchmark_endpoints import Command, ESCENARIOS
+        self.assertEqual(Command._seleccionar(None), ESCENARIOS)
+
+    def test_escenarios_validos(self):
+        """Verifica que cada escenario genera una petición que responde 2xx"""
+        from io import StringIO
+        from django.core.management import call_command
+        from productos.management.commands.benchmark_endpoints import Command, ESCENARIOS
+        call_command('generar_datos', productos=200, procesos=0, stdout=StringIO())
+        Producto.objects.update(stock=500)
+        contexto = Command._contexto(0)
+        aleatorio = random.Random(0)
+        for nombre, _, metodo, peticion in ESCENARIOS:
+            with self.subTest(escenario=nombre):
+                response = Command._pedir(self.client, metodo, peticion, contexto, aleatorio)
+                self.assertLess(response.status_code, 300)
+
+    def test_comparar_con_base(self):
+        """Verifica las reglas de regresión: latencia relativa y absoluta, consultas y memoria"""
+        from productos.benchmarks import comparar_con_base
+        base = {'detalle': {'p50_ms': 2.0, 'p95_ms': 4.0, 'p99_ms': 6.0, 'consultas': 1, 'memoria_kb': 40.0}}
+        igual = {'detalle': dict(base['detalle'])}
+        self.assertEqual(comparar_con_base(igual, base), [])
+
+        # +60% pero menos de 1 ms: ruido
+        ruido = {'detalle': {**base['detalle'], 'p50_ms': 2.9}}
+        self.assertEqual(comparar_con_base(ruido, base), [])
+
+        peor = {'detalle': {**base['detalle'], 'p95_ms': 9.0, 'consultas': 2, 'memoria_kb': 400.0}}
+        regresiones = comparar_con_base(peor, base)
+        self.assertEqual(len(regresiones), 3)
+        self.assertIn("detalle: consultas 1 -> 2", regresiones)
+
+        # Escenarios nuevos no se comparan
+        self.assertEqual(comparar_con_base({'nuevo': base['detalle']}, base), [])
+
+
+@override_settings(METRICAS_ACTIVAS=True, METRICAS_UMBRAL_N_MAS_1=5)
+class MetricasTests(APITestCase):
+    def setUp(self):
+        from servicio_productos.metricas import registro
+        caches['productos'].clear()
+        registro.reiniciar()
+        self.client = Client()
+        self.categoria = Categoria.objects.create(nombre="Hogar")
+        self.productos = [
+            Producto.objects.create(nombre=f"Silla {i}", precio=10 + i, stock=i, categoria=self.categoria)
+            for i in range(6)
+        ]
+
+    def test_server_timing(self):
+        """Verifica la cabecera Server-Timing con consultas, SQL, render y total"""
+        response = self.client.get(reverse('productos'))
+        cabecera = response['Server-Timing']
+        self.assertRegex(cabecera, r'db;dur=[\d.]+;desc="1 consultas"')
+        self.assertRegex(cabecera, r'render;dur=[\d.]+')
+        self.assertRegex(cabecera, r'total;dur=[\d.]+')
+
+    def test_endpoint_prometheus(self):
+        """Verifica /metrics: histogramas y contadores por vista en formato de texto"""
+        self.client.get(reverse('productos'))
+        self.client.get(reverse('producto', args=[self.productos[0].id]))
+        self.client.get(reverse('producto', args=[self.productos[0].id]))
+        response = self.client.get(reverse('metricas'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        texto = response.content.decode()
+        self.assertIn('# TYPE servicio_productos_peticion_segundos histogram', texto)
+        self.assertIn('servicio_productos_peticion_segundos_count{vista="producto_view"} 2', texto)
+        self.assertIn('servicio_productos_consultas_por_peticion_bucket{vista="productos_view",le="1"} 1', texto)
+        self.assertIn(
+            'servicio_productos_peticiones_total{vista="producto_view",metodo="GET",codigo="200"} 2', texto
+        )
+
+    def test_detecta_n_mas_1(self):
+        """Verifica que la misma consulta repetida por fila se marca como posible N+1"""
+        from django.test import RequestFactory
+        from servicio_productos.metricas import registro
+        from servicio_productos.middleware import MetricasMiddleware
+        from django.http import HttpResponse
+
+        def vista(request):
+            # Un SELECT por producto en lugar de uno con IN
+            for producto in Producto.objects.all():
+                Categoria.objects.get(pk=producto.categoria_id)
+            return HttpResponse()
+
+        middleware = MetricasMiddleware(vista)
+        with self.assertLogs('servicio_productos.middleware', 'WARNING') as registros:
+            response = middleware(RequestFactory().get('/n1'))
+        self.assertIn('7 consultas', response['Server-Timing'])
+        self.assertIn('Posible N+1', registros.output[0])
+        self.assertIn('servicio_productos_n_mas_1_total{vista="sin_ruta"} 1', registro.exportar())
+
+    def test_forma_consulta(self):
+        """Verifica que las listas IN de distinta longitud tienen la misma forma"""
+        from servicio_productos.metricas import forma_consulta
+        self.assertEqual(
+            forma_consulta('SELECT 1 FROM t WHERE id IN (%s, %s, %s)'),
+            forma_consulta('SELECT 1 FROM t WHERE id IN (%s, %s)'),
+        )
+
+    async def test_modo_asgi(self):
+        """Verifica que en modo ASGI se mide sin adaptar la cadena de middleware"""
+        import logging
+        from django.core.handlers.asgi import ASGIHandler
+        with self.settings(DEBUG=True), self.assertLogs('django.request', 'DEBUG') as registros:
+            logging.getLogger('django.request').debug("Cargando middleware")
+            ASGIHandler()
+        self.assertFalse([linea for linea in registros.output if 'MetricasMiddleware' in linea])
+
+        with self.settings(ROOT_URLCONF='servicio_productos.urls_asgi'):
+            response = await AsyncClient().get(reverse('producto', args=[self.productos[0].id]))
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="1 consultas"')
+
+    @override_settings(METRICAS_ACTIVAS=False)
+    def test_desactivado(self):
+        """Verifica que sin METRICAS_ACTIVAS no hay cabecera ni /metrics"""
+        response = self.client.get(reverse('productos'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(self.client.get(reverse('metricas')).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PerfiladoTests(APITestCase):
+    def setUp(self):
+        import tempfile
+        from django.contrib.auth.models import User
+        caches['productos'].clear()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(
+            PERFILADO_DIRECTORIO=directorio.name, PERFILADO_MUESTREO=0, PERFILADO_UMBRAL_MS=0,
+            PERFILADO_CLAVE='clave-de-prueba',
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.directorio = directorio.name
+        self.categoria = Categoria.objects.create(nombre="Jardín")
+        self.producto = Producto.objects.create(nombre="Manguera", precio=15, stock=4, categoria=self.categoria)
+        self.admin = User.objects.create_user('admin', password='x', is_staff=True)
+
+    def _perfil(self, perfil_id):
+        from productos import perfilado
+        perfilado.esperar()
+        with open(perfilado.ruta(perfil_id), encoding='utf-8') as archivo:
+            return json.load(archivo)
+
+    def test_cabecera_firmada(self):
+        """Verifica que X-Perfilar con token válido guarda cProfile, SQL y EXPLAIN"""
+        from productos.perfilado import firmar_token
+        response = self.client.get(reverse('producto', args=[self.producto.id]), HTTP_X_PERFILAR=firmar_token())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        datos = self._perfil(response['X-Perfil-Id'])
+        self.assertEqual(datos['motivo'], 'cabecera')
+        self.assertEqual(datos['vista'], 'producto_view')
+        self.assertEqual(datos['perfil']['tipo'], 'cprofile')
+        self.assertIn('producto_view', datos['perfil']['resumen'])
+        self.assertTrue(any('FROM "productos"' in c['sql'] for c in datos['consultas']))
+        self.assertEqual(len(datos['explain']), 1)
+        self.assertIn('SEARCH productos', datos['explain'][0]['plan'][0])
+
+    def test_token_invalido(self):
+        """Verifica que un token manipulado no activa el perfilado"""
+        response = self.client.get(reverse('productos'), HTTP_X_PERFILAR='perfilar:falso:falso')
+        self.assertNotIn('X-Perfil-Id', response)
+
+    def test_sin_clave(self):
+        """Verifica que sin PERFILADO_CLAVE la cabecera no activa el perfilado"""
+        from productos.perfilado import firmar_token
+        token = firmar_token()
+        with self.settings(PERFILADO_CLAVE=''):
+            response = self.client.get(reverse('productos'), HTTP_X_PERFILAR=token)
+            self.assertNotIn('X-Perfil-Id', response)
+            with self.assertRaises(ValueError):
+                firmar_token()
+
+    def test_firma_con_clave_propia(self):
+        """Verifica que un token firmado con SECRET_KEY no es válido"""
+        from django.core import signing
+        from productos.perfilado import SAL_TOKEN, VALOR_TOKEN
+        token = signing.TimestampSigner(salt=SAL_TOKEN).sign(VALOR_TOKEN)
+        response = self.client.get(reverse('productos'), HTTP_X_PERFILAR=token)
+        self.assertNotIn('X-Perfil-Id', response)
+
+    def test_cola_llena(self):
+        """Verifica que con la cola de escritura llena no se perfilan más peticiones"""
+        from productos.perfilado import firmar_token
+        with self.settings(PERFILADO_MAX_PENDIENTES=0):
+            response = self.client.get(reverse('productos'), HTTP_X_PERFILAR=firmar_token())
+        self.assertNotIn('X-Perfil-Id', response)
+
+    def test_captura_por_umbral(self):
+        """Verifica que las peticiones más lentas que el umbral se guardan con pilas muestreadas"""
+        with self.settings(PERFILADO_UMBRAL_MS=0.001):
+            response = self.client.get(reverse('productos'))
+        datos = self._perfil(response['X-Perfil-Id'])
+        self.assertEqual(datos['motivo'], 'umbral')
+        self.assertEqual(datos['perfil']['tipo'], 'muestras')
+        with self.settings(PERFILADO_UMBRAL_MS=60_000):
+            response = self.client.get(reverse('productos'))
+        self.assertNotIn('X-Perfil-Id', response)
+
+    def test_buffer_circular(self):
+        """Verifica que sólo se conservan las PERFILADO_MAXIMO capturas más recientes"""
+        from productos import perfilado
+        from productos.perfilado import firmar_token
+        ids = []
+        with self.settings(PERFILADO_MAXIMO=2):
+            for _ in range(4):
+                ids.append(self.client.get(reverse('productos'), HTTP_X_PERFILAR=firmar_token())['X-Perfil-Id'])
+            perfilado.esperar()
+        self.assertEqual([p['id'] for p in perfilado.listar()], ids[:1:-1])
+        self.assertEqual(len(os.listdir(self.directorio)), 4)  # .json y .prof de cada una
+
+    def test_endpoints_solo_administradores(self):
+        """Verifica el listado y la descarga de capturas (sólo personal)"""
+        from productos.perfilado import firmar_token
+        perfil_id = self.client.get(reverse('productos'), HTTP_X_PERFILAR=firmar_token())['X-Perfil-Id']
+        self._perfil(perfil_id)
+        self.assertEqual(self.client.get(reverse('productos-perfiles')).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('productos-perfiles'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['id'], perfil_id)
+        self.assertNotIn('X-Perfil-Id', response)
+
+        response = self.client.get(reverse('producto-perfil', args=[perfil_id]), {'formato': 'prof'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertTrue(b''.join(response.streaming_content))
+
+        for perfil_id in ('0-abcdef', '..settings'):
+            response = self.client.get(reverse('producto-perfil', args=[perfil_id]))
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -1,8 +1,35 @@
 from django.urls import path
-from productos.views import productos_view, producto_view
+from productos.views import (
+    productos_view,
+    producto_view,
+    productos_exportar_view,
+    productos_masivo_view,
+    productos_cache_view,
+    productos_conexiones_view,
+    productos_perfiles_view,
+    producto_perfil_view,
+    producto_reservar_view,
+    producto_liberar_view,
+    productos_reservas_view,
+    productos_autocompletar_view,
+    productos_facetas_view,
+    productos_lote_view,
+)
 
 
 urlpatterns = [
     path('productos/', productos_view, name='productos'),
+    path('productos/bulk/', productos_masivo_view, name='productos-bulk'),
+    path('productos/lote/', productos_lote_view, name='productos-lote'),
+    path('productos/reservas/', productos_reservas_view, name='productos-reservas'),
+    path('productos/autocomplete/', productos_autocompletar_view, name='productos-autocomplete'),
+    path('productos/facetas/', productos_facetas_view, name='productos-facetas'),
+    path('productos/exportar/', productos_exportar_view, name='productos-exportar'),
+    path('productos/cache/', productos_cache_view, name='productos-cache'),
+    path('productos/conexiones/', productos_conexiones_view, name='productos-conexiones'),
+    path('productos/perfiles/', productos_perfiles_view, name='productos-perfiles'),
+    path('productos/perfiles/<str:perfil_id>/', producto_perfil_view, name='producto-perfil'),
     path('productos/<int:id>/', producto_view, name='producto'),
+    path('productos/<int:id>/reservar/', producto_reservar_view, name='producto-reservar'),
+    path('productos/<int:id>/liberar/', producto_liberar_view, name='producto-liberar'),
 ]
\ No newline at end of file
@@ -0,0 +1,11 @@
+from django.urls import path
+from productos.views_async import productos_view, producto_view, productos_lote_view
+
+
+# Rutas de lectura atendidas de forma asíncrona en el modo ASGI. Van antes que
+# productos/urls.py, que sigue resolviendo el resto de rutas.
+urlpatterns = [
+    path('productos/', productos_view, name='productos-async'),
+    path('productos/lote/', productos_lote_view, name='productos-lote-async'),
+    path('productos/<int:id>/', producto_view, name='producto-async'),
+]
@@ -1,23 +1,157 @@
+import hashlib
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
-from productos.serializers import ProductoSerializer
-from .services import ProductoService
+from productos.serializers import (
+    ProductoSerializer,
+    ProductoListaSerializer,
+    ProductoMasivoSerializer,
+    ProductoPrecioStockSerializer,
+    CantidadSerializer,
+    CarritoSerializer,
+    IdsSerializer,
+)
+from productos import exportacion, perfilado
+from productos.perfilado import perfilar
+from .services import MAX_ITEMS_MASIVO, ProductoService, ReservaInsuficiente, StockInsuficiente
+
+def _version_listado(categoria_id):
+    # Versión del catálogo (o de la categoría filtrada) sin tocar la base de datos
+    try:
+        return ProductoService.version_listado(int(categoria_id) if categoria_id else None)
+    except ValueError:
+        return None
+
+
+def _etag_listado(request, version):
+    # El cuerpo depende de la versión y de los parámetros (limit, cursor, orden...)
+    parametros = sorted((clave, valor) for clave in request.GET for valor in request.GET.getlist(clave))
+    huella = hashlib.sha1(f"{version}|{parametros}".encode()).hexdigest()[:24]
+    return f'W/"{huella}"'
+
+
+def _leer_filtros(request):
+    # ?precio_min=&precio_max=&en_stock=1 -> dict para ProductoService
+    filtros = {}
+    for parametro in ('precio_min', 'precio_max'):
+        valor = request.GET.get(parametro, '')
+        if valor != '':
+            try:
+                filtros[parametro] = int(valor)
+            except ValueError:
+                raise ValueError(f"El parámetro {parametro} debe ser un entero")
+    filtros['en_stock'] = request.GET.get('en_stock', '').lower() in ('1', 'true', 'si', 'sí')
+    return filtros
+
+
+def _leer_campos(request):
+    return ProductoListaSerializer.seleccionar_campos(
+        request.GET.get('fields'), request.GET.get('exclude')
+    )
+
+
+def _leer_ids(request):
+    try:
+        return [int(valor) for valor in request.GET['ids'].split(',') if valor.strip()]
+    except ValueError:
+        raise ValueError("El parámetro ids debe ser una lista de enteros separados por comas")
+
+
+def _respuesta_lote(request, ids):
+    # Detalles de varios productos en el orden pedido, con los IDs que no existen
+    try:
+        campos = _leer_campos(request)
+        encontrados, faltantes = ProductoService.obtener_detalles(ids)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'results': [ProductoListaSerializer.proyectar(datos, campos) for datos in encontrados],
+        'faltantes': faltantes,
+    })
+
+
+def _con_validadores(response, etag):
+    # Sin Last-Modified: con resolución de un segundo, dos cambios en el mismo
+    # segundo darían un 304 con datos viejos a quien sólo envía If-Modified-Since
+    response['ETag'] = etag
+    return response
 
+
+@perfilar
 @api_view(['GET', 'POST'])
 def productos_view(request):
     if request.method == 'GET':
+        # ?ids=1,2,3: lectura por lote (una consulta IN y la cache del detalle)
+        if 'ids' in request.GET:
+            try:
+                ids = _leer_ids(request)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return _respuesta_lote(request, ids)
+
         categoria_id = request.GET.get('categoria')
+        # Búsqueda de texto completo en nombre/descripción, combinable con ?categoria=
+        q = request.GET.get('q', '').strip() or None
+        # Rango de precio, sólo con stock y orden (precio, -precio, nombre...)
+        orden = request.GET.get('orden') or None
         try:
-            if categoria_id:
-                productos = ProductoService.listar_por_categoria(categoria_id)
-            else:
-                productos = ProductoService.listar_productos()
+            filtros = _leer_filtros(request)
+            # ?fields= / ?exclude=: sólo se consultan y serializan esas columnas
+            campos = _leer_campos(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # GET condicional: si el cliente ya tiene esta versión respondemos 304
+        # antes de ejecutar la consulta o el serializador
+        version = _version_listado(categoria_id) if ProductoService.validadores_listado_activos() else None
+        if version is not None:
+            etag = _etag_listado(request, version)
+            no_modificado = get_conditional_response(request, etag=etag)
+            if no_modificado is not None:
+                return _con_validadores(no_modificado, etag)
+
+        # Con ?limit= o ?cursor= se responde paginado por cursor
+        if 'limit' in request.GET or 'cursor' in request.GET:
+            try:
+                pagina = ProductoService.listar_pagina(
+                    categoria_id=categoria_id,
+                    q=q,
+                    filtros=filtros,
+                    orden=orden,
+                    limite=request.GET.get('limit'),
+                    cursor=request.GET.get('cursor'),
+                    columnas=ProductoListaSerializer.columnas(campos),
+                )
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            serializer = ProductoSerializer(productos, many=True)
-            return Response(serializer.data)
+            serializer = ProductoListaSerializer(pagina.items, campos)
+            response = Response({
+                'results': serializer.data,
+                'next': pagina.siguiente,
+                'prev': pagina.anterior,
+            })
+            if version is not None:
+                _con_validadores(response, etag)
+            return response
+
+        try:
+            # Lectura rápida: filas de .values() serializadas sin instanciar modelos
+            filas = ProductoService.listar_filas(
+                ProductoListaSerializer.columnas(campos), categoria_id=categoria_id, q=q, filtros=filtros, orden=orden
+            )
         except ValueError as e:
-            return Response({'error': str(e)}, status=404)
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = ProductoListaSerializer(filas, campos)
+        response = Response(serializer.data)
+        if version is not None:
+            _con_validadores(response, etag)
+        return response
 
     elif request.method == 'POST':
         try:
@@ -34,12 +168,301 @@ def productos_view(request):
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
 
+def _codigo_masivo(exitos, fallos):
+    if not fallos:
+        return status.HTTP_200_OK
+    if exitos:
+        return status.HTTP_207_MULTI_STATUS
+    return status.HTTP_400_BAD_REQUEST
+
+
+@perfilar
+@api_view(['POST', 'PATCH'])
+def productos_masivo_view(request):
+    if not isinstance(request.data, list):
+        return Response(
+            {'error': "Se esperaba un array JSON de productos"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    # Antes de validar ítem por ítem: un array enorme se rechaza sin serializarlo
+    if len(request.data) > MAX_ITEMS_MASIVO:
+        return Response(
+            {'error': f"Máximo {MAX_ITEMS_MASIVO} productos por petición"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if request.method == 'PATCH':
+        return _actualizacion_masiva(request)
+    return _alta_masiva(request)
+
+
+def _actualizacion_masiva(request):
+    # Cambios de precio/stock por ID aplicados con bulk_update
+    errores = []
+    cambios = []
+    for indice, item in enumerate(request.data):
+        serializer = ProductoPrecioStockSerializer(data=item)
+        if serializer.is_valid():
+            cambios.append(serializer.validated_data)
+        else:
+            errores.append({'indice': indice, 'errores': serializer.errors})
+
+    try:
+        actualizados, no_encontrados = ProductoService.actualizar_precios_stock_masivo(cambios)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(
+        {'actualizados': actualizados, 'no_encontrados': no_encontrados, 'errores': errores},
+        status=_codigo_masivo(actualizados, errores or no_encontrados)
+    )
+
+
+def _alta_masiva(request):
+    # Alta masiva: recibe un array JSON y reporta el resultado ítem por ítem
+    errores = []
+    validos = []  # (índice en la petición, datos validados)
+    for indice, item in enumerate(request.data):
+        serializer = ProductoMasivoSerializer(data=item)
+        if serializer.is_valid():
+            validos.append((indice, serializer.validated_data))
+        else:
+            errores.append({'indice': indice, 'errores': serializer.errors})
+
+    try:
+        resultados = ProductoService.crear_productos_masivo([datos for _, datos in validos])
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    creados = []
+    for (indice, _), resultado in zip(validos, resultados):
+        if isinstance(resultado, ValueError):
+            errores.append({'indice': indice, 'errores': {'error': str(resultado)}})
+        else:
+            creados.append({'indice': indice, 'id': resultado.id})
+    errores.sort(key=lambda error: error['indice'])
+
+    codigo = _codigo_masivo(creados, errores)
+    if codigo == status.HTTP_200_OK:
+        codigo = status.HTTP_201_CREATED
+    return Response({'creados': creados, 'errores': errores}, status=codigo)
+
+
+@perfilar
+@api_view(['POST'])
+def productos_lote_view(request):
+    # Variante POST de ?ids= para listas que no caben en una URL
+    serializer = IdsSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    return _respuesta_lote(request, serializer.validated_data['ids'])
+
+
+@perfilar
+@api_view(['GET'])
+def productos_autocompletar_view(request):
+    # Sugerencias por prefijo servidas desde el índice en memoria (sin SQL)
+    try:
+        k = min(int(request.GET.get('k', 10)), 50)
+    except ValueError:
+        return Response({'error': "El parámetro k debe ser un entero"}, status=status.HTTP_400_BAD_REQUEST)
+    prefijo = request.GET.get('prefix', '')
+    return Response(ProductoService.autocompletar(prefijo, k=max(k, 1)))
+
+
+def _leer_tramos(request):
+    # ?tramos=0,100,500 -> (0, 100, 500); None para usar los tramos por defecto
+    valor = request.GET.get('tramos', '')
+    if not valor:
+        return None
+    try:
+        return tuple(int(desde) for desde in valor.split(','))
+    except ValueError:
+        raise ValueError("El parámetro tramos debe ser una lista de enteros separados por comas")
+
+
+@perfilar
+@api_view(['GET'])
+def productos_facetas_view(request):
+    # Conteos por categoría e histograma de precios para los mismos filtros que el listado
+    categoria_id = request.GET.get('categoria')
+    q = request.GET.get('q', '').strip() or None
+    try:
+        filtros = _leer_filtros(request)
+        tramos = _leer_tramos(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    version = _version_listado(categoria_id)
+    if version is None:
+        return Response({'error': "El parámetro categoria debe ser un entero"}, status=status.HTTP_400_BAD_REQUEST)
+    validadores = ProductoService.validadores_activos()
+    if validadores:
+        etag = _etag_listado(request, version)
+        no_modificado = get_conditional_response(request, etag=etag)
+        if no_modificado is not None:
+            return _con_validadores(no_modificado, etag)
+
+    try:
+        facetas = ProductoService.facetas(
+            categoria_id=int(categoria_id) if categoria_id else None, q=q, filtros=filtros, tramos=tramos
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return _con_validadores(Response(facetas), etag) if validadores else Response(facetas)
+
+
+@perfilar
 @api_view(['GET'])
+def productos_exportar_view(request):
+    # Exportación completa del catálogo en streaming (NDJSON por defecto o array JSON)
+    formato = request.GET.get('formato', 'ndjson')
+    if formato not in exportacion.FORMATOS:
+        return Response(
+            {'error': f"Formato no soportado: {formato}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    categoria_id = request.GET.get('categoria')
+    try:
+        categoria_id = int(categoria_id) if categoria_id else None
+    except ValueError:
+        return Response({'error': "El parámetro categoria debe ser un entero"}, status=status.HTTP_400_BAD_REQUEST)
+
+    filas = ProductoService.exportar_catalogo(ProductoListaSerializer.COLUMNAS, categoria_id=categoria_id)
+    response = StreamingHttpResponse(
+        exportacion.generar(formato, filas),
+        content_type=exportacion.FORMATOS[formato]
+    )
+    response['Content-Disposition'] = f'attachment; filename="productos.{formato}"'
+    return response
+
+
+@perfilar
+@api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
 def producto_view(request, id):
+    if request.method in ('PUT', 'PATCH'):
+        # PUT exige el producto completo; PATCH sólo los campos a cambiar
+        serializer = ProductoSerializer(data=request.data, partial=request.method == 'PATCH')
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            producto = ProductoService.actualizar_producto(id, serializer.validated_data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if producto is None:
+            return Response({'error': "Producto no encontrado"}, status=404)
+        return Response(ProductoSerializer(producto).data)
+
+    if request.method == 'DELETE':
+        if not ProductoService.eliminar_producto(id):
+            return Response({'error': "Producto no encontrado"}, status=404)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     try:
-        producto = ProductoService.obtener_producto(id)
-        serializer = ProductoSerializer(producto)
-        return Response(serializer.data)
+        campos = _leer_campos(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    try:
+        detalle = ProductoService.obtener_detalle(id)
     except ValueError as e:
         return Response({'error': str(e)}, status=404)
+
+    # El ETag viaja con el payload cacheado: un 304 no consulta ni serializa
+    etag = detalle['etag']
+    no_modificado = get_conditional_response(request, etag=etag)
+    if no_modificado is not None:
+        return _con_validadores(no_modificado, etag)
+    # El detalle completo ya está en cache: ?fields= lo recorta sin otra consulta
+    datos = ProductoListaSerializer.proyectar(detalle['datos'], campos)
+    return _con_validadores(Response(datos), etag)
+
+
+@api_view(['GET'])
+def productos_cache_view(request):
+    # Contadores de la cache de detalle (por proceso)
+    return Response(ProductoService.estadisticas_cache())
+
+
+@api_view(['GET'])
+def productos_conexiones_view(request):
+    # Estado del pool de conexiones a la base (por proceso)
+    return Response(ProductoService.estadisticas_conexiones())
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def productos_perfiles_view(request):
+    # Capturas de perfilado guardadas, de la más reciente a la más antigua
+    return Response(perfilado.listar())
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def producto_perfil_view(request, perfil_id):
+    # ?formato=prof descarga el volcado de cProfile (snakeviz, pstats)
+    extension = '.prof' if request.GET.get('formato') == 'prof' else '.json'
+    try:
+        camino = perfilado.ruta(perfil_id, extension)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=404)
+    if extension == '.prof':
+        return FileResponse(open(camino, 'rb'), as_attachment=True, filename=f'{perfil_id}.prof')
+    return FileResponse(open(camino, 'rb'), content_type='application/json')
+
+
+def _operacion_stock(request, id, operacion):
+    serializer = CantidadSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    cantidad = serializer.validated_data['cantidad']
+    try:
+        stock = operacion(id, cantidad)
+    except (StockInsuficiente, ReservaInsuficiente) as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=404)
+    return Response({'id': id, 'cantidad': cantidad, 'stock': stock})
+
+
+@perfilar
+@api_view(['POST'])
+def producto_reservar_view(request, id):
+    # Reserva atómica: descuenta stock sólo si alcanza (sin lectura previa)
+    return _operacion_stock(request, id, ProductoService.reservar_stock)
+
+
+@perfilar
+@api_view(['POST'])
+def producto_liberar_view(request, id):
+    # Devuelve al stock unidades reservadas previamente (409 si se pide más de lo reservado)
+    return _operacion_stock(request, id, ProductoService.liberar_stock)
+
+
+@perfilar
+@api_view(['POST'])
+def productos_reservas_view(request):
+    # Reserva de un carrito completo en una transacción: todo o nada
+    serializer = CarritoSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    items = serializer.validated_data['items']
+    try:
+        restantes = ProductoService.reservar_carrito(items)
+    except StockInsuficiente as e:
+        return Response(
+            {'error': str(e), 'faltantes': e.faltantes},
+            status=status.HTTP_409_CONFLICT
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=404)
+
+    return Response({
+        'items': [
+            {'id': producto_id, 'stock': stock}
+            for producto_id, stock in restantes.items()
+        ]
+    })
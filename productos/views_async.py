@@ -0,0 +1,163 @@
+"""
+Vistas asíncronas de lectura para el modo ASGI (ver servicio_productos/asgi.py).
+
+Atienden los GET del listado, el detalle y la lectura por lote con el ORM y
+la cache asíncronos, devolviendo el mismo JSON que las vistas DRF de
+views.py (DRF no admite vistas async). Los métodos de escritura de las mismas
+rutas se delegan en las vistas síncronas.
+"""
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from rest_framework import status
+
+from productos import views
+from productos.serializers import IdsSerializer, ProductoListaSerializer
+from .services import ProductoService
+
+
+def _json(datos, codigo=status.HTTP_200_OK):
+    # Mismo formato que el JSONRenderer de DRF: UTF-8 sin escapar y compacto
+    return JsonResponse(
+        datos, status=codigo, safe=False,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')},
+    )
+
+
+def _error(mensaje, codigo=status.HTTP_400_BAD_REQUEST):
+    return _json({'error': mensaje}, codigo)
+
+
+def lectura_async(vista_sync):
+    """
+    GET y HEAD se atienden con la vista async decorada; el resto de métodos
+    de la ruta (POST, PUT, DELETE...) con la vista DRF síncrona en un hilo.
+    """
+    vista_sync_en_hilo = sync_to_async(vista_sync)
+
+    def decorador(vista_async):
+        @wraps(vista_async)
+        async def vista(request, *args, **kwargs):
+            if request.method in ('GET', 'HEAD'):
+                return await vista_async(request, *args, **kwargs)
+            return await vista_sync_en_hilo(request, *args, **kwargs)
+
+        # Como las vistas DRF (csrf_exempt de Django 4.2 no acepta corrutinas)
+        vista.csrf_exempt = True
+        return vista
+    return decorador
+
+
+async def _version_listado(categoria_id):
+    try:
+        return await ProductoService.aversion_listado(int(categoria_id) if categoria_id else None)
+    except ValueError:
+        return None
+
+
+async def _respuesta_lote(request, ids):
+    try:
+        campos = views._leer_campos(request)
+        encontrados, faltantes = await ProductoService.aobtener_detalles(ids)
+    except ValueError as e:
+        return _error(str(e))
+    return _json({
+        'results': [ProductoListaSerializer.proyectar(datos, campos) for datos in encontrados],
+        'faltantes': faltantes,
+    })
+
+
+@lectura_async(views.productos_view)
+async def productos_view(request):
+    if 'ids' in request.GET:
+        try:
+            ids = views._leer_ids(request)
+        except ValueError as e:
+            return _error(str(e))
+        return await _respuesta_lote(request, ids)
+
+    categoria_id = request.GET.get('categoria')
+    q = request.GET.get('q', '').strip() or None
+    orden = request.GET.get('orden') or None
+    try:
+        filtros = views._leer_filtros(request)
+        campos = views._leer_campos(request)
+    except ValueError as e:
+        return _error(str(e))
+
+    version = await _version_listado(categoria_id) if ProductoService.validadores_listado_activos() else None
+    if version is not None:
+        etag = views._etag_listado(request, version)
+        no_modificado = get_conditional_response(request, etag=etag)
+        if no_modificado is not None:
+            return views._con_validadores(no_modificado, etag)
+
+    columnas = ProductoListaSerializer.columnas(campos)
+    try:
+        if 'limit' in request.GET or 'cursor' in request.GET:
+            pagina = await ProductoService.alistar_pagina(
+                categoria_id=categoria_id,
+                q=q,
+                filtros=filtros,
+                orden=orden,
+                limite=request.GET.get('limit'),
+                cursor=request.GET.get('cursor'),
+                columnas=columnas,
+            )
+            datos = {
+                'results': ProductoListaSerializer(pagina.items, campos).data,
+                'next': pagina.siguiente,
+                'prev': pagina.anterior,
+            }
+        else:
+            filas = await ProductoService.alistar_filas(
+                columnas, categoria_id=categoria_id, q=q, filtros=filtros, orden=orden
+            )
+            datos = ProductoListaSerializer(filas, campos).data
+    except ValueError as e:
+        return _error(str(e))
+
+    response = _json(datos)
+    if version is not None:
+        views._con_validadores(response, etag)
+    return response
+
+
+@lectura_async(views.producto_view)
+async def producto_view(request, id):
+    try:
+        campos = views._leer_campos(request)
+    except ValueError as e:
+        return _error(str(e))
+
+    try:
+        detalle = await ProductoService.aobtener_detalle(id)
+    except ValueError as e:
+        return _error(str(e), status.HTTP_404_NOT_FOUND)
+
+    etag = detalle['etag']
+    no_modificado = get_conditional_response(request, etag=etag)
+    if no_modificado is not None:
+        return views._con_validadores(no_modificado, etag)
+    datos = ProductoListaSerializer.proyectar(detalle['datos'], campos)
+    return views._con_validadores(_json(datos), etag)
+
+
+async def productos_lote_view(request):
+    # POST de sólo lectura: también se atiende de forma asíncrona
+    if request.method != 'POST':
+        return _error("Método no permitido", status.HTTP_405_METHOD_NOT_ALLOWED)
+    try:
+        cuerpo = json.loads(request.body or b'null')
+    except ValueError:
+        return _error("JSON inválido")
+    serializer = IdsSerializer(data=cuerpo)
+    if not serializer.is_valid():
+        return _json(serializer.errors, status.HTTP_400_BAD_REQUEST)
+    return await _respuesta_lote(request, serializer.validated_data['ids'])
+
+
+productos_lote_view.csrf_exempt = True
@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'servicio_productos.settings')
+# Servido por ASGI, las lecturas de productos usan las vistas async
+# (productos/views_async.py). Despliegue:
+#   uvicorn servicio_productos.asgi:application --host 0.0.0.0 --port 8000 --workers 4
+os.environ.setdefault('DJANGO_VISTAS_ASYNC', '1')
 
 application = get_asgi_application()
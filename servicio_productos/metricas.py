@@ -0,0 +1,123 @@
+"""
+Métricas por vista en memoria del proceso, expuestas en formato de texto de
+Prometheus en /metrics (ver MetricasMiddleware en middleware.py).
+
+Cada proceso (worker de gunicorn/uvicorn) lleva sus propios contadores:
+Prometheus debe recogerlos de cada uno o sumarlos por instancia.
+"""
+import bisect
+import re
+import threading
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+PREFIJO = 'servicio_productos'
+
+# Cotas superiores de los histogramas (segundos y número de consultas)
+LIMITES_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LIMITES_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+HISTOGRAMAS = {
+    'peticion_segundos': ("Duración total de la petición", LIMITES_SEGUNDOS),
+    'sql_segundos': ("Tiempo en SQL por petición", LIMITES_SEGUNDOS),
+    'render_segundos': ("Tiempo de serialización a JSON (render de la respuesta)", LIMITES_SEGUNDOS),
+    'consultas_por_peticion': ("Consultas SQL por petición", LIMITES_CONSULTAS),
+}
+CONTADORES = {
+    'peticiones_total': "Peticiones atendidas",
+    'n_mas_1_total': "Peticiones con la misma consulta repetida (posible N+1)",
+}
+
+# Listas de marcadores de IN (...) de longitud variable: misma forma de consulta
+_LISTA_MARCADORES = re.compile(r'(%s|\?)(\s*,\s*(%s|\?))+')
+
+
+def forma_consulta(sql):
+    """SQL parametrizado con las listas IN colapsadas: 'IN (%s, %s)' -> 'IN (%s...)'."""
+    return _LISTA_MARCADORES.sub(r'\1...', sql)
+
+
+class _Histograma:
+    __slots__ = ('cubetas', 'suma', 'cuenta')
+
+    def __init__(self, limites):
+        self.cubetas = [0] * (len(limites) + 1)  # la última es +Inf
+        self.suma = 0.0
+        self.cuenta = 0
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._histogramas = {}  # (nombre, etiquetas) -> _Histograma
+        self._contadores = {}  # (nombre, etiquetas) -> int
+        self._lock = threading.Lock()
+
+    def observar(self, nombre, etiquetas, valor):
+        limites = HISTOGRAMAS[nombre][1]
+        with self._lock:
+            histograma = self._histogramas.get((nombre, etiquetas))
+            if histograma is None:
+                histograma = self._histogramas[(nombre, etiquetas)] = _Histograma(limites)
+            histograma.cubetas[bisect.bisect_left(limites, valor)] += 1
+            histograma.suma += valor
+            histograma.cuenta += 1
+
+    def incrementar(self, nombre, etiquetas, cantidad=1):
+        with self._lock:
+            self._contadores[(nombre, etiquetas)] = self._contadores.get((nombre, etiquetas), 0) + cantidad
+
+    def reiniciar(self):
+        with self._lock:
+            self._histogramas.clear()
+            self._contadores.clear()
+
+    def exportar(self):
+        """Texto de exposición de Prometheus (versión 0.0.4)."""
+        with self._lock:
+            histogramas = {
+                clave: (list(h.cubetas), h.suma, h.cuenta) for clave, h in self._histogramas.items()
+            }
+            contadores = dict(self._contadores)
+
+        lineas = []
+        for nombre, (ayuda, limites) in HISTOGRAMAS.items():
+            completo = f'{PREFIJO}_{nombre}'
+            lineas += [f'# HELP {completo} {ayuda}', f'# TYPE {completo} histogram']
+            for (clave, etiquetas), (cubetas, suma, cuenta) in sorted(histogramas.items()):
+                if clave != nombre:
+                    continue
+                acumulado = 0
+                for limite, valor in zip(list(limites) + ['+Inf'], cubetas):
+                    acumulado += valor
+                    lineas.append(f'{completo}_bucket{_etiquetas(etiquetas, le=limite)} {acumulado}')
+                lineas.append(f'{completo}_sum{_etiquetas(etiquetas)} {suma}')
+                lineas.append(f'{completo}_count{_etiquetas(etiquetas)} {cuenta}')
+        for nombre, ayuda in CONTADORES.items():
+            completo = f'{PREFIJO}_{nombre}'
+            lineas += [f'# HELP {completo} {ayuda}', f'# TYPE {completo} counter']
+            for (clave, etiquetas), valor in sorted(contadores.items()):
+                if clave == nombre:
+                    lineas.append(f'{completo}{_etiquetas(etiquetas)} {valor}')
+        return '\n'.join(lineas) + '\n'
+
+
+def _etiquetas(etiquetas, **extra):
+    pares = list(etiquetas) + [(clave, str(valor)) for clave, valor in extra.items()]
+    if not pares:
+        return ''
+    texto = ','.join(f'{clave}="{_escapar(valor)}"' for clave, valor in pares)
+    return '{' + texto + '}'
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+registro = RegistroMetricas()
+
+
+def metricas_view(request):
+    if not settings.METRICAS_ACTIVAS:
+        raise Http404
+    return HttpResponse(registro.exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,220 @@
+import contextvars
+import logging
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from servicio_productos.metricas import forma_consulta, registro
+from servicio_productos.routers import usar_primaria
+
+logger = logging.getLogger(__name__)
+
+METODOS_SEGUROS = {'GET', 'HEAD', 'OPTIONS'}
+
+# Cookie con el instante (epoch) hasta el que el cliente lee de la primaria
+COOKIE_PRIMARIA = 'leer_primaria_hasta'
+
+
+class PrimariaTrasEscrituraMiddleware:
+    """
+    Read-your-writes con réplicas: las peticiones que escriben y, durante
+    DB_PRIMARIA_TRAS_ESCRITURA segundos, las siguientes del mismo cliente
+    leen de la primaria. Sólo se instala con réplicas configuradas y admite
+    peticiones síncronas y asíncronas (las vistas ASGI no pasan por un hilo).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DB_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _leer_de_primaria(request, ahora):
+        # Escrituras y clientes dentro de la ventana de su última escritura
+        if request.method not in METODOS_SEGUROS:
+            return True
+        try:
+            return float(request.COOKIES.get(COOKIE_PRIMARIA, 0)) > ahora
+        except ValueError:
+            return False
+
+    @staticmethod
+    def _marcar(request, response, ahora):
+        ventana = settings.DB_PRIMARIA_TRAS_ESCRITURA
+        if request.method not in METODOS_SEGUROS and response.status_code < 400 and ventana > 0:
+            response.set_cookie(
+                COOKIE_PRIMARIA, f'{ahora + ventana:.3f}', max_age=ventana, httponly=True, samesite='Lax'
+            )
+        return response
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        ahora = time.time()
+        if not self._leer_de_primaria(request, ahora):
+            return self.get_response(request)
+        with usar_primaria():
+            response = self.get_response(request)
+        return self._marcar(request, response, ahora)
+
+    async def __acall__(self, request):
+        ahora = time.time()
+        if not self._leer_de_primaria(request, ahora):
+            return await self.get_response(request)
+        with usar_primaria():
+            response = await self.get_response(request)
+        return self._marcar(request, response, ahora)
+
+
+class _Medicion:
+    """execute_wrapper que acumula el SQL de una petición."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos_sql = 0.0
+        self.segundos_render = 0.0
+        self.sentencias = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos_sql += time.perf_counter() - inicio
+            self.consultas += 1
+            self.sentencias[sql] += 1
+
+    def repetidas(self, umbral):
+        # Misma forma de consulta (IN de cualquier longitud) umbral o más veces
+        formas = Counter()
+        for sql, veces in self.sentencias.items():
+            formas[forma_consulta(sql)] += veces
+        return [(forma, veces) for forma, veces in formas.most_common() if veces >= umbral]
+
+
+# Medición de la petición en curso. Es una ContextVar: en modo ASGI llega también
+# al hilo donde sync_to_async ejecuta el ORM, cuyas conexiones son otras
+_medicion_actual = contextvars.ContextVar('medicion_actual', default=None)
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    medicion = _medicion_actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    return medicion(execute, sql, params, many, context)
+
+
+def _instrumentar(sender, connection, **kwargs):
+    # connection_created se emite en cada reconexión del mismo wrapper: no duplicar
+    if _medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir_consulta)
+
+
+def instrumentar_conexiones():
+    """Instala _medir_consulta en todas las conexiones (ProductosConfig.ready)."""
+    connection_created.connect(_instrumentar, dispatch_uid='servicio_productos.middleware')
+    for conexion in connections.all(initialized_only=True):
+        if conexion.connection is not None:
+            _instrumentar(None, conexion)
+
+
+def _nombre_vista(request):
+    coincidencia = getattr(request, 'resolver_match', None)
+    if coincidencia is None:
+        return 'sin_ruta'
+    # Las vistas de @api_view son clases (WrappedAPIView) con el nombre de la función
+    vista = getattr(coincidencia.func, 'view_class', coincidencia.func)
+    return getattr(vista, '__name__', coincidencia.view_name)
+
+
+class MetricasMiddleware:
+    """
+    Por vista: número de consultas, tiempo en SQL, tiempo de render (JSON) y
+    tiempo total. Añade la cabecera Server-Timing, avisa de posibles N+1 y
+    alimenta los histogramas de /metrics (servicio_productos/metricas.py).
+
+    Con METRICAS_ACTIVAS=False Django lo descarta al arrancar (MiddlewareNotUsed)
+    y lo único que queda es leer una ContextVar vacía en cada consulta. El SQL
+    que se ejecuta mientras se emite una respuesta en streaming (exportar) no
+    se cuenta.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICAS_ACTIVAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        # En modo ASGI se mide sin adaptar la cadena (las vistas async no pasan por un hilo)
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        inicio = time.perf_counter()
+        medicion = request._medicion = _Medicion()
+        token = _medicion_actual.set(medicion)
+        try:
+            response = self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        return self._registrar(request, response, medicion, time.perf_counter() - inicio)
+
+    async def __acall__(self, request):
+        inicio = time.perf_counter()
+        medicion = request._medicion = _Medicion()
+        token = _medicion_actual.set(medicion)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        return self._registrar(request, response, medicion, time.perf_counter() - inicio)
+
+    @staticmethod
+    def _registrar(request, response, medicion, total):
+        vista = _nombre_vista(request)
+        etiquetas = (('vista', vista),)
+        registro.observar('peticion_segundos', etiquetas, total)
+        registro.observar('sql_segundos', etiquetas, medicion.segundos_sql)
+        registro.observar('render_segundos', etiquetas, medicion.segundos_render)
+        registro.observar('consultas_por_peticion', etiquetas, medicion.consultas)
+        registro.incrementar(
+            'peticiones_total', etiquetas + (('metodo', request.method), ('codigo', str(response.status_code)))
+        )
+
+        repetidas = medicion.repetidas(settings.METRICAS_UMBRAL_N_MAS_1)
+        if repetidas:
+            registro.incrementar('n_mas_1_total', etiquetas)
+            for forma, veces in repetidas:
+                logger.warning("Posible N+1 en %s %s (%s): %d veces %s", request.method, request.path, vista, veces, forma)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={medicion.segundos_sql * 1000:.2f};desc="{medicion.consultas} consultas"',
+            f'render;dur={medicion.segundos_render * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+        return response
+
+    def process_template_response(self, request, response):
+        # Las Response de DRF se renderizan (JSON) después de este hook: se
+        # cronometra con un callback posterior al render
+        inicio = time.perf_counter()
+
+        def fin_render(respuesta):
+            request._medicion.segundos_render = time.perf_counter() - inicio
+
+        response.add_post_render_callback(fin_render)
+        return response
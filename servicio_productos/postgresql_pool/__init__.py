@@ -0,0 +1,7 @@
+"""
+Backend de PostgreSQL con un pool de conexiones compartido por proceso.
+
+Se activa con DB_POOL=1 (ver DATABASES en settings.py). Django 4.2 no trae
+pool propio: este backend hereda del de PostgreSQL y sólo cambia de dónde
+sale la conexión (get_new_connection) y a dónde va al cerrarse (_close).
+"""
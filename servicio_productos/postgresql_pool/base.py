@@ -0,0 +1,82 @@
+import threading
+
+from django.db.backends.postgresql import base
+from psycopg import IsolationLevel, pq
+
+from .pool import PoolAgotado, PoolConexiones
+
+# Un pool por alias de base de datos y por proceso (se comparte entre hilos)
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _validar(conexion):
+    try:
+        conexion.execute('SELECT 1')
+        return True
+    except base.Database.Error:
+        return False
+
+
+def _reiniciar(conexion):
+    # Deja la conexión como la espera Django al tomarla: sin transacción abierta
+    if conexion.closed or conexion.broken:
+        return False
+    estado = conexion.info.transaction_status
+    if estado == pq.TransactionStatus.UNKNOWN:
+        return False
+    if estado != pq.TransactionStatus.IDLE:
+        try:
+            conexion.rollback()
+        except base.Database.Error:
+            return False
+    return True
+
+
+def obtener_pool(alias, settings_dict):
+    pool = _pools.get(alias)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(alias)
+            if pool is None:
+                opciones = settings_dict.get('POOL', {})
+                pool = _pools[alias] = PoolConexiones(
+                    tamano_max=opciones.get('TAMANO_MAX', 10),
+                    espera_max=opciones.get('ESPERA_MAX', 5.0),
+                    vida_max=opciones.get('VIDA_MAX', 1800.0),
+                    verificar_tras=opciones.get('VERIFICAR_TRAS', 30.0),
+                    validar=_validar,
+                    reiniciar=_reiniciar,
+                )
+    return pool
+
+
+def pools():
+    return dict(_pools)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Backend de PostgreSQL (psycopg 3) que toma las conexiones de un pool.
+
+    Django sigue abriendo y cerrando "su" conexión por petición (CONN_MAX_AGE
+    debe ser 0), pero el cierre la devuelve al pool en vez de cortarla, así
+    que el coste de conectar se paga una vez por conexión del pool.
+    """
+
+    def get_new_connection(self, conn_params):
+        pool = obtener_pool(self.alias, self.settings_dict)
+        fabrica = super(DatabaseWrapper, self).get_new_connection
+        try:
+            conexion = pool.obtener(lambda: fabrica(conn_params))
+        except PoolAgotado as e:
+            raise self.Database.OperationalError(str(e)) from e
+        # El get_new_connection original lo fija al conectar; al reutilizar hay que hacerlo aquí
+        nivel = self.settings_dict['OPTIONS'].get('isolation_level')
+        self.isolation_level = IsolationLevel.READ_COMMITTED if nivel is None else IsolationLevel(nivel)
+        return conexion
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                obtener_pool(self.alias, self.settings_dict).devolver(self.connection)
@@ -0,0 +1,183 @@
+import threading
+import time
+from collections import Counter, deque
+
+# Cotas superiores (ms) del histograma de espera para obtener una conexión
+LIMITES_ESPERA_MS = (1, 5, 10, 50, 100, 500, 1000)
+
+
+class PoolAgotado(Exception):
+    pass
+
+
+def _tramo_espera(milisegundos):
+    for limite in LIMITES_ESPERA_MS:
+        if milisegundos <= limite:
+            return f'<={limite}'
+    return f'>{LIMITES_ESPERA_MS[-1]}'
+
+
+class PoolConexiones:
+    """
+    Pool de conexiones thread-safe e independiente del driver.
+
+    - obtener(fabrica) entrega la conexión libre usada más recientemente o
+      crea una nueva con fabrica() mientras haya cupo (tamano_max); si no,
+      espera hasta espera_max segundos y lanza PoolAgotado.
+    - Una conexión que lleva más de verificar_tras segundos sin usarse se
+      comprueba con validar() antes de entregarla; las que superan vida_max
+      se cierran y se reemplazan (evita conexiones eternas tras un failover).
+    - devolver() la deja lista con reiniciar() (p. ej. ROLLBACK de una
+      transacción abierta) o la descarta si está rota.
+    """
+
+    def __init__(self, tamano_max=10, espera_max=5.0, vida_max=1800.0, verificar_tras=30.0,
+                 validar=None, reiniciar=None, cerrar=None):
+        self.tamano_max = tamano_max
+        self.espera_max = espera_max
+        self.vida_max = vida_max
+        self.verificar_tras = verificar_tras
+        self._validar = validar or (lambda conexion: True)
+        self._reiniciar = reiniciar or (lambda conexion: True)
+        self._cerrar = cerrar or (lambda conexion: conexion.close())
+
+        self._libres = deque()  # (conexion, creada_en, usada_en); la última es la más reciente
+        self._en_uso = {}  # id(conexion) -> creada_en
+        self._abiertas = 0  # libres + en uso + en creación
+        self._esperando = 0
+        self._contadores = Counter()
+        self._histograma = Counter()
+        self._condicion = threading.Condition()
+
+    # --- Préstamo ---
+    def obtener(self, fabrica):
+        inicio = time.monotonic()
+        while True:
+            entrada = self._reservar(inicio)
+            if entrada is None:
+                return self._crear(fabrica, inicio)
+
+            conexion, creada, usada = entrada
+            ahora = time.monotonic()
+            if ahora - creada > self.vida_max:
+                self._descartar(conexion, 'expiradas')
+                continue
+            if ahora - usada > self.verificar_tras and not self._validar(conexion):
+                self._descartar(conexion, 'rotas')
+                continue
+
+            with self._condicion:
+                self._en_uso[id(conexion)] = creada
+                self._registrar_espera(inicio)
+            return conexion
+
+    def _reservar(self, inicio):
+        # Devuelve una entrada libre o None si hay cupo para crear una conexión
+        limite = inicio + self.espera_max
+        with self._condicion:
+            self._contadores['peticiones'] += 1
+            while True:
+                if self._libres:
+                    return self._libres.pop()
+                if self._abiertas < self.tamano_max:
+                    self._abiertas += 1
+                    return None
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._contadores['agotadas'] += 1
+                    raise PoolAgotado(
+                        f"Sin conexiones libres tras {self.espera_max} s ({self.tamano_max} en uso)"
+                    )
+                self._esperando += 1
+                try:
+                    self._condicion.wait(restante)
+                finally:
+                    self._esperando -= 1
+
+    def _crear(self, fabrica, inicio):
+        # Fuera del lock: conectar puede tardar y no debe bloquear al resto
+        try:
+            conexion = fabrica()
+        except Exception:
+            with self._condicion:
+                self._abiertas -= 1
+                self._contadores['errores_conexion'] += 1
+                self._condicion.notify()
+            raise
+        with self._condicion:
+            self._contadores['creadas'] += 1
+            self._en_uso[id(conexion)] = time.monotonic()
+            self._registrar_espera(inicio)
+        return conexion
+
+    def _registrar_espera(self, inicio):
+        milisegundos = (time.monotonic() - inicio) * 1000
+        self._histograma[_tramo_espera(milisegundos)] += 1
+        self._contadores['espera_total_ms'] += milisegundos
+
+    # --- Devolución ---
+    def devolver(self, conexion):
+        with self._condicion:
+            creada = self._en_uso.pop(id(conexion), None)
+        if creada is None:
+            # No salió de este pool (o ya se devolvió): sólo se cierra
+            self._cerrar(conexion)
+            return
+        if time.monotonic() - creada > self.vida_max:
+            self._descartar(conexion, 'expiradas')
+        elif not self._reiniciar(conexion):
+            self._descartar(conexion, 'rotas')
+        else:
+            with self._condicion:
+                self._libres.append((conexion, creada, time.monotonic()))
+                self._condicion.notify()
+
+    def _descartar(self, conexion, motivo):
+        try:
+            self._cerrar(conexion)
+        except Exception:
+            pass
+        with self._condicion:
+            self._abiertas -= 1
+            self._contadores['cerradas'] += 1
+            self._contadores[motivo] += 1
+            self._condicion.notify()
+
+    def cerrar(self):
+        # Cierra las conexiones libres; las prestadas se cierran al devolverse
+        with self._condicion:
+            libres, self._libres = list(self._libres), deque()
+        for conexion, _, _ in libres:
+            self._descartar(conexion, 'cierre')
+
+    # --- Métricas ---
+    def estadisticas(self):
+        with self._condicion:
+            contadores = dict(self._contadores)
+            histograma = dict(self._histograma)
+            datos = {
+                'tamano_max': self.tamano_max,
+                'abiertas': self._abiertas,
+                'en_uso': len(self._en_uso),
+                'libres': len(self._libres),
+                'esperando': self._esperando,
+            }
+        peticiones = contadores.get('peticiones', 0)
+        datos.update({
+            'peticiones': peticiones,
+            'agotadas': contadores.get('agotadas', 0),
+            'espera_media_ms': round(contadores.get('espera_total_ms', 0) / peticiones, 3) if peticiones else 0.0,
+            'espera_ms': {
+                tramo: histograma.get(tramo, 0)
+                for tramo in [f'<={limite}' for limite in LIMITES_ESPERA_MS] + [f'>{LIMITES_ESPERA_MS[-1]}']
+            },
+            # Rotación: conexiones abiertas y cerradas desde el arranque y por qué
+            'rotacion': {
+                'creadas': contadores.get('creadas', 0),
+                'cerradas': contadores.get('cerradas', 0),
+                'expiradas': contadores.get('expiradas', 0),
+                'rotas': contadores.get('rotas', 0),
+                'errores_conexion': contadores.get('errores_conexion', 0),
+            },
+        })
+        return datos
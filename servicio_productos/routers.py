@@ -0,0 +1,94 @@
+import contextlib
+import contextvars
+import random
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Apps cuyas lecturas pueden ir a una réplica (auth, sesiones y admin siempre a la primaria)
+APPS_REPLICADAS = {'productos', 'categorias'}
+
+# True mientras la petición en curso deba leer de la primaria
+_leer_de_primaria = contextvars.ContextVar('leer_de_primaria', default=False)
+
+_consultas = Counter()
+_consultas_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def usar_primaria():
+    """Fuerza que las lecturas del bloque vayan a la primaria (read-your-writes)."""
+    token = _leer_de_primaria.set(True)
+    try:
+        yield
+    finally:
+        _leer_de_primaria.reset(token)
+
+
+def leyendo_de_primaria():
+    return _leer_de_primaria.get()
+
+
+class _ContadorConsultas:
+    """execute_wrapper que cuenta las consultas ejecutadas en un alias."""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def __call__(self, execute, sql, params, many, context):
+        with _consultas_lock:
+            _consultas[self.alias] += 1
+        return execute(sql, params, many, context)
+
+
+def _instrumentar(sender, connection, **kwargs):
+    # connection_created se emite en cada reconexión del mismo wrapper: no duplicar
+    if not any(isinstance(envoltorio, _ContadorConsultas) for envoltorio in connection.execute_wrappers):
+        connection.execute_wrappers.append(_ContadorConsultas(connection.alias))
+
+
+def consultas_por_alias():
+    with _consultas_lock:
+        return {alias: _consultas.get(alias, 0) for alias in connections}
+
+
+def reiniciar_consultas():
+    with _consultas_lock:
+        _consultas.clear()
+
+
+class ReplicaRouter:
+    """
+    Lecturas del catálogo a una réplica (settings.DB_REPLICAS), escrituras a la primaria.
+
+    Las lecturas vuelven a la primaria dentro de usar_primaria(): el middleware
+    PrimariaTrasEscrituraMiddleware lo activa en las peticiones que escriben y,
+    durante DB_PRIMARIA_TRAS_ESCRITURA segundos, en las siguientes del mismo
+    cliente, para que vea sus propios cambios aunque la réplica vaya con retraso.
+    """
+
+    def __init__(self):
+        connection_created.connect(_instrumentar, dispatch_uid='servicio_productos.routers')
+        for conexion in connections.all(initialized_only=True):
+            if conexion.connection is not None:
+                _instrumentar(None, conexion)
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DB_REPLICAS
+        if not replicas or model._meta.app_label not in APPS_REPLICADAS or _leer_de_primaria.get():
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Explícito: un objeto leído de una réplica se guarda igualmente en la primaria
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primaria y réplicas tienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Antes incluso que CORS para medir la petición completa; sin METRICAS_ACTIVAS se descarta al arrancar
+    'servicio_productos.middleware.MetricasMiddleware',
     'corsheaders.middleware.CorsMiddleware', # Debe estar al inicio
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -59,7 +63,16 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",  # Para desarrollo con React
 ]
 
-ROOT_URLCONF = 'servicio_productos.urls'
+# Métricas por vista (consultas, tiempo en SQL, render y total): cabecera
+# Server-Timing, aviso de posibles N+1 a partir de METRICAS_UMBRAL_N_MAS_1
+# repeticiones de la misma consulta y /metrics en formato Prometheus
+METRICAS_ACTIVAS = os.environ.get('DJANGO_METRICAS', '0') == '1'
+METRICAS_UMBRAL_N_MAS_1 = int(os.environ.get('DJANGO_METRICAS_UMBRAL_N_MAS_1', 5))
+
+# Modo ASGI (uvicorn, ver servicio_productos/asgi.py): las lecturas de productos
+# se atienden con vistas async. Con gunicorn/WSGI se usan las vistas DRF síncronas.
+VISTAS_ASYNC = os.environ.get('DJANGO_VISTAS_ASYNC', '0') == '1'
+ROOT_URLCONF = 'servicio_productos.urls_asgi' if VISTAS_ASYNC else 'servicio_productos.urls'
 
 TEMPLATES = [
     {
@@ -83,20 +96,46 @@ WSGI_APPLICATION = 'servicio_productos.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-import os
+# Conexiones: por defecto cada hilo reutiliza su conexión DB_CONN_MAX_AGE segundos
+# (comprobando que sigue viva antes de cada petición). Con DB_POOL=1 se usa un
+# pool compartido por proceso (servicio_productos/postgresql_pool), útil con
+# muchos hilos o en modo ASGI; sus métricas están en /api/productos/conexiones/.
+DB_POOL = os.environ.get('DB_POOL', '0') == '1'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'servicio_productos.postgresql_pool' if DB_POOL else 'django.db.backends.postgresql',
         'NAME': os.environ.get('DB_NAME', 'productos_db_ecommerce'),
         'USER': os.environ.get('DB_USER', 'postgres'),
         'PASSWORD': os.environ.get('DB_PASSWORD', 'postgres'),
         # IMPORTANTE: En Docker, el host es el nombre del servicio definido en compose
         'HOST': os.environ.get('DB_HOST', 'db'), 
         'PORT': os.environ.get('DB_PORT', '5432'),
+        # Con pool Django debe "cerrar" al final de cada petición: el cierre la devuelve al pool
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+        'POOL': {
+            'TAMANO_MAX': int(os.environ.get('DB_POOL_TAMANO_MAX', 10)),
+            'ESPERA_MAX': float(os.environ.get('DB_POOL_ESPERA_MAX', 5)),
+            'VIDA_MAX': float(os.environ.get('DB_POOL_VIDA_MAX', 1800)),
+            'VERIFICAR_TRAS': float(os.environ.get('DB_POOL_VERIFICAR_TRAS', 30)),
+        },
     }
 }
 
+# Réplicas de lectura: DB_REPLICA_HOSTS=replica1,replica2 crea los alias replica_1,
+# replica_2 (mismas credenciales que la primaria). Las lecturas del catálogo van a
+# una réplica; tras escribir, el cliente lee de la primaria DB_PRIMARIA_TRAS_ESCRITURA
+# segundos (ver servicio_productos/routers.py y middleware.py).
+DB_REPLICAS = []
+for numero, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1):
+    alias = f'replica_{numero}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+    DB_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['servicio_productos.routers.ReplicaRouter']
+DB_PRIMARIA_TRAS_ESCRITURA = int(os.environ.get('DB_PRIMARIA_TRAS_ESCRITURA', 5))
+
 import sys
 
 # Si el comando ejecutado es 'test', forzamos el uso de SQLite
@@ -105,8 +144,88 @@ if 'test' in sys.argv:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': ':memory:',
-        }
+        },
+        # Segunda base independiente: los tests de réplicas la activan con DB_REPLICAS
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        },
     }
+    DB_REPLICAS = []
+
+if DB_REPLICAS:
+    # Read-your-writes (ver servicio_productos/middleware.py); sin réplicas no se instala
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+        'servicio_productos.middleware.PrimariaTrasEscrituraMiddleware',
+    )
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# En local y en tests se usa locmem (LRU por proceso). En producción se puede
+# apuntar a un backend compartido, p. ej.:
+#   CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+#   CACHE_LOCATION=redis://redis:6379/1
+# (en Redis/Memcached el límite de tamaño y la expulsión LRU las aplica el servidor)
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'productos': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'productos'),
+        'TIMEOUT': int(os.environ.get('CACHE_PRODUCTOS_TTL', 300)),
+        'KEY_PREFIX': 'productos',
+    },
+}
+
+if CACHE_BACKEND.endswith('LocMemCache'):
+    CACHES['productos']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.environ.get('CACHE_PRODUCTOS_MAX_ENTRADAS', 10000)),
+    }
+
+# Los ETag de listados y facetas usan marcadores de versión guardados en la cache
+# 'productos': sólo son fiables si todos los procesos comparten esa cache. Con
+# locmem se desactivan (y las respuestas de categorías usan el TTL normal en
+# lugar del largo) salvo que se indique que hay un único proceso con
+# CACHE_VERSIONES_COMPARTIDAS=1 (p. ej. runserver o un solo worker).
+CACHE_VERSIONES_COMPARTIDAS = os.environ.get(
+    'CACHE_VERSIONES_COMPARTIDAS',
+    '0' if CACHE_BACKEND.endswith(('LocMemCache', 'DummyCache')) else '1',
+) == '1'
+if 'test' in sys.argv:
+    # Los tests corren en un único proceso
+    CACHE_VERSIONES_COMPARTIDAS = True
+
+# Tiempo que se recuerda un 404 (evita ir a la base en barridos de IDs inexistentes)
+CACHE_PRODUCTOS_TTL_NO_ENCONTRADO = int(os.environ.get('CACHE_PRODUCTOS_TTL_404', 60))
+# Las respuestas de categorías cambian muy poco: TTL largo (se invalidan por versión)
+CACHE_CATEGORIAS_TTL = int(os.environ.get('CACHE_CATEGORIAS_TTL', 24 * 60 * 60))
+
+# Índice de autocompletado en memoria (por proceso): cada cuántos segundos se
+# aplican los cambios que otros procesos publicaron en la cache 'productos' y cada
+# cuánto se recarga completo en segundo plano (con locmem, el retraso entre procesos)
+AUTOCOMPLETADO_VERIFICAR_CADA = int(os.environ.get('AUTOCOMPLETADO_VERIFICAR_CADA', 5))
+AUTOCOMPLETADO_MAX_ANTIGUEDAD = int(os.environ.get('AUTOCOMPLETADO_MAX_ANTIGUEDAD', 600))
+
+
+# Perfilado bajo demanda de las vistas de productos (productos/perfilado.py):
+# cabecera X-Perfilar firmada con PERFILADO_CLAVE (manage.py token_perfilado;
+# sin clave la cabecera se ignora), muestreo de una fracción de peticiones o
+# captura automática de las que superan el umbral. Las capturas se descargan
+# en /api/productos/perfiles/ (sólo administradores).
+PERFILADO_CLAVE = os.environ.get('PERFILADO_CLAVE', '')
+PERFILADO_MUESTREO = float(os.environ.get('PERFILADO_MUESTREO', 0))
+PERFILADO_UMBRAL_MS = float(os.environ.get('PERFILADO_UMBRAL_MS', 0))  # 0 = sin captura automática
+PERFILADO_MAXIMO = int(os.environ.get('PERFILADO_MAXIMO', 50))
+PERFILADO_MAX_PENDIENTES = int(os.environ.get('PERFILADO_MAX_PENDIENTES', 8))
+PERFILADO_DIRECTORIO = os.environ.get(
+    'PERFILADO_DIRECTORIO', os.path.join(tempfile.gettempdir(), 'productos-perfiles')
+)
+PERFILADO_TOKEN_VALIDEZ = int(os.environ.get('PERFILADO_TOKEN_VALIDEZ', 3600))
 
 
 # Password validation
@@ -17,7 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from servicio_productos.metricas import metricas_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metricas_view, name='metricas'),
     path('api/', include('productos.urls')),
+    path('api/', include('categorias.urls')),
 ]
@@ -0,0 +1,12 @@
+"""
+URLs del modo ASGI (settings.VISTAS_ASYNC): las lecturas de productos usan
+las vistas async de productos/views_async.py y el resto es igual que en
+servicio_productos/urls.py.
+"""
+from django.urls import path, include
+
+from servicio_productos.urls import urlpatterns as urlpatterns_wsgi
+
+urlpatterns = [
+    path('api/', include('productos.urls_async')),
+] + urlpatterns_wsgi